@@ -0,0 +1,86 @@
+import streamlit as st
+import cohort_cube
+import tracing
+
+
+# Aggregate cube for the current dataset and model (updated only when either changes)
+def load_cube():
+    try:
+        return cohort_cube.load_cube()
+    except Exception as e:
+        st.error(f"Error loading cohort data: {e}")
+        return None
+
+DIMENSION_LABELS = {
+    'age_band': 'Age band',
+    'bmi_band': 'BMI band',
+    'gender': 'Gender',
+    'cholesterol': 'Cholesterol',
+    'glucose': 'Glucose',
+    'smoking': 'Smoking',
+    'activity': 'Physical activity',
+}
+
+# App UI
+st.set_page_config(
+    page_title="HealthGuard AI - Cohort Analytics",
+    page_icon="🏥",
+    layout="wide",
+    initial_sidebar_state="expanded"
+)
+
+st.title("📊 Cohort Analytics")
+st.markdown("Cardiovascular disease prevalence and mean predicted risk across the patients of "
+            "`dataset/cardio_train.csv`. Narrow the cohort in the sidebar and choose how to group it.")
+
+with st.spinner("Loading cohort data..."):
+    cube = load_cube()
+
+if cube is not None:
+    # Filters: every label of a dimension selected means no filter on it
+    st.sidebar.header("Cohort")
+    filters = {}
+    for name, labels in cohort_cube.DIMENSIONS.items():
+        selected = st.sidebar.multiselect(DIMENSION_LABELS[name], labels, default=labels, key=f"filter_{name}")
+        if len(selected) < len(labels):
+            filters[name] = [labels.index(label) for label in selected]
+
+    by = st.multiselect("Group by", list(cohort_cube.DIMENSIONS), default=['age_band'],
+                        format_func=DIMENSION_LABELS.get, max_selections=2, key='group_by')
+
+    with tracing.span('analytics.slice', by=','.join(by), filters=len(filters)):
+        overall = cohort_cube.slice_cube(cube, filters)
+        groups = cohort_cube.slice_cube(cube, filters, by)
+
+    if overall.empty:
+        st.warning("No patients match the selected cohort.")
+    else:
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Patients", f"{int(overall['patients'].iloc[0]):,}")
+        col2.metric("Disease prevalence", f"{overall['prevalence'].iloc[0]:.1%}")
+        col3.metric("Mean predicted risk", f"{overall['mean_risk'].iloc[0]:.1%}")
+
+        if by:
+            groups.insert(0, 'group', groups[by].agg(' / '.join, axis=1))
+            chart_data = groups.set_index('group')[['prevalence', 'mean_risk']]
+            chart_data.columns = ['Disease prevalence', 'Mean predicted risk']
+            st.bar_chart(chart_data, stack=False, x_label=" / ".join(DIMENSION_LABELS[name] for name in by),
+                         sort=False)
+            st.dataframe(
+                groups.drop(columns='group').rename(columns=DIMENSION_LABELS),
+                hide_index=True,
+                column_config={
+                    'patients': st.column_config.NumberColumn("Patients", format="%d"),
+                    'prevalence': st.column_config.ProgressColumn("Disease prevalence", format="percent",
+                                                                  min_value=0.0, max_value=1.0),
+                    'mean_risk': st.column_config.ProgressColumn("Mean predicted risk", format="percent",
+                                                                 min_value=0.0, max_value=1.0),
+                },
+            )
+
+        st.caption(f"Patients with implausible vitals are excluded. Risk is predicted by the current model "
+                   f"({cube['model_sha256'][:12]}); the figures are refreshed when rows are added to the dataset.")
+
+# Footer
+st.markdown("---")
+st.markdown("Developed with ❤️ using Streamlit and Machine Learning | Not for clinical use")
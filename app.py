@@ -0,0 +1,33 @@
+import streamlit as st
+
+import metrics
+import warmup
+
+# Single entry point: every page runs in this one Streamlit server process,
+# so the model caches (and the H2O connection) are shared instead of each
+# module being launched as its own server.
+pages = [
+    st.Page("welcome_app.py", title="HealthGuard AI", icon="🏥", default=True),
+    st.Page("diabetes_app.py", title="Diabetes Risk", icon="🩺", url_path="diabetes"),
+    st.Page("cardiovascular_app.py", title="Cardiovascular Risk", icon="❤️", url_path="cardio"),
+    st.Page("analytics_app.py", title="Cohort Analytics", icon="📊", url_path="analytics"),
+]
+
+# Load both models in the background once per server process
+readiness = warmup.start().status()
+
+# Prometheus scrape endpoint for this server process (HEALTHGUARD_METRICS_PORT)
+metrics.start_server()
+
+page = st.navigation(pages, position="hidden")
+
+if not readiness["ready"]:
+    loading = [name for name, model in readiness["models"].items() if model["state"] in ("pending", "loading")]
+    failed = [name for name, model in readiness["models"].items() if model["state"] == "failed"]
+    if loading:
+        st.info(f"Preparing the {' and '.join(loading)} model{'s' if len(loading) > 1 else ''}; "
+                "the first assessment may take a little longer.")
+    for name in failed:
+        st.warning(f"The {name} model could not be loaded: {readiness['models'][name]['error']}")
+
+page.run()
@@ -0,0 +1,414 @@
+"""Latency, throughput and memory benchmarks with a regression gate.
+
+Each case runs in its own Python process so that its peak RSS and cold model
+loads are not affected by the cases before it:
+
+    cardio.load_model        unpickle/compile-load of the cardiovascular model
+    cardio.predict_single    predict_cardiovascular_risk for one patient
+    cardio.lookup_single     the page's table lookup for one patient
+    cardio.batch_<n>         predict_cardiovascular_risk_batch on n rows
+    diabetes.load_model      MOJO import for the configured backend
+    diabetes.predict_single  predict_frame (H2OFrame or native) for one patient
+    diabetes.batch_<n>       predict_frame on n rows
+    page.<name>              headless render of a page script with AppTest (welcome,
+                             diabetes, cardio and analytics)
+    import.<module>          cold import of a module in a fresh interpreter
+
+    python benchmark.py                         # compare with benchmark_baseline.json
+    python benchmark.py --save-baseline         # record the current numbers
+    python benchmark.py --cases cardio --threshold 0.5
+    python benchmark.py --import-profile diabetes_app   # slowest imports of one script
+
+The command exits with status 1 when a case's p50/p99 latency or peak RSS grows,
+or its throughput shrinks, by more than ``--threshold`` relative to the
+baseline. It also fails when there is no baseline file, or a measured case
+has no baseline entry, so the gate never passes without comparing anything;
+record one on the machine that runs the gate. Cases whose model or dataset is
+missing are reported as skipped.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+BASELINE_PATH = 'benchmark_baseline.json'
+DEFAULT_THRESHOLD = 0.25
+BATCH_SIZES = [100, 1_000, 10_000]
+
+# Modules a page pulls in before its first widget is drawn
+IMPORT_MODULES = ['streamlit', 'static_assets', 'cardio_model', 'cardio_lookup', 'diabetes_model']
+
+# Metrics compared against the baseline and whether larger values are worse
+COMPARED_METRICS = {
+    'p50_ms': True,
+    'p99_ms': True,
+    'rows_per_second': False,
+    'peak_rss_mb': True,
+}
+
+CASES = {}
+
+
+class Skip(Exception):
+    """Raised by a case setup when its model, data or library is unavailable."""
+
+
+def case(name, iterations, rows=1, child_rss=False):
+    """Register ``setup``, which returns the zero-argument callable to time.
+
+    ``child_rss`` cases spawn their own processes and report those processes'
+    peak RSS instead of the benchmark's.
+    """
+    def register(setup):
+        CASES[name] = {'setup': setup, 'iterations': iterations, 'rows': rows, 'child_rss': child_rss}
+        return setup
+    return register
+
+
+def _require_file(path):
+    if not os.path.exists(path):
+        raise Skip(f"{path} not found")
+
+
+def _require_module(name):
+    import importlib.util
+    if importlib.util.find_spec(name) is None:
+        raise Skip(f"{name} is not installed")
+
+
+def _cardio_rows(n, seed=0):
+    import cardio_data
+    import cardio_model
+
+    _require_file(cardio_data.DATASET_PATH)
+    features, _ = cardio_data.load_training_data()
+    sample = features.sample(n, replace=True, random_state=seed).reset_index(drop=True)
+    return sample[cardio_model.FEATURE_COLUMNS]
+
+
+def _diabetes_rows(n, seed=0):
+    import pandas as pd
+
+    import diabetes_model
+
+    # Random profiles within the form's input ranges
+    rng = np.random.default_rng(seed)
+    columns = {column: rng.integers(0, 2, n) for column in diabetes_model.BINARY_COLUMNS}
+    columns.update({
+        'GenHlth': rng.integers(1, 6, n),
+        'BMI': np.round(rng.uniform(15.0, 50.0, n), 1),
+        'PhysHlth': rng.integers(0, 31, n),
+        'MentHlth': rng.integers(0, 31, n),
+    })
+    return pd.DataFrame(columns)[diabetes_model.FEATURE_COLUMNS]
+
+
+def _init_diabetes_backend():
+    import diabetes_model
+
+    _require_file(diabetes_model.MOJO_PATH)
+    if diabetes_model.BACKEND == 'h2o':
+        _require_module('h2o')
+
+
+@case('cardio.load_model', iterations=10)
+def _cardio_load():
+    import cardio_model
+    import model_cache
+
+    _require_file(cardio_model.MODEL_PATH)
+
+    def run():
+        model_cache.clear()
+        cardio_model.load_model()
+    return run
+
+
+@case('cardio.predict_single', iterations=200)
+def _cardio_single():
+    import cardio_model
+
+    _require_file(cardio_model.MODEL_PATH)
+    rows = _cardio_rows(256).to_dict('records')
+    state = {'i': 0}
+
+    def run():
+        row = rows[state['i'] % len(rows)]
+        state['i'] += 1
+        cardio_model.predict_cardiovascular_risk(row['BMI'], row['age'], row['high_chol'], row['high_bp'])
+    return run
+
+
+@case('cardio.lookup_single', iterations=200)
+def _cardio_lookup():
+    import cardio_lookup
+    import cardio_model
+
+    _require_file(cardio_model.MODEL_PATH)
+    rows = _cardio_rows(256).to_dict('records')
+    cardio_lookup.load_table()
+    state = {'i': 0}
+
+    def run():
+        row = rows[state['i'] % len(rows)]
+        state['i'] += 1
+        cardio_lookup.lookup_cardiovascular_risk(row['BMI'], row['age'], row['high_chol'], row['high_bp'])
+    return run
+
+
+def _cardio_batch_case(n):
+    @case(f'cardio.batch_{n}', iterations=max(5, 20_000 // n), rows=n)
+    def setup():
+        import cardio_model
+
+        _require_file(cardio_model.MODEL_PATH)
+        rows = _cardio_rows(n)
+        model = cardio_model.load_model()
+        return lambda: cardio_model.predict_cardiovascular_risk_batch(rows, model)
+
+
+for _n in BATCH_SIZES:
+    _cardio_batch_case(_n)
+
+
+@case('diabetes.load_model', iterations=5)
+def _diabetes_load():
+    import diabetes_model
+    import model_cache
+
+    _init_diabetes_backend()
+
+    def run():
+        model_cache.clear()
+        diabetes_model.load_model()
+    return run
+
+
+@case('diabetes.predict_single', iterations=100)
+def _diabetes_single():
+    import diabetes_model
+
+    _init_diabetes_backend()
+    model = diabetes_model.load_model()
+    rows = _diabetes_rows(256)
+    state = {'i': 0}
+
+    def run():
+        i = state['i'] % len(rows)
+        state['i'] += 1
+        diabetes_model.predict_frame(model, rows.iloc[i:i + 1])
+    return run
+
+
+def _diabetes_batch_case(n):
+    @case(f'diabetes.batch_{n}', iterations=max(3, 10_000 // n), rows=n)
+    def setup():
+        import diabetes_model
+
+        _init_diabetes_backend()
+        model = diabetes_model.load_model()
+        rows = _diabetes_rows(n)
+        return lambda: diabetes_model.predict_frame(model, rows)
+
+
+for _n in BATCH_SIZES:
+    _diabetes_batch_case(_n)
+
+
+def _page_case(name, script):
+    @case(f'page.{name}', iterations=5)
+    def setup():
+        from streamlit.testing.v1 import AppTest
+
+        def run():
+            app = AppTest.from_file(script, default_timeout=60).run()
+            if app.exception:
+                raise RuntimeError(f"{script} raised: {app.exception[0].message}")
+        return run
+
+
+_page_case('welcome', 'welcome_app.py')
+_page_case('diabetes', 'diabetes_app.py')
+_page_case('cardio', 'cardiovascular_app.py')
+_page_case('analytics', 'analytics_app.py')
+
+
+def _import_command(module):
+    return [sys.executable, '-X', 'importtime', '-c', f'import {module}']
+
+
+def _import_case(module):
+    @case(f'import.{module}', iterations=5, child_rss=True)
+    def setup():
+        command = _import_command(module)
+        return lambda: subprocess.run(command, check=True, capture_output=True)
+
+
+for _module in IMPORT_MODULES:
+    _import_case(_module)
+
+
+def import_profile(module, top=15):
+    """Return the ``top`` slowest imports of ``module`` as (cumulative_ms, name) pairs."""
+    if module.endswith('.py'):
+        module = module[:-3]
+    completed = subprocess.run(_import_command(module), capture_output=True, text=True)
+    rows = []
+    for line in completed.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative) / 1000.0, name.rstrip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def run_case(name, iterations=None):
+    """Time one case in this process and return its result dict."""
+    spec = CASES[name]
+    iterations = iterations or spec['iterations']
+    try:
+        fn = spec['setup']()
+    except Skip as e:
+        return {'case': name, 'skipped': str(e)}
+
+    # One untimed call so lazy imports and first-call allocations are excluded
+    # (load cases clear the model cache themselves, so every timed call is cold);
+    # its duration is reported as the cold first-call latency
+    start = time.perf_counter()
+    fn()
+    first_ms = (time.perf_counter() - start) * 1000.0
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+
+    from tracing import peak_rss_mb
+
+    durations_ms = np.array(durations) * 1000.0
+    return {
+        'case': name,
+        'iterations': iterations,
+        'rows': spec['rows'],
+        'p50_ms': float(np.percentile(durations_ms, 50)),
+        'p99_ms': float(np.percentile(durations_ms, 99)),
+        'mean_ms': float(durations_ms.mean()),
+        'first_ms': first_ms,
+        'rows_per_second': spec['rows'] * iterations / sum(durations),
+        'peak_rss_mb': peak_rss_mb(children=spec['child_rss']),
+    }
+
+
+def _run_in_subprocess(name, iterations):
+    command = [sys.executable, os.path.abspath(__file__), '--run-case', name]
+    if iterations:
+        command += ['--iterations', str(iterations)]
+    # Keep benchmark spans out of the production trace file
+    env = dict(os.environ, HEALTHGUARD_TRACE_FILE='')
+    completed = subprocess.run(command, capture_output=True, text=True, env=env)
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()
+        return {'case': name, 'error': error[-1] if error else f"exit status {completed.returncode}"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline, threshold):
+    """Return a list of regression messages for ``results`` against ``baseline``."""
+    regressions = []
+    for result in results:
+        previous = baseline.get(result['case'])
+        if previous is None or 'p50_ms' not in result or 'p50_ms' not in previous:
+            continue
+        for metric, higher_is_worse in COMPARED_METRICS.items():
+            old, new = previous[metric], result[metric]
+            if not old or not new:
+                continue
+            ratio = new / old if higher_is_worse else old / new
+            if ratio > 1 + threshold:
+                regressions.append(f"{result['case']}: {metric} {old:,.2f} -> {new:,.2f} ({ratio:.2f}x worse)")
+    return regressions
+
+
+def _print_results(results):
+    print(f"{'case':<26}{'first ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'rows/s':>14}{'peak RSS MB':>13}")
+    for result in results:
+        if 'p50_ms' in result:
+            print(f"{result['case']:<26}{result['first_ms']:>10.2f}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+                  f"{result['rows_per_second']:>14,.0f}{result['peak_rss_mb']:>13,.0f}")
+        else:
+            print(f"{result['case']:<26}  {'skipped: ' + result['skipped'] if 'skipped' in result else 'error: ' + result['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark model loads, predictions and page renders")
+    parser.add_argument('--cases', nargs='*', default=[], help="Only run cases whose name contains one of these")
+    parser.add_argument('--iterations', type=int, help="Override every case's iteration count")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="Write the results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed relative slowdown before a case fails (0.25 = 25%%)")
+    parser.add_argument('--output', help="Also write the results to this JSON file")
+    parser.add_argument('--import-profile', metavar='MODULE', help="Print the slowest imports of MODULE and exit")
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(run_case(args.run_case, args.iterations)))
+        return
+    if args.import_profile:
+        for cumulative_ms, name in import_profile(args.import_profile):
+            print(f"{cumulative_ms:10.1f} ms  {name}")
+        return
+
+    names = [name for name in CASES if not args.cases or any(pattern in name for pattern in args.cases)]
+    results = []
+    for name in names:
+        print(f"Running {name}...", file=sys.stderr)
+        results.append(_run_in_subprocess(name, args.iterations))
+    _print_results(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    measured = {result['case']: result for result in results if 'p50_ms' in result}
+    if args.save_baseline:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            baseline = {}
+        baseline.update(measured)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Saved {len(measured)} cases to {args.baseline}")
+        return
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        sys.exit(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+
+    regressions = compare(results, baseline, args.threshold)
+    errors = [result['case'] for result in results if 'error' in result]
+    unrecorded = [name for name in measured if 'p50_ms' not in baseline.get(name, {})]
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    for name in errors:
+        print(f"ERROR {name}")
+    for name in unrecorded:
+        print(f"NO BASELINE {name} (run with --save-baseline to record it)")
+    if regressions or errors or unrecorded:
+        sys.exit(1)
+    print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,579 @@
+"""Compile the cardiovascular tree ensemble into flat NumPy arrays.
+
+``export`` flattens a fitted XGBoost classifier or scikit-learn tree
+ensemble (unwrapped from a pipeline, hyperparameter search or AutoML result
+first) into contiguous arrays saved in one ``.npz`` file:
+
+    feature       split feature index per node
+    threshold     split threshold per node
+    children      index of the left child (the right child follows it), -1 at leaves
+    default_left  direction taken by missing values
+    value         leaf outputs, one column per output
+    cover         training weight reaching each node
+    roots         index of each tree's root node
+
+``CompiledEnsemble`` scores batches from those arrays with nothing but NumPy,
+reproducing the library's arithmetic (float32 inputs, the same split
+comparison, tree-ordered accumulation and the C library's exp) so that its
+``predict_proba`` equals the original model's bit for bit. The split
+thresholds of the few cardio features cut the inputs into a small grid, so
+after the first batches every cell's output is tabulated and a batch is
+scored with one binary search per feature. ``contributions``
+attributes each prediction to the input features with exact TreeSHAP values
+computed from the same arrays.
+
+    python cardio_compiled.py gpu_automl_model.pkl gpu_automl_model.npz
+
+The command refuses to write the file unless that holds on the training data
+and on the page's whole input grid. Point ``HEALTHGUARD_CARDIO_MODEL`` at the
+``.npz`` to serve it.
+"""
+import argparse
+import ctypes
+import ctypes.util
+import json
+import math
+import sys
+
+import numpy as np
+
+# How tree outputs become a probability
+KIND_MARGIN = 'margin'  # sigmoid(base + sum of leaves), XGBoost / gradient boosting
+KIND_MEAN = 'mean'      # mean of per-tree class fractions, random forests
+
+# Rows traversed together; keeps the (rows, trees) working arrays in cache
+CHUNK_ROWS = 2048
+
+# Largest input grid (product over features of split thresholds + 1) whose
+# per-cell outputs are tabulated
+MAX_TABLE_CELLS = 1 << 20
+
+# Upper bound on the (rows, nodes) weight matrix built per feature subset by contributions()
+CONTRIBUTION_CELLS = 1 << 22
+
+
+def _load_libm():
+    name = ctypes.util.find_library('m')
+    if name is None:
+        return None
+    libm = ctypes.CDLL(name)
+    libm.exp.restype, libm.exp.argtypes = ctypes.c_double, [ctypes.c_double]
+    libm.expf.restype, libm.expf.argtypes = ctypes.c_float, [ctypes.c_float]
+    libm.logf.restype, libm.logf.argtypes = ctypes.c_float, [ctypes.c_float]
+    return libm
+
+
+# XGBoost and SciPy call the C library's exp/log; NumPy's vectorized versions
+# round differently for a small fraction of inputs
+_libm = _load_libm()
+
+
+def _libm_exp(values):
+    function = _libm.expf if values.dtype == np.float32 else _libm.exp
+    return np.fromiter(map(function, values.tolist()), dtype=values.dtype, count=len(values))
+
+
+def _exp(values):
+    """The C library's exp of every element, computed with NumPy wherever that provably agrees.
+
+    exp is evaluated in a wider type and rounded. Both that and the C library
+    are within a hair of half an ulp, so they can only round differently when
+    the exact result lies next to a rounding midpoint (about 2% of inputs);
+    only those, and binade edges, subnormals and infinities, go to the C
+    library one by one.
+    """
+    if _libm is None:
+        return np.exp(values)
+    wide = np.float64 if values.dtype == np.float32 else np.longdouble
+    if np.finfo(wide).nmant < 2 * np.finfo(values.dtype).nmant:
+        # long double is plain double on this platform
+        return _libm_exp(values)
+    with np.errstate(over='ignore', invalid='ignore'):
+        exact = np.exp(values.astype(wide))
+        result = exact.astype(values.dtype)
+        # Position of the exact value between the neighbouring results, in ulps
+        offset = (exact - result.astype(wide)) / np.spacing(result).astype(wide)
+    uncertain = ~(np.abs(np.abs(offset) - 0.5) >= 0.01)
+    uncertain |= np.frexp(result)[0] == 0.5
+    uncertain |= ~(np.abs(result) >= np.finfo(values.dtype).tiny) | ~np.isfinite(result)
+    if uncertain.any():
+        result[uncertain] = _libm_exp(values[uncertain])
+    return result
+
+
+def _logf(value):
+    if _libm is None:
+        return np.log(np.float32(value))
+    return np.float32(_libm.logf(float(value)))
+
+
+class CompiledEnsemble:
+    """Array-backed binary tree ensemble with a scikit-learn style predict_proba."""
+
+    classes_ = np.array([0, 1])
+
+    def __init__(self, arrays, meta):
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.children = arrays['children']
+        self.default_left = arrays['default_left']
+        self.value = arrays['value']
+        self.cover = arrays['cover']
+        self.roots = arrays['roots']
+        self.meta = meta
+        self.feature_names = meta['feature_names']
+        self.kind = meta['kind']
+        self.accumulate_dtype = np.dtype(meta['accumulate_dtype'])
+
+        # Leaves point at themselves so every row can take max_depth steps
+        leaf = self.children < 0
+        self._next = np.where(leaf, np.arange(len(leaf)), self.children).astype(np.intp)
+        self._feature = self.feature.astype(np.intp)
+        # A NaN threshold compares false, so rows at a leaf never step right,
+        # missing values included
+        self._split_threshold = np.where(leaf, np.nan, self.threshold).astype(self.threshold.dtype)
+        self._split_default_left = self.default_left | leaf
+
+        # The distinct thresholds of each feature cut the input space into a
+        # grid of cells in which every tree reaches the same leaf
+        self._cuts = [np.unique(self.threshold[~leaf & (self.feature == f)]) for f in range(len(self.feature_names))]
+        self._shape = [len(cuts) + 1 for cuts in self._cuts]
+        self._table = None
+        self._rows_traversed = 0
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files if name != 'meta'}
+            meta = json.loads(str(data['meta']))
+        return cls(arrays, meta)
+
+    def save(self, file):
+        """Write the arrays to ``file``, a path or a binary file object."""
+        arrays = {
+            'feature': self.feature, 'threshold': self.threshold, 'children': self.children,
+            'default_left': self.default_left, 'value': self.value, 'cover': self.cover,
+            'roots': self.roots,
+        }
+        if hasattr(file, 'write'):
+            np.savez(file, meta=np.array(json.dumps(self.meta)), **arrays)
+            return
+        with open(file, 'wb') as f:
+            np.savez(f, meta=np.array(json.dumps(self.meta)), **arrays)
+
+    def _matrix(self, X):
+        if hasattr(X, 'columns'):
+            X = X[self.feature_names].to_numpy()
+        return np.asarray(X, dtype=np.float32)
+
+    def _go_right(self, x, node):
+        threshold = self.threshold[node]
+        # XGBoost sends x < threshold left, scikit-learn x <= threshold
+        go_right = x >= threshold if self.meta['comparison'] == '<' else x > threshold
+        missing = np.isnan(x)
+        if missing.any():
+            go_right = np.where(missing, ~self.default_left[node], go_right)
+        return go_right
+
+    def _apply_rows(self, X, split_threshold=None, right_on_equal=None):
+        if split_threshold is None:
+            split_threshold = self._split_threshold
+            right_on_equal = self.meta['comparison'] == '<'
+        leaves = np.empty((len(X), len(self.roots)), dtype=np.intp)
+        for start in range(0, len(X), CHUNK_ROWS):
+            chunk = X[start:start + CHUNK_ROWS]
+            flat = chunk.ravel()
+            has_missing = np.isnan(flat).any()
+            row_offset = (np.arange(len(chunk)) * chunk.shape[1])[:, None]
+            node = np.broadcast_to(self.roots.astype(np.intp), (len(chunk), len(self.roots))).copy()
+            for _ in range(self.meta['max_depth']):
+                x = flat.take(row_offset + self._feature.take(node))
+                threshold = split_threshold.take(node)
+                go_right = x >= threshold if right_on_equal else x > threshold
+                if has_missing:
+                    go_right |= np.isnan(x) & ~self._split_default_left.take(node)
+                node = self._next.take(node) + go_right
+            leaves[start:start + len(chunk)] = node
+        return leaves
+
+    def apply(self, X):
+        """Leaf node index reached in every tree, shape (rows, trees)."""
+        X = self._matrix(X)
+        if len(X) <= 1:
+            return self._apply_rows(X)
+        # Form inputs repeat heavily (integer ages, BMI to 0.1), so each
+        # distinct row is traversed once; rows are compared as raw bytes,
+        # which is much faster than np.unique(axis=0)
+        rows = np.ascontiguousarray(X).view(np.dtype((np.void, X.dtype.itemsize * X.shape[1]))).ravel()
+        unique, first, inverse = np.unique(rows, return_index=True, return_inverse=True)
+        if len(unique) == len(X):
+            return self._apply_rows(X)
+        return self._apply_rows(X[first])[inverse]
+
+    def _raw_from_leaves(self, leaves):
+        values = self.value[leaves].astype(self.accumulate_dtype)
+        base = np.full((len(values), 1, values.shape[2]), self.meta['base'], dtype=self.accumulate_dtype)
+        # cumsum adds trees strictly in order, like the libraries do
+        total = np.cumsum(np.concatenate([base, values], axis=1), axis=1)[:, -1]
+        if self.kind == KIND_MEAN:
+            return total / self.accumulate_dtype.type(len(self.roots))
+        return total
+
+    def _build_table(self):
+        """Raw output of every grid cell, computed by traversing one point per cell."""
+        split = self.children >= 0
+        # Thresholds as cut numbers: a split on the k-th cut (from 1) sends cells >= k right
+        cut_threshold = np.full(len(self.children), np.nan, dtype=np.float32)
+        for f, cuts in enumerate(self._cuts):
+            nodes = split & (self.feature == f)
+            cut_threshold[nodes] = np.searchsorted(cuts, self.threshold[nodes]) + 1
+        cells = np.indices(self._shape, dtype=np.float32).reshape(len(self._shape), -1).T
+        return np.concatenate([
+            self._raw_from_leaves(self._apply_rows(cells[start:start + CHUNK_ROWS], cut_threshold, True))
+            for start in range(0, len(cells), CHUNK_ROWS)
+        ])
+
+    def _cell(self, X):
+        """Grid cell of every row (rows with missing values get an arbitrary one)."""
+        side = 'right' if self.meta['comparison'] == '<' else 'left'
+        cell = np.zeros(len(X), dtype=np.intp)
+        for f, (cuts, size) in enumerate(zip(self._cuts, self._shape)):
+            cell = cell * size + np.searchsorted(cuts, X[:, f], side=side)
+        return cell
+
+    def raw_output(self, X):
+        """Per-row margin, shape (rows, 1), or mean class fractions, shape (rows, 2).
+
+        Once as many rows have been scored as the input grid has cells, the
+        output of every cell is tabulated (with the same arithmetic), and
+        rows without missing values are looked up instead of traversed.
+        """
+        X = self._matrix(X)
+        table = self._table
+        cells = math.prod(self._shape)
+        if table is None and cells <= MAX_TABLE_CELLS:
+            self._rows_traversed += len(X)
+            if self._rows_traversed >= cells:
+                table = self._table = self._build_table()
+        if table is None:
+            return self._raw_from_leaves(self.apply(X))
+        raw = table[self._cell(X)]
+        missing = np.isnan(X).any(axis=1)
+        if missing.any():
+            raw[missing] = self._raw_from_leaves(self.apply(X[missing]))
+        return raw
+
+    def predict_proba(self, X):
+        raw = self.raw_output(X)
+        if self.kind == KIND_MEAN:
+            # Forests average each class column separately
+            return raw
+        one = self.accumulate_dtype.type(1)
+        p1 = one / (one + _exp(-raw[:, 0]))
+        return np.column_stack([one - p1, p1])
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    def _levels(self):
+        # Split nodes grouped by depth across all trees, root level first
+        levels = []
+        nodes = self.roots.astype(np.intp)
+        while len(nodes):
+            nodes = nodes[self.children[nodes] >= 0]
+            if len(nodes):
+                levels.append(nodes)
+            left = self._next[nodes]
+            nodes = np.concatenate([left, left + 1])
+        return levels
+
+    def _expected_output(self, X, known, levels):
+        """Summed tree output when only the ``known`` features of each row are given.
+
+        Splits on a known feature follow the row; splits on unknown features
+        average both children weighted by the training cover, as in TreeSHAP.
+        """
+        # Node-major, so each level gathers and scatters whole contiguous rows
+        weight = np.zeros((len(self.children), len(X)))
+        weight[self.roots] = 1.0
+        for nodes in levels:
+            left = self._next[nodes]
+            feature = self._feature[nodes]
+            go_right = self._go_right(X[:, feature], nodes).T
+            is_known = known[feature][:, None]
+            right_share = np.where(is_known, go_right, (self.cover[left + 1] / self.cover[nodes])[:, None])
+            left_share = np.where(is_known, ~go_right, (self.cover[left] / self.cover[nodes])[:, None])
+            weight[left] = weight[nodes] * left_share
+            weight[left + 1] = weight[nodes] * right_share
+        leaves = self.children < 0
+        # Margin models have one output; forests attribute the class-1 fraction
+        output = self.value[leaves, -1].astype(np.float64)
+        total = output @ weight[leaves]
+        if self.kind == KIND_MEAN:
+            return total / len(self.roots)
+        return total + self.meta['base']
+
+    def contributions(self, X):
+        """Exact TreeSHAP contribution of each feature, shape (rows, features + 1).
+
+        The last column is the expected output over the training data, and a
+        row's contributions add up to its raw output: the log-odds for boosted
+        models, the class-1 probability for forests. Shapley values are
+        computed over every feature subset, which stays cheap for the few
+        features of the cardio model.
+        """
+        X = self._matrix(X)
+        n_features = X.shape[1]
+        unique, inverse = np.unique(X, axis=0, return_inverse=True)
+        levels = self._levels()
+        subsets = range(1 << n_features)
+        known = [np.array([(subset >> i) & 1 for i in range(n_features)], dtype=bool) for subset in subsets]
+
+        phi = np.zeros((len(unique), n_features + 1))
+        chunk_rows = max(1, CONTRIBUTION_CELLS // len(self.children))
+        for start in range(0, len(unique), chunk_rows):
+            chunk = unique[start:start + chunk_rows]
+            expected = [self._expected_output(chunk, known[subset], levels) for subset in subsets]
+            for i in range(n_features):
+                for subset in subsets:
+                    if subset >> i & 1:
+                        continue
+                    size = bin(subset).count('1')
+                    weight = (math.factorial(size) * math.factorial(n_features - size - 1)
+                              / math.factorial(n_features))
+                    phi[start:start + len(chunk), i] += weight * (expected[subset | 1 << i] - expected[subset])
+            phi[start:start + len(chunk), n_features] = expected[0]
+        return phi[inverse.ravel()]
+
+
+def _relayout(left, right, arrays):
+    """Renumber one tree breadth-first so every right child directly follows its left child."""
+    order = [0]
+    children = []
+    for node in order:
+        if left[node] < 0:
+            children.append(-1)
+        else:
+            children.append(len(order))
+            order.extend([left[node], right[node]])
+    order = np.array(order)
+    part = {name: array[order] for name, array in arrays.items()}
+    part['children'] = np.array(children, dtype=np.int32)
+    return part
+
+
+def _tree_depth(children):
+    depth = np.zeros(len(children), dtype=np.int32)
+    for node in range(len(children)):
+        if children[node] >= 0:
+            depth[children[node]:children[node] + 2] = depth[node] + 1
+    return int(depth.max())
+
+
+def _from_xgboost(model, feature_names):
+    booster = model.get_booster()
+    config = json.loads(booster.save_raw('json'))['learner']
+    objective = config['objective']['name']
+    if objective != 'binary:logistic':
+        raise NotImplementedError(f"Unsupported XGBoost objective: {objective}")
+
+    gbtree = config['gradient_booster']['model']
+    trees = gbtree['trees']
+    best_iteration = booster.attr('best_iteration')
+    if best_iteration is not None:
+        # Each boosting round adds num_parallel_tree trees
+        trees = trees[:(int(best_iteration) + 1) * int(gbtree['gbtree_model_param']['num_parallel_tree'])]
+    if any(tree['categories_nodes'] for tree in trees):
+        raise NotImplementedError("Categorical XGBoost splits are not supported")
+
+    # Same float32 steps as XGBoost's ProbToMargin for the logistic objective
+    base_score = np.float32(config['learner_model_param']['base_score'].strip('[]'))
+    base = -_logf(np.float32(1) / base_score - np.float32(1))
+
+    parts = []
+    for tree in trees:
+        left = np.array(tree['left_children'], dtype=np.int32)
+        leaf = left < 0
+        # Leaf values live in split_conditions for leaf nodes
+        conditions = np.array(tree['split_conditions'], dtype=np.float32)
+        parts.append(_relayout(left, np.array(tree['right_children'], dtype=np.int32), {
+            'feature': np.where(leaf, 0, np.array(tree['split_indices'], dtype=np.int32)),
+            'threshold': np.where(leaf, 0, conditions).astype(np.float32),
+            'default_left': np.array(tree['default_left'], dtype=bool),
+            'value': np.where(leaf, conditions, 0).astype(np.float32)[:, None],
+            'cover': np.array(tree['sum_hessian'], dtype=np.float64),
+        }))
+    meta = {
+        'kind': KIND_MARGIN, 'comparison': '<', 'accumulate_dtype': 'float32', 'base': float(base),
+        'feature_names': list(config.get('feature_names') or feature_names),
+    }
+    return parts, meta
+
+
+def _sklearn_tree_part(tree, leaf_value):
+    tree_ = tree.tree_
+    leaf = tree_.children_left < 0
+    missing_left = getattr(tree_, 'missing_go_to_left', np.zeros(tree_.node_count, dtype=np.uint8))
+    return _relayout(tree_.children_left, tree_.children_right, {
+        'feature': np.where(leaf, 0, tree_.feature).astype(np.int32),
+        'threshold': np.where(leaf, 0, tree_.threshold),
+        'default_left': missing_left.astype(bool),
+        'value': np.where(leaf[:, None], leaf_value, 0.0),
+        'cover': tree_.weighted_n_node_samples.astype(np.float64),
+    })
+
+
+def _class_fractions(tree):
+    value = tree.tree_.value[:, 0, :]
+    return value / value.sum(axis=1, keepdims=True)
+
+
+def _from_sklearn(model, feature_names):
+    from sklearn.ensemble import GradientBoostingClassifier
+    from sklearn.tree import DecisionTreeClassifier
+
+    if list(model.classes_) != [0, 1]:
+        raise NotImplementedError(f"Expected classes [0, 1], got {list(model.classes_)}")
+
+    if isinstance(model, GradientBoostingClassifier):
+        if model.init_ == 'zero':
+            base = 0.0
+        else:
+            base = float(model._raw_predict_init(np.zeros((1, model.n_features_in_), dtype=np.float32))[0, 0])
+        parts = [
+            _sklearn_tree_part(tree, model.learning_rate * tree.tree_.value[:, 0, :1])
+            for tree in model.estimators_[:, 0]
+        ]
+        meta = {'kind': KIND_MARGIN, 'base': base}
+    else:
+        trees = [model] if isinstance(model, DecisionTreeClassifier) else model.estimators_
+        parts = [_sklearn_tree_part(tree, _class_fractions(tree)) for tree in trees]
+        meta = {'kind': KIND_MEAN, 'base': 0.0}
+
+    meta.update({
+        'comparison': '<=', 'accumulate_dtype': 'float64',
+        'feature_names': list(getattr(model, 'feature_names_in_', feature_names)),
+    })
+    return parts, meta
+
+
+SUPPORTED_ESTIMATORS = (
+    'xgboost.XGBClassifier', 'sklearn.tree.DecisionTreeClassifier', 'sklearn.ensemble.RandomForestClassifier',
+    'sklearn.ensemble.ExtraTreesClassifier', 'sklearn.ensemble.GradientBoostingClassifier',
+)
+
+
+def _supported_types(module):
+    if module.startswith('xgboost'):
+        from xgboost import XGBClassifier
+        return (XGBClassifier,)
+    if module.startswith('sklearn'):
+        from sklearn.ensemble import ExtraTreesClassifier, GradientBoostingClassifier, RandomForestClassifier
+        from sklearn.tree import DecisionTreeClassifier
+        return (DecisionTreeClassifier, RandomForestClassifier, ExtraTreesClassifier, GradientBoostingClassifier)
+    return ()
+
+
+def fitted_estimator(model):
+    """The fitted estimator inside a pipeline, hyperparameter search or AutoML result.
+
+    Unwraps scikit-learn pipelines whose other steps are passthrough, search
+    objects (``best_estimator_``), TPOT (``fitted_pipeline_``) and FLAML
+    (``model.estimator``), repeatedly, and returns anything else unchanged.
+    """
+    while True:
+        steps = getattr(model, 'steps', None)
+        if isinstance(steps, list) and steps:
+            transforms = [name for name, step in steps[:-1] if step is not None and step != 'passthrough']
+            if transforms:
+                raise TypeError(f"Cannot compile a pipeline that transforms its inputs (steps: {', '.join(transforms)})")
+            model = steps[-1][1]
+        elif getattr(model, 'best_estimator_', None) is not None:
+            model = model.best_estimator_
+        elif getattr(model, 'fitted_pipeline_', None) is not None:
+            model = model.fitted_pipeline_
+        elif getattr(getattr(model, 'model', None), 'estimator', None) is not None:
+            model = model.model.estimator
+        else:
+            return model
+
+
+def export(model, feature_names=None):
+    """Flatten a fitted tree ensemble, or the one inside a wrapper (see fitted_estimator), into a CompiledEnsemble."""
+    model = fitted_estimator(model)
+    module = type(model).__module__
+    if not isinstance(model, _supported_types(module)):
+        raise TypeError(f"Cannot compile {type(model).__name__}; supported estimators: "
+                        f"{', '.join(SUPPORTED_ESTIMATORS)}, alone or inside a pipeline, search or AutoML result")
+    if module.startswith('xgboost'):
+        parts, meta = _from_xgboost(model, feature_names)
+    else:
+        parts, meta = _from_sklearn(model, feature_names)
+
+    # Concatenate the trees, shifting child indices by each tree's offset
+    offsets = np.cumsum([0] + [len(part['children']) for part in parts[:-1]])
+    arrays = {
+        name: np.concatenate([part[name] for part in parts])
+        for name in ('feature', 'threshold', 'default_left', 'value', 'cover')
+    }
+    arrays['children'] = np.concatenate([
+        np.where(part['children'] >= 0, part['children'] + offset, -1)
+        for part, offset in zip(parts, offsets)
+    ]).astype(np.int32)
+    arrays['roots'] = offsets.astype(np.int32)
+    meta['max_depth'] = max(_tree_depth(part['children']) for part in parts)
+    meta['source'] = f"{module}.{type(model).__name__}"
+    return CompiledEnsemble(arrays, meta)
+
+
+def verify(model, compiled, X):
+    """Compare predict_proba of both models; returns (identical, max_abs_difference)."""
+    expected = np.asarray(model.predict_proba(X))
+    actual = compiled.predict_proba(X)
+    identical = expected.dtype == actual.dtype and np.array_equal(expected, actual)
+    return bool(identical), float(np.max(np.abs(expected - actual)))
+
+
+def verify_cardio_inputs(model, compiled):
+    """verify on the training rows and the page's whole input grid, printing each result.
+
+    Returns whether predict_proba was bit-identical on both.
+    """
+    import cardio_data
+    import cardio_lookup
+    import cardio_model
+
+    features, _ = cardio_data.load_training_data()
+    identical = True
+    for name, X in (('training rows', features), ('input grid', cardio_lookup._grid())):
+        X = X[cardio_model.FEATURE_COLUMNS]
+        same, difference = verify(model, compiled, X)
+        identical &= same
+        print(f"{name}: {len(X):,} rows, bit-identical={same}, max |diff|={difference:.3e}")
+    return identical
+
+
+def main():
+    import pickle
+
+    import cardio_model
+    import model_cache
+
+    parser = argparse.ArgumentParser(description="Compile the cardiovascular model to NumPy arrays")
+    parser.add_argument('model', nargs='?', default='gpu_automl_model.pkl')
+    parser.add_argument('output', nargs='?', default='gpu_automl_model.npz')
+    parser.add_argument('--force', action='store_true', help="Write the file even if verification fails")
+    args = parser.parse_args()
+
+    with open(args.model, 'rb') as f:
+        model = pickle.load(f)
+    compiled = export(model, cardio_model.FEATURE_COLUMNS)
+
+    if not verify_cardio_inputs(model, compiled) and not args.force:
+        sys.exit("Compiled model does not reproduce predict_proba exactly; not written (use --force)")
+    model_cache.write_atomic(args.output, compiled.save)
+    print(f"Wrote {args.output}: {len(compiled.roots)} trees, {len(compiled.children):,} nodes")
+
+
+if __name__ == '__main__':
+    main()
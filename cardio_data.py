@@ -0,0 +1,160 @@
+"""Loading and feature derivation for dataset/cardio_train.csv.
+
+The raw file records age in days, height/weight, systolic/diastolic blood
+pressure and a 1-3 cholesterol grade. The cardiovascular page asks for age in
+years, BMI and two yes/no flags, so training and analytics derive exactly
+those four features from the raw columns.
+
+Parsing the semicolon-delimited text is slow and the default int64/float64
+dtypes are oversized, so ``load_dataset`` converts the file once into typed
+.npy columns under ``cache/cardio_columns/<csv sha256>/`` and afterwards
+memory-maps them, returning a DataFrame that shares their memory.
+"""
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import model_cache
+from cardio_model import FEATURE_COLUMNS
+
+DATASET_PATH = 'dataset/cardio_train.csv'
+TARGET_COLUMN = 'cardio'
+
+COLUMN_CACHE_DIR = os.path.join(model_cache.CACHE_DIR, 'cardio_columns')
+
+# Smallest dtypes that hold the raw columns
+RAW_DTYPES = {
+    'id': np.int32,
+    'age': np.int16,
+    'gender': np.int8,
+    'height': np.int16,
+    'weight': np.float32,
+    'ap_hi': np.int16,
+    'ap_lo': np.int16,
+    'cholesterol': np.int8,
+    'gluc': np.int8,
+    'smoke': np.int8,
+    'alco': np.int8,
+    'active': np.int8,
+    'cardio': np.int8,
+}
+
+# Same definitions as the page's tooltips
+HIGH_BP_SYSTOLIC = 130
+HIGH_BP_DIASTOLIC = 80
+NORMAL_CHOLESTEROL = 1
+
+# Plausible ranges; the raw file contains typos such as ap_hi = 16020
+PLAUSIBLE_RANGES = {
+    'ap_hi': (60, 250),
+    'ap_lo': (30, 200),
+    'height': (120, 220),
+    'weight': (30, 200),
+}
+
+
+def read_csv(path=DATASET_PATH, **kwargs):
+    """Parse the raw semicolon-delimited file with compact dtypes."""
+    return pd.read_csv(path, sep=';', dtype=RAW_DTYPES, **kwargs)
+
+
+def _stamp(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def csv_sha256(path=DATASET_PATH, cache_dir=COLUMN_CACHE_DIR):
+    """Content hash of ``path``, re-hashed only when its mtime or size changes."""
+    index_path = os.path.join(cache_dir, 'index.json')
+    key = os.path.abspath(path)
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+
+    entry = index.get(key)
+    if entry is not None and entry['stamp'] == _stamp(path):
+        return entry['sha256']
+
+    index[key] = {'stamp': _stamp(path), 'sha256': model_cache.file_sha256(path)}
+    os.makedirs(cache_dir, exist_ok=True)
+    model_cache.write_atomic(index_path, lambda f: f.write(json.dumps(index).encode()))
+    return index[key]['sha256']
+
+
+def build_column_cache(path=DATASET_PATH, cache_dir=COLUMN_CACHE_DIR):
+    """Convert the CSV to one typed .npy file per column and return their directory."""
+    sha256 = csv_sha256(path, cache_dir)
+    target = os.path.join(cache_dir, sha256[:16])
+    if os.path.exists(os.path.join(target, 'columns.json')):
+        return target
+
+    raw_df = read_csv(path)
+    # A directory of our own, so concurrent builds never write into each other's
+    tmp_dir = tempfile.mkdtemp(dir=cache_dir, prefix=sha256[:16] + '.', suffix='.tmp')
+    try:
+        os.chmod(tmp_dir, model_cache.DIR_MODE)
+        for column in raw_df.columns:
+            np.save(os.path.join(tmp_dir, f'{column}.npy'), raw_df[column].to_numpy())
+        with open(os.path.join(tmp_dir, 'columns.json'), 'w') as f:
+            json.dump({'csv_sha256': sha256, 'columns': list(raw_df.columns), 'rows': len(raw_df)}, f)
+        if not os.path.exists(os.path.join(target, 'columns.json')):
+            shutil.rmtree(target, ignore_errors=True)
+            try:
+                os.replace(tmp_dir, target)
+            except OSError:
+                # Another process finished the same (content-addressed) columns first
+                if not os.path.exists(os.path.join(target, 'columns.json')):
+                    raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return target
+
+
+def load_dataset(path=DATASET_PATH, use_cache=True):
+    """Return the raw dataset, memory-mapped from the typed column cache when possible."""
+    if not use_cache:
+        return read_csv(path)
+    try:
+        directory = build_column_cache(path)
+        with open(os.path.join(directory, 'columns.json')) as f:
+            columns = json.load(f)['columns']
+    except OSError as e:
+        print(f"Error using dataset column cache, parsing CSV instead: {e}")
+        return read_csv(path)
+    return pd.DataFrame({
+        column: np.load(os.path.join(directory, f'{column}.npy'), mmap_mode='r')
+        for column in columns
+    }, copy=False)
+
+
+def plausible_rows(raw_df):
+    """Boolean mask of rows whose vitals fall in PLAUSIBLE_RANGES."""
+    mask = raw_df['ap_lo'] <= raw_df['ap_hi']
+    for column, (low, high) in PLAUSIBLE_RANGES.items():
+        mask &= raw_df[column].between(low, high)
+    return mask
+
+
+def derive_features(raw_df):
+    """Return the model's four features (in FEATURE_COLUMNS order) for raw rows."""
+    height_m = raw_df['height'] / 100.0
+    features = pd.DataFrame({
+        'high_bp': ((raw_df['ap_hi'] >= HIGH_BP_SYSTOLIC) | (raw_df['ap_lo'] >= HIGH_BP_DIASTOLIC)).astype(np.int8),
+        'age': (raw_df['age'] // 365.25).astype(np.int16),
+        'high_chol': (raw_df['cholesterol'] > NORMAL_CHOLESTEROL).astype(np.int8),
+        'BMI': (raw_df['weight'] / (height_m * height_m)).round(1).astype(np.float32),
+    }, index=raw_df.index)
+    return features[FEATURE_COLUMNS]
+
+
+def load_training_data(path=DATASET_PATH):
+    """Return ``(features, target)`` for the plausible rows of the dataset."""
+    raw_df = load_dataset(path)
+    raw_df = raw_df[plausible_rows(raw_df)]
+    return derive_features(raw_df), raw_df[TARGET_COLUMN].astype(np.int8)
@@ -0,0 +1,148 @@
+"""Precomputed risk table over the cardiovascular form's whole input space.
+
+The form only allows integer ages 30-100, BMI 15.0-40.0 in 0.1 steps and
+binary blood pressure / cholesterol flags, about 71k combinations. They are
+scored once in a single batch, saved as .npy files and memory-mapped, so a
+submit becomes one array index. The table records the model's content hash
+and is rebuilt as soon as the artifact changes.
+
+Run ``python cardio_lookup.py`` to precompute the table ahead of time.
+"""
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+import cardio_model
+import metrics
+import model_cache
+import tracing
+
+AGES = np.arange(30, 101)
+BMI_MIN, BMI_MAX, BMI_STEP = 15.0, 40.0, 0.1
+BMI_STEPS = int(round((BMI_MAX - BMI_MIN) / BMI_STEP)) + 1
+
+TABLE_DIR = os.path.join(model_cache.CACHE_DIR, "cardio_lookup")
+
+_table = None
+_lock = threading.Lock()
+
+
+def _grid():
+    import pandas as pd
+
+    # Axis order of the stored arrays: high_bp, high_chol, age, BMI
+    high_bp, high_chol, age, bmi_index = np.meshgrid(
+        [0, 1], [0, 1], AGES, np.arange(BMI_STEPS), indexing='ij')
+    return pd.DataFrame({
+        'high_bp': high_bp.ravel(),
+        'age': age.ravel(),
+        'high_chol': high_chol.ravel(),
+        'BMI': np.round(BMI_MIN + bmi_index.ravel() * BMI_STEP, 1),
+    })
+
+
+def build_table(model, sha256, table_dir=TABLE_DIR):
+    """Score the full grid with ``model`` and write it to ``table_dir``."""
+    shape = (2, 2, len(AGES), BMI_STEPS)
+    result = cardio_model.predict_cardiovascular_risk_batch(_grid(), model, source=None)
+
+    os.makedirs(table_dir, exist_ok=True)
+    arrays = {
+        'prediction': result['prediction'].to_numpy(np.int8).reshape(shape),
+        'probability': result['probability'].to_numpy(np.float32).reshape(shape),
+    }
+    for name, array in arrays.items():
+        model_cache.write_atomic(os.path.join(table_dir, f'{name}.npy'), lambda f: np.save(f, array))
+
+    # Written last so a half-built table is never mistaken for a current one
+    model_cache.write_atomic(os.path.join(table_dir, 'meta.json'),
+                             lambda f: f.write(json.dumps({'model_sha256': sha256, 'shape': shape}).encode()))
+
+
+def _read_table(table_dir):
+    try:
+        with open(os.path.join(table_dir, 'meta.json')) as f:
+            meta = json.load(f)
+        return {
+            'model_sha256': meta['model_sha256'],
+            'prediction': np.load(os.path.join(table_dir, 'prediction.npy'), mmap_mode='r'),
+            'probability': np.load(os.path.join(table_dir, 'probability.npy'), mmap_mode='r'),
+        }
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def load_table(table_dir=TABLE_DIR):
+    """Return the memory-mapped table for the current model, rebuilding it if stale."""
+    global _table
+    model = cardio_model.load_model()
+    sha256 = model_cache.fingerprint(cardio_model.MODEL_PATH)
+
+    table = _table
+    if table is not None and table['model_sha256'] == sha256:
+        return table
+
+    with _lock:
+        table = _read_table(table_dir)
+        if table is None or table['model_sha256'] != sha256:
+            build_table(model, sha256, table_dir)
+            table = _read_table(table_dir)
+        _table = table
+        return table
+
+
+def lookup(bmi, age, high_chol, high_bp):
+    """Return ``(prediction, probability)`` from the table, or None outside the grid."""
+    age_index = int(round(age)) - AGES[0]
+    bmi_index = int(round((bmi - BMI_MIN) / BMI_STEP))
+    if not (0 <= age_index < len(AGES) and 0 <= bmi_index < BMI_STEPS):
+        return None
+    if high_bp not in (0, 1) or high_chol not in (0, 1):
+        return None
+
+    start = time.perf_counter()
+    with tracing.span('cardio.table_lookup'):
+        table = load_table()
+        key = (int(high_bp), int(high_chol), age_index, bmi_index)
+        prediction, probability = int(table['prediction'][key]), float(table['probability'][key])
+    metrics.record_predictions('cardio', 'table', time.perf_counter() - start,
+                               {'high' if prediction == 1 else 'low': 1})
+    return prediction, probability
+
+
+def lookup_many(bmi, age, high_chol, high_bp):
+    """Vectorized ``lookup``: ``(prediction, probability)`` arrays, or None if any row is off the grid."""
+    age_index = np.rint(np.asarray(age, dtype=float)).astype(np.intp) - AGES[0]
+    bmi_index = np.rint((np.asarray(bmi, dtype=float) - BMI_MIN) / BMI_STEP).astype(np.intp)
+    high_bp, high_chol = np.asarray(high_bp), np.asarray(high_chol)
+    if not (np.all((0 <= age_index) & (age_index < len(AGES))) and np.all((0 <= bmi_index) & (bmi_index < BMI_STEPS))
+            and np.isin(high_bp, (0, 1)).all() and np.isin(high_chol, (0, 1)).all()):
+        return None
+
+    with tracing.span('cardio.table_lookup', rows=age_index.size):
+        table = load_table()
+        key = (high_bp.astype(np.intp), high_chol.astype(np.intp), age_index, bmi_index)
+        return table['prediction'][key].astype(int), table['probability'][key].astype(float)
+
+
+def lookup_cardiovascular_risk(bmi, age, high_chol, high_bp):
+    """Drop-in for predict_cardiovascular_risk that answers from the table when possible."""
+    try:
+        result = lookup(bmi, age, high_chol, high_bp)
+        if result is not None:
+            metrics.inc('healthguard_cache_hits_total', cache='cardio_lookup')
+            return result
+    except Exception as e:
+        metrics.inc('healthguard_prediction_errors_total', module='cardio_lookup')
+        print(f"Error reading risk lookup table: {e}")
+    metrics.inc('healthguard_cache_misses_total', cache='cardio_lookup')
+    return cardio_model.predict_cardiovascular_risk(bmi, age, high_chol, high_bp)
+
+
+if __name__ == '__main__':
+    table = load_table()
+    print(f"Risk table for model {table['model_sha256'][:12]} "
+          f"({table['probability'].size:,} cells) in {TABLE_DIR}")
@@ -0,0 +1,171 @@
+import os
+import pickle
+import time
+
+import numpy as np
+
+import metrics
+import model_cache
+import tracing
+from prediction_cache import LRUCache
+
+# A .npz path serves the array-compiled ensemble written by cardio_compiled.py
+MODEL_PATH = os.environ.get('HEALTHGUARD_CARDIO_MODEL', 'gpu_automl_model.pkl')
+
+# Column order the cardiovascular model was trained on
+FEATURE_COLUMNS = ['high_bp', 'age', 'high_chol', 'BMI']
+
+# Per-feature TreeSHAP contributions added by contributions=True, then the expected value
+CONTRIBUTION_COLUMNS = [f'contrib_{column}' for column in FEATURE_COLUMNS] + ['contrib_bias']
+
+# Memoized single-patient contributions for the page
+contribution_memo = LRUCache(int(os.environ.get('HEALTHGUARD_CARDIO_MEMO_ENTRIES', '10000')))
+metrics.register_cache('cardio_contributions', contribution_memo)
+
+_compiled = None
+
+
+def _load_artifact(path):
+    if path.endswith('.npz'):
+        # NumPy arrays only; the training library is never imported
+        import cardio_compiled
+        return cardio_compiled.CompiledEnsemble.load(path)
+    with open(path, 'rb') as model_file:
+        return pickle.load(model_file)
+
+
+def load_model(path=MODEL_PATH):
+    """Return the shared model instance, reloading only when the artifact changes."""
+    return model_cache.get_model(path, _load_artifact)
+
+
+def compiled_model(model):
+    """Array form of ``model`` for contributions; a pickled ensemble is flattened once."""
+    global _compiled
+    import cardio_compiled
+
+    if isinstance(model, cardio_compiled.CompiledEnsemble):
+        return model
+    compiled = _compiled
+    if compiled is None or compiled[0] is not model:
+        compiled = _compiled = (model, cardio_compiled.export(model, FEATURE_COLUMNS))
+    return compiled[1]
+
+
+def prepare_batch(raw_df):
+    """Validate a table of patients and encode it like the form (Yes/No flags as 1/0)."""
+    import pandas as pd
+
+    missing = [column for column in FEATURE_COLUMNS if column not in raw_df.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+    data = raw_df[FEATURE_COLUMNS].copy()
+    for column in ('high_bp', 'high_chol'):
+        if not pd.api.types.is_numeric_dtype(data[column]):
+            data[column] = data[column].astype(str).str.strip().str.lower().map(
+                {'yes': 1, 'no': 0, '1': 1, '0': 0})
+    data = data.apply(pd.to_numeric, errors='coerce')
+    if data.isna().any().any():
+        bad_rows = data.index[data.isna().any(axis=1)][:5].tolist()
+        raise ValueError(f"Invalid or empty values in rows {bad_rows}")
+    return data
+
+
+def predict_cardiovascular_risk_batch(patients, model=None, source='model', contributions=False):
+    """Score many patients at once.
+
+    ``patients`` is a DataFrame, or a mapping of equal-length arrays, with the
+    ``high_bp``, ``age``, ``high_chol`` and ``BMI`` columns. Returns a DataFrame
+    with ``prediction`` and ``probability`` columns aligned to the input rows.
+    Class and probability come from a single ``predict_proba`` pass.
+    ``source`` labels the call in the prediction metrics (None: not recorded).
+    ``contributions=True`` adds the CONTRIBUTION_COLUMNS: each feature's
+    TreeSHAP contribution to the log-odds (the probability for forests).
+    """
+    # Imported on first use so the page renders without loading pandas
+    import pandas as pd
+
+    if model is None:
+        with tracing.span('cardio.model_load'):
+            model = load_model()
+
+    start = time.perf_counter()
+    with tracing.span('cardio.frame_build'):
+        if not isinstance(patients, pd.DataFrame):
+            patients = pd.DataFrame(patients)
+        data = patients[FEATURE_COLUMNS]
+
+    with tracing.span('cardio.predict', rows=len(data)):
+        if hasattr(model, 'predict_proba'):
+            proba = np.asarray(model.predict_proba(data))
+        else:
+            proba = None
+            prediction = np.asarray(model.predict(data))
+
+    with tracing.span('cardio.probability_extraction'):
+        if proba is not None:
+            classes = np.asarray(getattr(model, 'classes_', np.arange(proba.shape[1])))
+            prediction = classes[proba.argmax(axis=1)]
+            probability = proba[:, 1]
+        else:
+            probability = np.full(len(data), np.nan)
+
+    result = pd.DataFrame({
+        'prediction': prediction.astype(int),
+        'probability': probability,
+    }, index=patients.index)
+    if contributions:
+        with tracing.span('cardio.contributions', rows=len(data)):
+            compiled = compiled_model(model)
+            columns = [f'contrib_{name}' for name in compiled.feature_names] + ['contrib_bias']
+            result[columns] = compiled.contributions(data)
+            result = result[['prediction', 'probability'] + CONTRIBUTION_COLUMNS]
+
+    if source is not None:
+        high = int(np.count_nonzero(prediction == 1))
+        metrics.record_predictions('cardio', source, time.perf_counter() - start,
+                                   {'high': high, 'low': len(prediction) - high})
+    return result
+
+
+# Single-patient entry point used by the Streamlit page
+def predict_cardiovascular_risk(bmi, age, high_chol, high_bp):
+    try:
+        result = predict_cardiovascular_risk_batch({
+            'high_bp': [high_bp],
+            'age': [age],
+            'high_chol': [high_chol],
+            'BMI': [bmi]
+        })
+        proba = result['probability'].iloc[0]
+        return int(result['prediction'].iloc[0]), None if np.isnan(proba) else proba
+    except Exception as e:
+        metrics.inc('healthguard_prediction_errors_total', module='cardio')
+        print(f"Error during prediction: {e}")
+        return None, None
+
+
+def explain_cardiovascular_risk(bmi, age, high_chol, high_bp):
+    """Feature -> TreeSHAP contribution for one patient, plus the ``bias`` (expected value).
+
+    Inputs are normalized like the lookup table (BMI to 0.1, integer age) and
+    the result is memoized per profile and model version.
+    """
+    try:
+        model = load_model()
+        contribution_memo.bind(model_cache.fingerprint(MODEL_PATH))
+        key = (int(high_bp), int(high_chol), int(round(age)), round(float(bmi), 1))
+        contributions = contribution_memo.get(key)
+        if contributions is None:
+            patient = {'high_bp': key[0], 'age': key[2], 'high_chol': key[1], 'BMI': key[3]}
+            with tracing.span('cardio.contributions', rows=1):
+                compiled = compiled_model(model)
+                values = compiled.contributions(np.array([[patient[name] for name in compiled.feature_names]]))[0]
+            contributions = dict(zip(compiled.feature_names + ['bias'], values.tolist()))
+            contribution_memo.put(key, contributions)
+        return contributions
+    except Exception as e:
+        metrics.inc('healthguard_prediction_errors_total', module='cardio_contributions')
+        print(f"Error computing risk contributions: {e}")
+        return None
@@ -0,0 +1,164 @@
+"""Population percentiles of cardiovascular risk scores.
+
+Scores every plausible row of dataset/cardio_train.csv with the current
+model once and stores the probabilities sorted within each stratum of age
+band x gender (plus "all genders" per band), as one memory-mapped score
+array and the offsets of each stratum. Placing a patient in their stratum
+is then two binary searches instead of a rescan of the dataset.
+
+The index records the model's content hash and the dataset's mtime/size and
+is rebuilt as soon as either changes. Run ``python cardio_percentiles.py``
+to build it ahead of time.
+"""
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+import cardio_model
+import model_cache
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# cardio_data.DATASET_PATH; cardio_data is imported only to build, as it loads pandas
+DATASET_PATH = 'dataset/cardio_train.csv'
+
+# Lower edges of the age bands after the first: under 40, 40-49, 50-59, 60 and over
+AGE_BAND_EDGES = [40, 50, 60]
+AGE_BAND_LABELS = ['under 40', '40-49', '50-59', '60 and over']
+
+# Dataset coding; 0 compares against both
+ALL_GENDERS, WOMEN, MEN = 0, 1, 2
+GENDER_LABELS = {ALL_GENDERS: 'all patients', WOMEN: 'women', MEN: 'men'}
+
+INDEX_DIR = os.path.join(model_cache.CACHE_DIR, 'cardio_percentiles')
+
+_index = None
+_lock = threading.Lock()
+
+
+def age_band(age):
+    return np.digitize(age, AGE_BAND_EDGES)
+
+
+def _stratum(band, gender):
+    return band * len(GENDER_LABELS) + gender
+
+
+def _dataset_stamp(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def build_index(model, sha256, index_dir=INDEX_DIR, path=DATASET_PATH):
+    """Score the dataset with ``model`` and write the sorted strata to ``index_dir``."""
+    import cardio_data
+
+    raw_df = cardio_data.load_dataset(path)
+    raw_df = raw_df[cardio_data.plausible_rows(raw_df)]
+    features = cardio_data.derive_features(raw_df)
+    # float32 like the lookup table the page reads its probability from
+    scores = cardio_model.predict_cardiovascular_risk_batch(
+        features, model, source=None)['probability'].to_numpy(np.float32)
+    bands = age_band(features['age'].to_numpy())
+    genders = raw_df['gender'].to_numpy()
+
+    strata, offsets = [], [0]
+    for band in range(len(AGE_BAND_LABELS)):
+        for gender in GENDER_LABELS:
+            mask = bands == band
+            if gender != ALL_GENDERS:
+                mask &= genders == gender
+            strata.append(np.sort(scores[mask]))
+            offsets.append(offsets[-1] + int(mask.sum()))
+
+    os.makedirs(index_dir, exist_ok=True)
+    arrays = {'scores': np.concatenate(strata), 'offsets': np.array(offsets, dtype=np.int64)}
+    for name, array in arrays.items():
+        model_cache.write_atomic(os.path.join(index_dir, f'{name}.npy'), lambda f: np.save(f, array))
+
+    # Written last so a half-built index is never mistaken for a current one
+    meta = {
+        'model_sha256': sha256,
+        'dataset': os.path.abspath(path),
+        'dataset_stamp': _dataset_stamp(path),
+        'age_band_edges': AGE_BAND_EDGES,
+    }
+    model_cache.write_atomic(os.path.join(index_dir, 'meta.json'), lambda f: f.write(json.dumps(meta).encode()))
+
+
+def _read_index(index_dir):
+    try:
+        with open(os.path.join(index_dir, 'meta.json')) as f:
+            meta = json.load(f)
+        return {
+            **meta,
+            'scores': np.load(os.path.join(index_dir, 'scores.npy'), mmap_mode='r'),
+            'offsets': np.load(os.path.join(index_dir, 'offsets.npy')),
+        }
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _is_current(index, sha256, path):
+    return (index is not None and index['model_sha256'] == sha256
+            and index['dataset_stamp'] == _dataset_stamp(path)
+            and index['age_band_edges'] == AGE_BAND_EDGES)
+
+
+def load_index(index_dir=INDEX_DIR, path=DATASET_PATH):
+    """Return the memory-mapped index for the current model, rebuilding it if stale."""
+    global _index
+    model = cardio_model.load_model()
+    sha256 = model_cache.fingerprint(cardio_model.MODEL_PATH)
+
+    # One stat per call, so a changed dataset is picked up without a restart
+    index = _index
+    if _is_current(index, sha256, path):
+        return index
+
+    with _lock:
+        index = _read_index(index_dir)
+        if not _is_current(index, sha256, path):
+            build_index(model, sha256, index_dir, path)
+            index = _read_index(index_dir)
+        _index = index
+        return index
+
+
+def percentile(probability, age, gender=ALL_GENDERS):
+    """Where ``probability`` falls among dataset patients of the same age band (and gender).
+
+    Returns ``{'percentile', 'count', 'age_band', 'gender'}`` with the share
+    (0-100) of the stratum scoring lower, ties counted half, or None if the
+    stratum is empty or the index is unavailable.
+    """
+    try:
+        with tracing.span('cardio.percentile'):
+            index = load_index()
+            stratum = _stratum(int(age_band(age)), int(gender))
+            start, end = index['offsets'][stratum], index['offsets'][stratum + 1]
+            if end == start:
+                return None
+            scores = index['scores'][start:end]
+            score = np.float32(probability)
+            below = np.searchsorted(scores, score, side='left')
+            not_above = np.searchsorted(scores, score, side='right')
+            return {
+                'percentile': 100.0 * float(below + not_above) / 2 / (end - start),
+                'count': int(end - start),
+                'age_band': AGE_BAND_LABELS[int(age_band(age))],
+                'gender': GENDER_LABELS[int(gender)],
+            }
+    except Exception:
+        logger.exception("Error reading risk percentile index")
+        return None
+
+
+if __name__ == '__main__':
+    index = load_index()
+    print(f"Percentile index for model {index['model_sha256'][:12]} "
+          f"({len(index['scores']):,} scores over {len(index['offsets']) - 1} strata) in {INDEX_DIR}")
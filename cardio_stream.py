@@ -0,0 +1,234 @@
+"""Out-of-core training for cardio files larger than memory.
+
+Streams a file in the cardio_train.csv layout in fixed-size chunks, derives
+the four model features per chunk and trains without ever holding the whole
+file:
+
+    sgd      SGD logistic regression (StandardScaler + SGDClassifier fitted
+             with partial_fit), one pass for scaling statistics then
+             ``--epochs`` passes of updates
+    xgboost  XGBoost external-memory training: chunks are fed through a
+             DataIter and paged to an on-disk cache
+
+Rows whose ``id`` is divisible by 10 are held out for validation. Peak memory
+is bounded by the chunk size; the report records peak RSS and throughput.
+
+    python cardio_stream.py registry_extract.csv --learner xgboost --chunk-rows 500000
+"""
+import argparse
+import json
+import os
+import pickle
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+import cardio_data
+from tracing import peak_rss_mb
+
+OUTPUT_DIR = 'models'
+VALIDATION_MODULUS = 10
+
+# Score histogram resolution for the streaming AUC estimate
+AUC_BINS = 1000
+
+
+def iter_chunks(path, chunk_rows=250_000, split=None):
+    """Yield ``(features, target)`` per chunk of plausible rows.
+
+    ``split`` is None for every row, ``'train'`` or ``'validation'`` for the
+    id-based holdout.
+    """
+    for raw_df in cardio_data.read_csv(path, chunksize=chunk_rows):
+        mask = cardio_data.plausible_rows(raw_df)
+        if split is not None:
+            held_out = raw_df['id'] % VALIDATION_MODULUS == 0
+            mask &= held_out if split == 'validation' else ~held_out
+        raw_df = raw_df[mask]
+        if len(raw_df):
+            yield cardio_data.derive_features(raw_df), raw_df[cardio_data.TARGET_COLUMN].to_numpy()
+
+
+class PassStats:
+    """Rows and seconds for one streaming pass over the file."""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.start = time.perf_counter()
+
+    def report(self):
+        seconds = time.perf_counter() - self.start
+        return {
+            'pass': self.name,
+            'rows': self.rows,
+            'seconds': seconds,
+            'rows_per_second': self.rows / seconds if seconds else None,
+            'peak_rss_mb': peak_rss_mb(),
+        }
+
+
+class StreamingMetrics:
+    """Bounded-memory log loss, accuracy and histogram-based AUC."""
+
+    def __init__(self):
+        self.rows = 0
+        self.log_loss_sum = 0.0
+        self.correct = 0
+        self.histograms = np.zeros((2, AUC_BINS), dtype=np.int64)
+
+    def update(self, y, proba):
+        proba = np.clip(proba, 1e-15, 1 - 1e-15)
+        self.rows += len(y)
+        self.log_loss_sum -= float(np.sum(y * np.log(proba) + (1 - y) * np.log(1 - proba)))
+        self.correct += int(np.sum((proba >= 0.5) == (y == 1)))
+        bins = np.minimum((proba * AUC_BINS).astype(np.int64), AUC_BINS - 1)
+        for label in (0, 1):
+            self.histograms[label] += np.bincount(bins[y == label], minlength=AUC_BINS)
+
+    def result(self):
+        negatives, positives = self.histograms
+        # Probability a random positive outscores a random negative (ties count half)
+        negatives_below = np.cumsum(negatives) - negatives
+        pairs = positives.sum() * negatives.sum()
+        auc = float(np.sum(positives * (negatives_below + 0.5 * negatives)) / pairs) if pairs else None
+        return {
+            'rows': self.rows,
+            'auc': auc,
+            'accuracy': self.correct / self.rows if self.rows else None,
+            'log_loss': self.log_loss_sum / self.rows if self.rows else None,
+        }
+
+
+def train_sgd(path, chunk_rows, epochs, seed, passes):
+    scaler = StandardScaler()
+    stats = PassStats('scaling')
+    for X, _ in iter_chunks(path, chunk_rows, 'train'):
+        scaler.partial_fit(X)
+        stats.rows += len(X)
+    passes.append(stats.report())
+
+    classifier = SGDClassifier(loss='log_loss', alpha=1e-5, random_state=seed)
+    for epoch in range(epochs):
+        stats = PassStats(f'epoch {epoch + 1}')
+        for X, y in iter_chunks(path, chunk_rows, 'train'):
+            classifier.partial_fit(scaler.transform(X), y, classes=[0, 1])
+            stats.rows += len(X)
+        passes.append(stats.report())
+
+    # Both steps are already fitted, so the pipeline is usable as is
+    return Pipeline([('scale', scaler), ('classify', classifier)])
+
+
+def train_xgboost(path, chunk_rows, rounds, seed, passes):
+    import xgboost
+
+    class ChunkIter(xgboost.DataIter):
+        def __init__(self, cache_prefix):
+            self._chunks = None
+            self._stats = None
+            super().__init__(cache_prefix=cache_prefix)
+
+        def reset(self):
+            self._stats = PassStats('external memory ingest')
+            self._chunks = iter_chunks(path, chunk_rows, 'train')
+
+        def next(self, input_data):
+            try:
+                X, y = next(self._chunks)
+            except StopIteration:
+                passes.append(self._stats.report())
+                return False
+            input_data(data=X, label=y)
+            self._stats.rows += len(X)
+            return True
+
+    with tempfile.TemporaryDirectory(prefix='cardio-xgb-') as cache_dir:
+        data_iter = ChunkIter(os.path.join(cache_dir, 'pages'))
+        matrix = xgboost.DMatrix(data_iter)
+
+        stats = PassStats('boosting')
+        booster = xgboost.train({
+            'objective': 'binary:logistic',
+            'tree_method': 'hist',
+            'max_depth': 4,
+            'eta': 0.1,
+            'subsample': 0.8,
+            'seed': seed,
+        }, matrix, num_boost_round=rounds)
+        stats.rows = matrix.num_row()
+        passes.append(stats.report())
+        # Release the paged cache before its directory is removed
+        del matrix, data_iter
+
+    # Wrap in the sklearn API so the page can call predict_proba on it
+    model = xgboost.XGBClassifier()
+    model.load_model(booster.save_raw('ubj'))
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the cardio model on a file larger than memory")
+    parser.add_argument('data', nargs='?', default=cardio_data.DATASET_PATH)
+    parser.add_argument('--learner', choices=['sgd', 'xgboost'], default='xgboost')
+    parser.add_argument('--chunk-rows', type=int, default=250_000)
+    parser.add_argument('--epochs', type=int, default=3, help="SGD passes over the training rows")
+    parser.add_argument('--rounds', type=int, default=200, help="XGBoost boosting rounds")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    baseline_rss = peak_rss_mb()
+    passes = []
+    if args.learner == 'sgd':
+        model = train_sgd(args.data, args.chunk_rows, args.epochs, args.seed, passes)
+    else:
+        model = train_xgboost(args.data, args.chunk_rows, args.rounds, args.seed, passes)
+
+    stats = PassStats('validation')
+    metrics = StreamingMetrics()
+    for X, y in iter_chunks(args.data, args.chunk_rows, 'validation'):
+        metrics.update(y, model.predict_proba(X)[:, 1])
+        stats.rows += len(X)
+    passes.append(stats.report())
+
+    version = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}"
+    os.makedirs(args.output_dir, exist_ok=True)
+    artifact_path = os.path.join(args.output_dir, f"cardio_stream_{args.learner}_{version}.pkl")
+    with open(artifact_path, 'wb') as f:
+        pickle.dump(model, f)
+
+    report = {
+        'version': version,
+        'artifact': artifact_path,
+        'dataset': args.data,
+        'learner': args.learner,
+        'chunk_rows': args.chunk_rows,
+        'validation': metrics.result(),
+        'passes': passes,
+        'memory': {
+            'baseline_rss_mb': baseline_rss,
+            'peak_rss_mb': peak_rss_mb(),
+        },
+        'training_seconds': time.perf_counter() - start,
+    }
+    with open(os.path.join(args.output_dir, f"cardio_stream_{args.learner}_{version}.metrics.json"), 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for row in passes:
+        print(f"{row['pass']:>24}: {row['rows']:>12,} rows {row['seconds']:8.1f}s "
+              f"{row['rows_per_second'] or 0:>12,.0f} rows/s  peak RSS {row['peak_rss_mb']:,.0f} MB")
+    validation = report['validation']
+    print(f"Validation auc={validation['auc']:.4f} accuracy={validation['accuracy']:.4f} "
+          f"on {validation['rows']:,} rows; peak RSS {report['memory']['peak_rss_mb']:,.0f} MB")
+    print(f"Wrote {artifact_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,18 @@
 import streamlit as st
-import pandas as pd
 import pickle
-import os
+import cardio_model
+import cardio_percentiles
+import prediction_store
+import similar_patients
+import tracing
+import what_if
+from cardio_lookup import lookup_cardiovascular_risk
 
 
-# Load the model
+# Load the model (shared by all sessions, reloaded only when the artifact changes)
 def load_model():
     try:
-        with open('gpu_automl_model.pkl', 'rb') as model_file:
-            model = pickle.load(model_file)
-        return model
+        return cardio_model.load_model()
     except Exception as e:
         st.error(f"Error loading model: {e}")
         return None
@@ -23,27 +26,13 @@ def load_predict_function():
         st.error(f"Error loading prediction function: {e}")
         return None
 
-# Predict function using pandas instead of cuDF
-def predict_cardiovascular_risk(bmi, age, high_chol, high_bp):
-    try:
-        data = pd.DataFrame({
-            'high_bp': [high_bp],
-            'age': [age],
-            'high_chol': [high_chol],
-            'BMI': [bmi]
-        })
+# Labels and displayed values for the risk driver breakdown
+FEATURE_LABELS = {'high_bp': 'High Blood Pressure', 'age': 'Age', 'high_chol': 'High Cholesterol', 'BMI': 'BMI'}
 
-        model = load_model()
-        if model is None:
-            return None, None
-        
-        prediction = model.predict(data)
-        prediction_proba = model.predict_proba(data) if hasattr(model, 'predict_proba') else None
-        
-        return int(prediction[0]), prediction_proba[0][1] if prediction_proba is not None else None
-    except Exception as e:
-        print(f"Error during prediction: {e}")
-        return None, None
+def format_input(column, value):
+    if column in ('high_bp', 'high_chol'):
+        return "Yes" if value == 1 else "No"
+    return f"{value:.1f}" if column == 'BMI' else f"{value} years"
 
 # App UI
 st.set_page_config(
@@ -234,6 +223,14 @@ with st.container():
                 chol_desc = "High cholesterol is defined as total cholesterol ≥ 200 mg/dL"
                 st.markdown(f'<div>High Cholesterol <span class="tooltip">ℹ️<span class="tooltiptext">{chol_desc}</span></span></div>', unsafe_allow_html=True)
                 high_chol = st.radio("", [0, 1], format_func=lambda x: "Yes" if x == 1 else "No", horizontal=True, key="chol_radio")
+
+                # Not a model input; only selects the comparison group for the percentile
+                gender = st.selectbox(
+                    "Sex (optional)",
+                    [cardio_percentiles.ALL_GENDERS, cardio_percentiles.WOMEN, cardio_percentiles.MEN],
+                    format_func=lambda x: {0: "Not specified", 1: "Female", 2: "Male"}[x],
+                    help="Used only to compare your risk with patients of the same sex"
+                )
             
             st.markdown("<br>", unsafe_allow_html=True)
             submitted = st.form_submit_button("Assess Cardiovascular Risk")
@@ -242,82 +239,124 @@ with st.container():
         
         # Prediction logic
         if submitted:
-            model = load_model()
+            trace = tracing.start_trace("cardio.submit")
+            with tracing.span("cardio.model_load"):
+                model = load_model()
             
             if model is None:
                 st.error("Could not load the prediction model. Please check the model files.")
             else:
                 try:
                     # Show loading indicator
-                    with st.spinner("Analyzing your risk factors..."):
-                        # Simulate computation time
-                        import time
-                        time.sleep(1)
-                        
-                        # Perform Prediction
-                        prediction, proba = predict_cardiovascular_risk(bmi, age, high_chol, high_bp)
+                    with st.spinner("Analyzing your risk factors..."), tracing.span("cardio.predict_total"):
+                        # Perform Prediction (precomputed table, model call outside the grid)
+                        prediction, proba = lookup_cardiovascular_risk(bmi, age, high_chol, high_bp)
+                    if prediction is not None:
+                        prediction_store.record('cardio', 'form',
+                                                {'high_bp': high_bp, 'age': age, 'high_chol': high_chol, 'BMI': bmi},
+                                                proba, prediction, 'high' if prediction == 1 else 'low',
+                                                cardio_model.MODEL_PATH)
                     
-                    # Display risk factors summary
-                    st.markdown('<div class="card">', unsafe_allow_html=True)
-                    st.markdown('<div class="form-header">📊 Risk Factors Summary</div>', unsafe_allow_html=True)
+                    with tracing.span("cardio.render"):
+                        # Display risk factors summary
+                        st.markdown('<div class="card">', unsafe_allow_html=True)
+                        st.markdown('<div class="form-header">📊 Risk Factors Summary</div>', unsafe_allow_html=True)
                     
-                    risk_cols = st.columns(4)
-                    with risk_cols[0]:
-                        st.metric("Age", f"{age} years")
-                    with risk_cols[1]:
-                        st.metric("BMI", f"{bmi:.1f}")
-                    with risk_cols[2]:
-                        st.metric("High Blood Pressure", "Yes" if high_bp else "No")
-                    with risk_cols[3]:
-                        st.metric("High Cholesterol", "Yes" if high_chol else "No")
+                        risk_cols = st.columns(4)
+                        with risk_cols[0]:
+                            st.metric("Age", f"{age} years")
+                        with risk_cols[1]:
+                            st.metric("BMI", f"{bmi:.1f}")
+                        with risk_cols[2]:
+                            st.metric("High Blood Pressure", "Yes" if high_bp else "No")
+                        with risk_cols[3]:
+                            st.metric("High Cholesterol", "Yes" if high_chol else "No")
                     
-                    st.markdown('</div>', unsafe_allow_html=True)
+                        st.markdown('</div>', unsafe_allow_html=True)
                     
-                    # Display prediction result
-                    st.markdown('<div class="card">', unsafe_allow_html=True)
-                    st.markdown('<div class="form-header">🧑‍⚕️ Assessment Result</div>', unsafe_allow_html=True)
+                        # Display prediction result
+                        st.markdown('<div class="card">', unsafe_allow_html=True)
+                        st.markdown('<div class="form-header">🧑‍⚕️ Assessment Result</div>', unsafe_allow_html=True)
                     
-                    if prediction == 1:
-                        risk_class = "high-risk"
-                        risk_icon = "⚠️"
-                        risk_text = "High Risk of Cardiovascular Disease"
-                    else:
-                        risk_class = "low-risk"
-                        risk_icon = "✅"
-                        risk_text = "Low Risk of Cardiovascular Disease"
+                        if prediction == 1:
+                            risk_class = "high-risk"
+                            risk_icon = "⚠️"
+                            risk_text = "High Risk of Cardiovascular Disease"
+                        else:
+                            risk_class = "low-risk"
+                            risk_icon = "✅"
+                            risk_text = "Low Risk of Cardiovascular Disease"
                     
-                    st.markdown(f'''
-                    <div class="results-container {risk_class}">
-                        <div class="risk-title">{risk_icon} {risk_text}</div>
-                        <div>Risk probability: <span class="risk-value">{proba:.1%}</span></div>
-                    </div>
-                    ''', unsafe_allow_html=True)
+                        st.markdown(f'''
+                        <div class="results-container {risk_class}">
+                            <div class="risk-title">{risk_icon} {risk_text}</div>
+                            <div>Risk probability: <span class="risk-value">{proba:.1%}</span></div>
+                        </div>
+                        ''', unsafe_allow_html=True)
                     
-                    # Risk probability visualization
-                    st.progress(float(proba))
+                        # Risk probability visualization
+                        st.progress(float(proba))
+
+                        # Context: rank among dataset patients of the same age band (and sex)
+                        rank = cardio_percentiles.percentile(proba, age, gender)
+                        if rank is not None:
+                            st.caption(f"This risk is higher than that of {rank['percentile']:.0f}% of {rank['gender']} "
+                                       f"aged {rank['age_band']} in the reference dataset "
+                                       f"({rank['count']:,} patients).")
+
+                        # Observed outcomes of the closest matches in the dataset (grid index)
+                        similar = similar_patients.similar_outcomes(bmi, age, high_chol, high_bp)
+                        if similar is not None:
+                            st.caption(f"Among the {similar['k']} most similar patients in the dataset "
+                                       f"(aged {similar['age_range'][0]}-{similar['age_range'][1]}, "
+                                       f"BMI {similar['bmi_range'][0]}-{similar['bmi_range'][1]}, same blood "
+                                       f"pressure and cholesterol status), {similar['rate']:.0%} had "
+                                       f"cardiovascular disease.")
+
+                        # What drives this patient's risk (TreeSHAP, memoized per profile)
+                        with tracing.span("cardio.contributions_total"):
+                            contributions = cardio_model.explain_cardiovascular_risk(bmi, age, high_chol, high_bp)
+                        if contributions is not None:
+                            st.markdown("### Risk Drivers")
+                            inputs = {'high_bp': high_bp, 'age': age, 'high_chol': high_chol, 'BMI': bmi}
+                            drivers = sorted(FEATURE_LABELS, key=lambda column: abs(contributions[column]), reverse=True)
+                            st.markdown("\n".join(
+                                f"- **{FEATURE_LABELS[column]}** ({format_input(column, inputs[column])}) "
+                                f"{'raises' if contributions[column] > 0 else 'lowers'} the risk "
+                                f"({contributions[column]:+.2f})"
+                                for column in drivers
+                            ))
+                            st.caption("Contributions to the model's risk score relative to the average patient "
+                                       "in the training data; positive values raise the predicted risk.")
                     
-                    # Recommendations based on risk level
-                    st.markdown("### Recommendations")
-                    if prediction == 1:
-                        st.markdown("""
-                        - Consider consulting with a healthcare provider
-                        - Regular monitoring of blood pressure and cholesterol
-                        - Maintain a heart-healthy diet and regular exercise
-                        - Consider medication if recommended by your doctor
-                        """)
-                    else:
-                        st.markdown("""
-                        - Continue maintaining a healthy lifestyle
-                        - Regular check-ups with your healthcare provider
-                        - Stay physically active and maintain a balanced diet
-                        - Monitor your blood pressure and cholesterol periodically
-                        """)
+                        # Recommendations based on risk level
+                        st.markdown("### Recommendations")
+                        if prediction == 1:
+                            st.markdown("""
+                            - Consider consulting with a healthcare provider
+                            - Regular monitoring of blood pressure and cholesterol
+                            - Maintain a heart-healthy diet and regular exercise
+                            - Consider medication if recommended by your doctor
+                            """)
+                        else:
+                            st.markdown("""
+                            - Continue maintaining a healthy lifestyle
+                            - Regular check-ups with your healthcare provider
+                            - Stay physically active and maintain a balanced diet
+                            - Monitor your blood pressure and cholesterol periodically
+                            """)
                     
-                    st.markdown('</div>', unsafe_allow_html=True)
+                        st.markdown('</div>', unsafe_allow_html=True)
                         
                 except Exception as e:
                     st.error(f"Prediction failed: {str(e)}")
 
+            tracing.render_debug_panel(trace)
+
+        # Risk across the whole age / BMI range in one table read instead of a resubmit per step
+        what_if.render_panel("cardio", {'high_bp': high_bp, 'age': age, 'high_chol': high_chol, 'BMI': bmi},
+                             what_if.CARDIO_RANGES, FEATURE_LABELS, what_if.cardio_sweep)
+
 # Footer
 st.markdown('<div class="footer">', unsafe_allow_html=True)
 st.markdown("Developed with ❤️ using Streamlit and Machine Learning | Not for clinical use", unsafe_allow_html=True)
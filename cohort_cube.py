@@ -0,0 +1,288 @@
+"""Precomputed aggregate cube over dataset/cardio_train.csv for cohort analytics.
+
+Every plausible row falls in one cell of
+
+    age_band x bmi_band x gender x cholesterol x glucose x smoking x activity
+
+and the cube stores, per cell, the number of patients, how many have
+cardiovascular disease and the sum of the current model's predicted risk.
+Any slice or roll-up the analytics page asks for is then a reduction over a
+few thousand cells instead of a groupby over the raw rows.
+
+The cube records how far into the file it has read (a byte offset at the end
+of a row) and the SHA-256 of the header and the CHECK_BYTES before that
+offset. When rows are appended, only those bytes and the new ones are read:
+the new rows are parsed, scored and added. If the checked bytes changed, as
+they do when earlier rows are added, removed or change length, or the model
+changed, the cube is rebuilt from scratch. An edit that keeps every earlier
+row's length is not noticed; rebuild explicitly after one.
+
+    python cohort_cube.py              # build or bring the cube up to date
+    python cohort_cube.py --rebuild    # rebuild from scratch
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import threading
+
+import numpy as np
+
+import cardio_model
+import model_cache
+import tracing
+
+# cardio_data.DATASET_PATH; cardio_data is imported only to read rows, as it loads pandas
+DATASET_PATH = 'dataset/cardio_train.csv'
+
+CUBE_DIR = os.path.join(model_cache.CACHE_DIR, 'cohort_cube')
+
+# Bytes parsed per block when reading the file
+BLOCK_BYTES = 64 << 20
+
+# Bytes before the read offset that must be unchanged for rows to be appended
+CHECK_BYTES = 64 << 10
+
+AGE_BAND_EDGES = [40, 45, 50, 55, 60]
+BMI_BAND_EDGES = [18.5, 25.0, 30.0, 35.0, 40.0]
+
+# Dimension -> labels of its positions, in cube axis order
+DIMENSIONS = {
+    'age_band': ['under 40', '40-44', '45-49', '50-54', '55-59', '60 and over'],
+    'bmi_band': ['under 18.5', '18.5-24.9', '25-29.9', '30-34.9', '35-39.9', '40 and over'],
+    'gender': ['Women', 'Men'],
+    'cholesterol': ['Normal', 'Above normal', 'Well above normal'],
+    'glucose': ['Normal', 'Above normal', 'Well above normal'],
+    'smoking': ['Non-smoker', 'Smoker'],
+    'activity': ['Inactive', 'Active'],
+}
+SHAPE = tuple(len(labels) for labels in DIMENSIONS.values())
+
+# Per-cell sums; the page derives prevalence and mean risk from them
+MEASURES = ('patients', 'cardio', 'risk')
+
+_cube = None
+_lock = threading.Lock()
+
+
+def _cell_positions(raw_df, features):
+    """Cube axis positions of each row, one array per dimension."""
+    return [
+        np.digitize(features['age'].to_numpy(), AGE_BAND_EDGES),
+        np.digitize(features['BMI'].to_numpy(), BMI_BAND_EDGES),
+        raw_df['gender'].to_numpy() - 1,
+        raw_df['cholesterol'].to_numpy() - 1,
+        raw_df['gluc'].to_numpy() - 1,
+        raw_df['smoke'].to_numpy(),
+        raw_df['active'].to_numpy(),
+    ]
+
+
+def _empty():
+    return {
+        'patients': np.zeros(SHAPE, dtype=np.int64),
+        'cardio': np.zeros(SHAPE, dtype=np.int64),
+        'risk': np.zeros(SHAPE, dtype=np.float64),
+    }
+
+
+def _accumulate(arrays, raw_df, model):
+    import cardio_data
+
+    raw_df = raw_df[cardio_data.plausible_rows(raw_df)]
+    raw_df = raw_df[raw_df['gender'].isin([1, 2]) & raw_df['cholesterol'].between(1, 3) & raw_df['gluc'].between(1, 3)
+                    & raw_df['smoke'].isin([0, 1]) & raw_df['active'].isin([0, 1])]
+    if not len(raw_df):
+        return
+    features = cardio_data.derive_features(raw_df)
+    risk = cardio_model.predict_cardiovascular_risk_batch(features, model, source=None)['probability'].to_numpy()
+    cells = np.ravel_multi_index(_cell_positions(raw_df, features), SHAPE)
+    size = int(np.prod(SHAPE))
+    arrays['patients'] += np.bincount(cells, minlength=size).reshape(SHAPE)
+    arrays['cardio'] += np.bincount(cells, weights=raw_df[cardio_data.TARGET_COLUMN].to_numpy(),
+                                    minlength=size).astype(np.int64).reshape(SHAPE)
+    arrays['risk'] += np.bincount(cells, weights=risk, minlength=size).reshape(SHAPE)
+
+
+def _header_and_end(path):
+    """The header line and the offset just past the last complete row.
+
+    A last line without a newline is a complete row if it has every field of
+    the header (files need not end with a newline); with fewer it is a row
+    still being written, and reading stops before it.
+    """
+    with open(path, 'rb') as f:
+        header = f.readline()
+        f.seek(0, os.SEEK_END)
+        size = end = f.tell()
+        while end > len(header):
+            f.seek(max(end - 4096, len(header)))
+            tail = f.read(end - f.tell())
+            newline = tail.rfind(b'\n')
+            if newline >= 0:
+                end = end - len(tail) + newline + 1
+                break
+            end -= len(tail)
+        f.seek(end)
+        last_line = f.read(size - end).rstrip(b'\r')
+    if last_line and last_line.count(b';') == header.count(b';') and not last_line.endswith(b';'):
+        return header, size
+    return header, end
+
+
+def _continues_line(path, offset):
+    """Whether the byte at ``offset`` continues the line before it (rather than ending it)."""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return f.read(1) not in (b'\n', b'\r', b'')
+
+
+def _boundary_sha256(path, header, end):
+    """SHA-256 of the header and the CHECK_BYTES before offset ``end``."""
+    digest = hashlib.sha256(header)
+    start = max(len(header), end - CHECK_BYTES)
+    with open(path, 'rb') as f:
+        f.seek(start)
+        digest.update(f.read(max(end - start, 0)))
+    return digest.hexdigest()
+
+
+def _add_rows(arrays, model, path, header, start, end):
+    """Parse, score and aggregate the complete lines between byte offsets ``start`` and ``end``."""
+    import cardio_data
+
+    with open(path, 'rb') as f:
+        f.seek(start)
+        position = start
+        while position < end:
+            block = f.read(min(BLOCK_BYTES, end - position))
+            if position + len(block) < end:
+                # Cut the block after its last full line; the rest starts the next block
+                cut = block.rfind(b'\n') + 1
+                f.seek(position + cut)
+                block = block[:cut]
+            position += len(block)
+            _accumulate(arrays, cardio_data.read_csv(io.BytesIO(header + block)), model)
+
+
+def _write(arrays, meta, cube_dir):
+    os.makedirs(cube_dir, exist_ok=True)
+    for name, array in arrays.items():
+        model_cache.write_atomic(os.path.join(cube_dir, f'{name}.npy'), lambda f: np.save(f, array))
+    # Written last so a half-written cube is never mistaken for a current one
+    model_cache.write_atomic(os.path.join(cube_dir, 'meta.json'), lambda f: f.write(json.dumps(meta).encode()))
+
+
+def _read_cube(cube_dir):
+    try:
+        with open(os.path.join(cube_dir, 'meta.json')) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(cube_dir, f'{name}.npy')) for name in MEASURES}
+    except (OSError, ValueError, KeyError):
+        return None
+    if meta.get('dimensions') != DIMENSIONS or any(array.shape != SHAPE for array in arrays.values()):
+        return None
+    return {**meta, **arrays}
+
+
+def update_cube(cube_dir=CUBE_DIR, path=DATASET_PATH, rebuild=False):
+    """Bring the stored cube up to date with the dataset and model (from scratch if ``rebuild``); returns it."""
+    model = cardio_model.load_model()
+    sha256 = model_cache.fingerprint(cardio_model.MODEL_PATH)
+    stat = os.stat(path)
+    stamp = [stat.st_mtime_ns, stat.st_size]
+
+    cube = None if rebuild else _read_cube(cube_dir)
+    if cube is not None and cube['model_sha256'] == sha256 and cube['dataset_stamp'] == stamp:
+        return cube
+
+    header, end = _header_and_end(path)
+    # A last row read without its newline must not have been extended since
+    extended = cube is not None and cube.get('ends_mid_line') and _continues_line(path, cube['offset'])
+    if (cube is not None and cube['model_sha256'] == sha256 and cube['offset'] <= end and not extended
+            and _boundary_sha256(path, header, cube['offset']) == cube.get('boundary_sha256')):
+        # Only rows were appended: aggregate the new bytes onto the stored sums
+        arrays, start, mode = {name: cube[name] for name in MEASURES}, cube['offset'], 'append'
+    else:
+        arrays, start, mode = _empty(), len(header), 'rebuild'
+
+    with tracing.span('cohort_cube.update', mode=mode, bytes=end - start):
+        _add_rows(arrays, model, path, header, start, end)
+    meta = {
+        'model_sha256': sha256,
+        'dataset': os.path.abspath(path),
+        'dataset_stamp': stamp,
+        'offset': end,
+        'ends_mid_line': end > 0 and _continues_line(path, end - 1),
+        'boundary_sha256': _boundary_sha256(path, header, end),
+        'dimensions': DIMENSIONS,
+    }
+    _write(arrays, meta, cube_dir)
+    return {**meta, **arrays}
+
+
+def load_cube(cube_dir=CUBE_DIR, path=DATASET_PATH):
+    """Return the cube for the current model and dataset, updating it if either changed."""
+    global _cube
+    # Reloads a swapped model first, so its fingerprint is the current one
+    cardio_model.load_model()
+    sha256 = model_cache.fingerprint(cardio_model.MODEL_PATH)
+    stat = os.stat(path)
+    cube = _cube
+    if cube is not None and cube['model_sha256'] == sha256 and cube['dataset_stamp'] == [stat.st_mtime_ns, stat.st_size]:
+        return cube
+
+    with _lock:
+        _cube = update_cube(cube_dir, path)
+        return _cube
+
+
+def slice_cube(cube, filters=None, by=()):
+    """Aggregate the cells selected by ``filters`` and group them by the ``by`` dimensions.
+
+    ``filters`` maps a dimension to the label positions to keep (all when
+    absent). Returns a DataFrame with one row per non-empty ``by`` group: its
+    labels, ``patients``, ``prevalence`` (share with cardiovascular disease)
+    and ``mean_risk`` (mean predicted risk).
+    """
+    import pandas as pd
+
+    filters = filters or {}
+    names = list(DIMENSIONS)
+    totals = {}
+    for measure in MEASURES:
+        array = cube[measure]
+        for axis, name in enumerate(names):
+            if name in filters:
+                array = np.take(array, filters[name], axis=axis)
+        # Roll up every dimension not grouped on
+        totals[measure] = array.sum(axis=tuple(axis for axis, name in enumerate(names) if name not in by))
+
+    # Grouped axes keep the DIMENSIONS order
+    grouped = [name for name in names if name in by]
+    rows = []
+    for position in np.ndindex(totals['patients'].shape):
+        patients = int(totals['patients'][position])
+        if not patients:
+            continue
+        labels = {
+            name: DIMENSIONS[name][filters[name][i] if name in filters else i]
+            for name, i in zip(grouped, position)
+        }
+        rows.append({
+            **labels,
+            'patients': patients,
+            'prevalence': totals['cardio'][position] / patients,
+            'mean_risk': totals['risk'][position] / patients,
+        })
+    return pd.DataFrame(rows, columns=grouped + ['patients', 'prevalence', 'mean_risk'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build or update the cohort analytics cube")
+    parser.add_argument('--rebuild', action='store_true', help="Rebuild from scratch, e.g. after editing rows in place")
+    cube = update_cube(rebuild=parser.parse_args().rebuild)
+    print(f"Cohort cube for model {cube['model_sha256'][:12]}: {int(cube['patients'].sum()):,} patients "
+          f"in {int(np.count_nonzero(cube['patients'])):,} of {int(np.prod(SHAPE)):,} cells, "
+          f"read to byte {cube['offset']:,} in {CUBE_DIR}")
@@ -1,7 +1,11 @@
 import streamlit as st
-import h2o
-import pandas as pd
-import base64
+import diabetes_model
+import h2o_cluster
+import metrics
+import prediction_store
+import tracing
+import static_assets
+import what_if
 
 # Page Configuration
 st.set_page_config(
@@ -22,32 +26,27 @@ def inject_dark_css():
 # Inject dark mode CSS FIRST
 inject_dark_css()
 
-# Initialize H2O
-@st.cache_resource
+# Attach to (or start) the shared H2O instance; one connection per process,
+# reused by every session and shut down with the server
 def init_h2o():
     try:
-        h2o.init()
-        st.session_state.h2o_initialized = True
+        h2o_cluster.connect()
         return True
     except Exception as e:
         st.error(f"Failed to initialize H2O: {e}")
         return False
 
-# Initialize H2O (this will only run once due to caching)
-h2o_initialized = init_h2o()
-
-# Function to get image as base64 string
-def get_img_as_base64(file_path):
+# Function to get image as base64 string, resized for its display size (memoized)
+def get_img_as_base64(file_path, size):
     try:
-        with open(file_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode()
+        return static_assets.icon_base64(file_path, size)
     except Exception as e:
         st.warning(f"Couldn't load image from {file_path}: {e}")
         return ""
 
 # Try to load theme icon
-heartbeat_icon = get_img_as_base64("assets/icons/heartbeat.png")
-diabetes_icon = get_img_as_base64("assets/icons/disease_icon/diabetes.png")
+heartbeat_icon = get_img_as_base64("assets/icons/heartbeat.png", 60)
+diabetes_icon = get_img_as_base64("assets/icons/disease_icon/diabetes.png", 40)
 back_icon = "data:image/svg+xml;base64,PHN2ZyB4bWxucz0iaHR0cDovL3d3dy53My5vcmcvMjAwMC9zdmciIHdpZHRoPSIyNCIgaGVpZ2h0PSIyNCIgdmlld0JveD0iMCAwIDI0IDI0IiBmaWxsPSJub25lIiBzdHJva2U9ImN1cnJlbnRDb2xvciIgc3Ryb2tlLXdpZHRoPSIyIiBzdHJva2UtbGluZWNhcD0icm91bmQiIHN0cm9rZS1saW5lam9pbj0icm91bmQiIGNsYXNzPSJmZWF0aGVyIGZlYXRoZXItYXJyb3ctbGVmdCI+PGxpbmUgeDE9IjE5IiB5MT0iMTIiIHgyPSI1IiB5Mj0iMTIiPjwvbGluZT48cG9seWxpbmUgcG9pbnRzPSIxMiAxOSA1IDEyIDEyIDUiPjwvcG9seWxpbmU+PC9zdmc+"
 
 # Define CSS with theme-aware variables
@@ -274,17 +273,23 @@ st.markdown(f"""
 </div>
 """, unsafe_allow_html=True)
 
-# Load MOJO model
-@st.cache_resource
+# Load MOJO model (shared by all sessions, re-imported only when the MOJO file changes)
 def load_model():
     try:
-        return h2o.import_mojo("StackedEnsemble_AllModels_1_AutoML_1_20250331_161905.zip")
+        return diabetes_model.load_model()
     except Exception as e:
         st.error(f"Failed to load model: {e}")
         return None
 
-# Only try to load model if H2O initialized successfully
-model = load_model() if h2o_initialized else None
+# Boot H2O (once per process; the native backend needs no JVM) and load the
+# model on first use, so the form is drawn before any ML library is imported
+def get_model():
+    if diabetes_model.BACKEND == "h2o" and not init_h2o():
+        return None
+    with tracing.span("diabetes.model_load"):
+        return load_model()
+
+trace = tracing.start_trace("diabetes.page")
 
 # Rest of your existing code (input form, prediction logic, etc.) remains unchanged...
 # [Input form, prediction processing, results display, etc.]
@@ -332,100 +337,185 @@ with st.form("diabetes_prediction_form"):
     with submit_col2:
         submitted = st.form_submit_button("Analyze Risk Factors")
 
+# Form labels for the risk factor breakdown
+FEATURE_LABELS = {
+    "HighBP": "High blood pressure", "GenHlth": "General health", "HighChol": "High cholesterol",
+    "CholCheck": "Cholesterol check", "BMI": "BMI", "HvyAlcoholConsump": "Heavy alcohol consumption",
+    "PhysHlth": "Physical health issues", "MentHlth": "Mental health issues",
+    "PhysActivity": "Physical activity", "DiffWalk": "Difficulty walking",
+}
+MAX_DRIVERS = 5
+MIN_CONTRIBUTION = 0.01
+
+def format_input(column, value):
+    if column in diabetes_model.BINARY_COLUMNS:
+        return "Yes" if value == 1 else "No"
+    return f"{value:.1f}" if column == "BMI" else f"{value}"
+
+# Convert inputs to model format
+input_dict = {
+    "HighBP": 1 if high_bp == "Yes" else 0,
+    "GenHlth": gen_hlth,
+    "HighChol": 1 if high_chol == "Yes" else 0,
+    "CholCheck": 1 if chol_check == "Yes" else 0,
+    "BMI": bmi,
+    "HvyAlcoholConsump": 1 if smoker == "Yes" else 0,
+    "PhysHlth": phys_hlth,
+    "MentHlth": ment_hlth,
+    "PhysActivity": 1 if phys_active == "Yes" else 0,
+    "DiffWalk": 1 if diff_walk == "Yes" else 0
+}
+
 # Process inputs and predict
 if submitted:
+    model = get_model()
     if model is None:
         st.error("Model could not be loaded. Please check the file path and try again.")
     else:
-        # Convert inputs to model format
-        input_dict = {
-            "HighBP": 1 if high_bp == "Yes" else 0,
-            "GenHlth": gen_hlth,
-            "HighChol": 1 if high_chol == "Yes" else 0,
-            "CholCheck": 1 if chol_check == "Yes" else 0,
-            "BMI": bmi,
-            "HvyAlcoholConsump": 1 if smoker == "Yes" else 0,
-            "PhysHlth": phys_hlth,
-            "MentHlth": ment_hlth,
-            "PhysActivity": 1 if phys_active == "Yes" else 0,
-            "DiffWalk": 1 if diff_walk == "Yes" else 0
-        }
+        # Predict (memoized; misses go through H2O or the in-process native scorer)
+        pred_row = diabetes_model.predict_one(model, input_dict)
+        prediction_store.record("diabetes", "form", input_dict, pred_row["p1"], pred_row["predict"],
+                                str(diabetes_model.risk_band(pred_row["p1"])), diabetes_model.MOJO_PATH)
         
-        # Convert to H2OFrame
-        input_df = pd.DataFrame([input_dict])
-        h2o_frame = h2o.H2OFrame(input_df)
+        with tracing.span("diabetes.render"):
+            # Display results
+            st.markdown('<div class="results-container">', unsafe_allow_html=True)
+            st.markdown('<div class="section-heading">Prediction Results</div>', unsafe_allow_html=True)
         
-        # Predict
-        prediction = model.predict(h2o_frame)
-        pred_df = prediction.as_data_frame()
+            # Get risk probability
+            risk = pred_row["p1"] * 100
         
-        # Display results
-        st.markdown('<div class="results-container">', unsafe_allow_html=True)
-        st.markdown('<div class="section-heading">Prediction Results</div>', unsafe_allow_html=True)
+            # Determine risk level and display appropriate message
+            if risk > 70:
+                risk_status = "high"
+                risk_message = f"<div class='status-high'><strong>High Risk of Diabetes</strong><br>Your results indicate a high risk ({risk:.1f}%) for developing Type 2 Diabetes.</div>"
+                clinical_rec = "<strong>Clinical recommendation:</strong> Urgent consultation with a healthcare provider is suggested."
+            elif risk > 30:
+                risk_status = "medium"
+                risk_message = f"<div class='status-medium'><strong>Moderate Risk of Diabetes</strong><br>Your results indicate a moderate risk ({risk:.1f}%) for developing Type 2 Diabetes.</div>"
+                clinical_rec = "<strong>Clinical recommendation:</strong> Preventive screening and lifestyle modifications advised."
+            else:
+                risk_status = "low"
+                risk_message = f"<div class='status-low'><strong>Low Risk of Diabetes</strong><br>Your results indicate a low risk ({risk:.1f}%) for developing Type 2 Diabetes.</div>"
+                clinical_rec = "<strong>Clinical recommendation:</strong> Maintain current health regimen and continue regular check-ups."
         
-        # Get risk probability
-        risk = pred_df["p1"][0] * 100
+            st.markdown(risk_message, unsafe_allow_html=True)
         
-        # Determine risk level and display appropriate message
-        if risk > 70:
-            risk_status = "high"
-            risk_message = f"<div class='status-high'><strong>High Risk of Diabetes</strong><br>Your results indicate a high risk ({risk:.1f}%) for developing Type 2 Diabetes.</div>"
-            clinical_rec = "<strong>Clinical recommendation:</strong> Urgent consultation with a healthcare provider is suggested."
-        elif risk > 30:
-            risk_status = "medium"
-            risk_message = f"<div class='status-medium'><strong>Moderate Risk of Diabetes</strong><br>Your results indicate a moderate risk ({risk:.1f}%) for developing Type 2 Diabetes.</div>"
-            clinical_rec = "<strong>Clinical recommendation:</strong> Preventive screening and lifestyle modifications advised."
-        else:
-            risk_status = "low"
-            risk_message = f"<div class='status-low'><strong>Low Risk of Diabetes</strong><br>Your results indicate a low risk ({risk:.1f}%) for developing Type 2 Diabetes.</div>"
-            clinical_rec = "<strong>Clinical recommendation:</strong> Maintain current health regimen and continue regular check-ups."
+            # Risk meter
+            st.markdown('<div class="risk-meter">', unsafe_allow_html=True)
+            st.progress(int(risk))
+            st.markdown('<div class="risk-labels"><span class="risk-low">Low Risk</span><span class="risk-medium">Moderate Risk</span><span class="risk-high">High Risk</span></div>', unsafe_allow_html=True)
+            st.markdown('</div>', unsafe_allow_html=True)
         
-        st.markdown(risk_message, unsafe_allow_html=True)
+            # Interpretation and recommendations
+            st.markdown("### Analysis and Recommendations")
+            st.markdown(clinical_rec, unsafe_allow_html=True)
         
-        # Risk meter
-        st.markdown('<div class="risk-meter">', unsafe_allow_html=True)
-        st.progress(int(risk))
-        st.markdown('<div class="risk-labels"><span class="risk-low">Low Risk</span><span class="risk-medium">Moderate Risk</span><span class="risk-high">High Risk</span></div>', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
+            if risk > 30:
+                st.markdown("""
+                #### Recommended Actions:
+                1. Schedule a follow-up with your healthcare provider for blood glucose testing
+                2. Consider consulting with a registered dietitian
+                3. Aim for at least 150 minutes of moderate exercise weekly
+                4. Monitor blood pressure and cholesterol regularly
+                """)
+            else:
+                st.markdown("""
+                #### Healthy Habits to Maintain:
+                1. Regular physical activity (150+ minutes per week)
+                2. Balanced diet rich in whole grains, lean proteins, and vegetables
+                3. Maintain a healthy weight
+                4. Continue regular health screenings
+                """)
         
-        # Interpretation and recommendations
-        st.markdown("### Analysis and Recommendations")
-        st.markdown(clinical_rec, unsafe_allow_html=True)
+            st.markdown('</div>', unsafe_allow_html=True)
         
-        if risk > 30:
-            st.markdown("""
-            #### Key Risk Factors:
-            - **BMI over 25** - Being overweight increases insulin resistance
-            - **Physical inactivity** - Regular exercise helps control glucose levels
-            - **High blood pressure** - Often co-occurs with Type 2 Diabetes
-            - **High cholesterol** - Increases cardiovascular risk in diabetic patients
-            
-            #### Recommended Actions:
-            1. Schedule a follow-up with your healthcare provider for blood glucose testing
-            2. Consider consulting with a registered dietitian
-            3. Aim for at least 150 minutes of moderate exercise weekly
-            4. Monitor blood pressure and cholesterol regularly
-            """)
+            # Disclaimer
+            st.info("**Disclaimer:** This assessment provides an estimate based on the information provided and should not replace professional medical advice. Always consult with a healthcare provider for proper diagnosis and treatment.")
+
+tracing.render_debug_panel(trace)
+
+# The patient's own drivers, attributed only on request: for the stacked
+# ensemble this scores every subset of the ten factors (1024 rows)
+with st.expander("Key risk factors"):
+    if st.checkbox("Show which factors raise or lower the risk for the values in the form", key="diabetes_drivers"):
+        model = get_model()
+        if model is None:
+            st.error("Model could not be loaded. Please check the file path and try again.")
         else:
-            st.markdown("""
-            #### Healthy Habits to Maintain:
-            1. Regular physical activity (150+ minutes per week)
-            2. Balanced diet rich in whole grains, lean proteins, and vegetables
-            3. Maintain a healthy weight
-            4. Continue regular health screenings
-            """)
-        
-        st.markdown('</div>', unsafe_allow_html=True)
-        
-        # Disclaimer
-        st.info("**Disclaimer:** This assessment provides an estimate based on the information provided and should not replace professional medical advice. Always consult with a healthcare provider for proper diagnosis and treatment.")
-
-# Shutdown H2O when app is closed
-if st.session_state.h2o_initialized and not st.session_state.get('h2o_shutdown'):
-    def shutdown_h2o():
-        h2o.cluster().shutdown()
-        st.session_state.h2o_shutdown = True
-    
-    # We can't directly call this on app close, but we can 
-    # make it happen if the user refreshes or exits
-    st.session_state.h2o_shutdown = False
\ No newline at end of file
+            try:
+                with st.spinner("Attributing the risk to each factor..."):
+                    contributions = diabetes_model.explain_one(model, input_dict)
+            except Exception as e:
+                metrics.inc("healthguard_prediction_errors_total", module="diabetes_contributions")
+                st.error(f"Risk factor analysis failed: {e}")
+            else:
+                drivers = sorted(FEATURE_LABELS, key=lambda column: abs(contributions[column]), reverse=True)
+                st.markdown("\n".join(
+                    f"- **{FEATURE_LABELS[column]}** ({format_input(column, input_dict[column])}) "
+                    f"{'raises' if contributions[column] > 0 else 'lowers'} the risk ({contributions[column]:+.2f})"
+                    for column in drivers[:MAX_DRIVERS] if abs(contributions[column]) >= MIN_CONTRIBUTION
+                ) or "No single factor stands out for this profile.")
+                st.caption("Contributions to the model's log-odds of diabetes relative to a typical patient; "
+                           "positive values raise the predicted risk.")
+
+# Risk across an input's whole range in one batched call instead of a resubmit per step
+def diabetes_sweep(input_dict, axes):
+    model = get_model()
+    if model is None:
+        raise RuntimeError("the model could not be loaded")
+    return what_if.diabetes_sweep(model, input_dict, axes)
+
+what_if.render_panel("diabetes", input_dict, what_if.DIABETES_RANGES, FEATURE_LABELS, diabetes_sweep)
+
+# Batch mode: score an uploaded intake list
+st.markdown('<div class="section-heading">Batch Assessment</div>', unsafe_allow_html=True)
+
+with st.expander("Upload a CSV of patients"):
+    st.markdown("The file needs one row per patient with the columns: " +
+                ", ".join(f"`{column}`" for column in diabetes_model.FEATURE_COLUMNS) +
+                ". Yes/No fields may be given as `Yes`/`No` or `1`/`0`.")
+    include_contributions = st.checkbox("Include per-feature contributions",
+                                        help="Adds a contrib_<column> log-odds contribution per factor to the results")
+    uploaded_file = st.file_uploader("Patient list", type=["csv"])
+
+    if uploaded_file is not None:
+        model = get_model()
+        if model is None:
+            st.error("Model could not be loaded. Please check the file path and try again.")
+        else:
+            import pandas as pd
+            try:
+                raw_df = pd.read_csv(uploaded_file)
+                # The history stores the encoded inputs the model scored, like the form and the service
+                input_df = diabetes_model.prepare_batch(raw_df)
+                progress = st.progress(0.0, text="Scoring patients...")
+                scored_chunks = []
+                for rows_done, chunk in diabetes_model.iter_batch_predictions(
+                        model, raw_df, contributions=include_contributions, input_df=input_df):
+                    scored_chunks.append(chunk)
+                    prediction_store.record("diabetes", "batch", input_df.iloc[rows_done - len(chunk):rows_done],
+                                            chunk["p1"], chunk["predict"], chunk["risk_band"],
+                                            diabetes_model.MOJO_PATH)
+                    progress.progress(rows_done / len(raw_df), text=f"Scored {rows_done:,} of {len(raw_df):,} patients")
+
+                if scored_chunks:
+                    results_df = pd.concat(scored_chunks)
+                else:
+                    # Same columns as a scored file
+                    added = ["predict", "p1", "risk_band"]
+                    if include_contributions:
+                        added += diabetes_model.CONTRIBUTION_COLUMNS
+                    results_df = raw_df.assign(**{column: [] for column in added})
+                st.dataframe(results_df.head(100))
+                st.download_button(
+                    "Download results",
+                    results_df.to_csv(index=False),
+                    file_name=f"diabetes_risk_{uploaded_file.name}",
+                    mime="text/csv",
+                )
+            except ValueError as e:
+                st.error(f"Invalid patient file: {e}")
+            except Exception as e:
+                metrics.inc("healthguard_prediction_errors_total", module="diabetes")
+                st.error(f"Batch prediction failed: {e}")
@@ -0,0 +1,339 @@
+import logging
+import math
+import os
+import time
+
+import numpy as np
+
+import metrics
+import model_cache
+import tracing
+from prediction_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+MOJO_PATH = "StackedEnsemble_AllModels_1_AutoML_1_20250331_161905.zip"
+
+# Columns of the input dictionary built by the diabetes form, in model order
+FEATURE_COLUMNS = [
+    "HighBP", "GenHlth", "HighChol", "CholCheck", "BMI",
+    "HvyAlcoholConsump", "PhysHlth", "MentHlth", "PhysActivity", "DiffWalk",
+]
+
+# Per-feature contributions to the log-odds of p1 added by contributions=True, then the bias
+CONTRIBUTION_COLUMNS = [f"contrib_{column}" for column in FEATURE_COLUMNS] + ["contrib_bias"]
+
+# Reference patient for models H2O cannot attribute (stacked ensembles): the
+# median respondent of the BRFSS diabetes health indicators data
+REFERENCE_PROFILE = {
+    "HighBP": 0, "GenHlth": 2, "HighChol": 0, "CholCheck": 1, "BMI": 27.0,
+    "HvyAlcoholConsump": 0, "PhysHlth": 0, "MentHlth": 0, "PhysActivity": 1, "DiffWalk": 0,
+}
+
+# "h2o" scores through the shared H2O cluster (h2o_cluster.py), "native" through
+# mojo_scorer without a JVM
+BACKEND = os.environ.get("HEALTHGUARD_DIABETES_BACKEND", "h2o").lower()
+
+
+# Bounds of the memoized single-patient predictions
+MEMO_MAX_ENTRIES = int(os.environ.get("HEALTHGUARD_DIABETES_MEMO_ENTRIES", "10000"))
+MEMO_MAX_BYTES = int(os.environ["HEALTHGUARD_DIABETES_MEMO_BYTES"]) if "HEALTHGUARD_DIABETES_MEMO_BYTES" in os.environ else None
+
+prediction_memo = LRUCache(MEMO_MAX_ENTRIES, MEMO_MAX_BYTES)
+metrics.register_cache("diabetes_memo", prediction_memo)
+# Contributions are only computed when the page's risk factor panel asks for them
+contribution_memo = LRUCache(MEMO_MAX_ENTRIES, MEMO_MAX_BYTES)
+metrics.register_cache("diabetes_contributions", contribution_memo)
+
+# Distinct patients a batch upload or service request may ask contributions
+# for; each one without TreeSHAP support costs 2^10 coalition rows
+MAX_CONTRIBUTION_PATIENTS = int(os.environ.get("HEALTHGUARD_DIABETES_MAX_CONTRIBUTION_PATIENTS", "5000"))
+
+
+def load_native_model(path=MOJO_PATH):
+    from mojo_scorer import load_mojo
+    return load_mojo(path)
+
+
+def load_model(path=MOJO_PATH, backend=BACKEND):
+    """Return the shared model for ``backend``, re-imported only when the MOJO changes."""
+    if backend == "native":
+        return model_cache.get_model(path, load_native_model)
+
+    import h2o
+    import h2o_cluster
+    h2o_cluster.connect()
+    return model_cache.get_model(path, h2o.import_mojo)
+
+
+def _score(model, input_df):
+    from mojo_scorer import MojoModel
+
+    if isinstance(model, MojoModel):
+        with tracing.span("diabetes.predict", rows=len(input_df), backend="native"):
+            return model.predict(input_df[FEATURE_COLUMNS])
+
+    import h2o
+    with tracing.span("diabetes.frame_build", rows=len(input_df)):
+        h2o_frame = h2o.H2OFrame(input_df[FEATURE_COLUMNS])
+    with tracing.span("diabetes.predict", rows=len(input_df), backend="h2o"):
+        prediction = model.predict(h2o_frame)
+    with tracing.span("diabetes.probability_extraction"):
+        return prediction.as_data_frame()
+
+
+# Model ids H2O refused to attribute; they go straight to the coalition method
+_no_tree_shap = set()
+
+
+def tree_shap_supported(model):
+    """Whether H2O's ``predict_contributions`` can attribute ``model`` (as far as known so far)."""
+    from mojo_scorer import MojoModel
+
+    return not isinstance(model, MojoModel) and model.model_id not in _no_tree_shap
+
+
+def _h2o_contributions(model, input_df):
+    """predict plus H2O's TreeSHAP contributions, or None if the model has none (not a tree model)."""
+    if not tree_shap_supported(model):
+        return None
+    import h2o
+    with tracing.span("diabetes.frame_build", rows=len(input_df)):
+        h2o_frame = h2o.H2OFrame(input_df[FEATURE_COLUMNS])
+    with tracing.span("diabetes.contributions", rows=len(input_df), backend="h2o"):
+        try:
+            contributions = model.predict_contributions(h2o_frame).as_data_frame()
+        except Exception as e:
+            logger.warning("H2O cannot attribute %s, using reference coalitions: %s", model.model_id, e)
+            _no_tree_shap.add(model.model_id)
+            return None
+    with tracing.span("diabetes.predict", rows=len(input_df), backend="h2o"):
+        pred_df = model.predict(h2o_frame).as_data_frame()
+    pred_df[CONTRIBUTION_COLUMNS] = contributions[FEATURE_COLUMNS + ["BiasTerm"]].to_numpy()
+    return pred_df
+
+
+def _coalition_contributions(model, input_df):
+    """predict plus exact Shapley values of the log-odds against REFERENCE_PROFILE.
+
+    Every distinct patient is expanded to one row per feature subset (the
+    subset's features from the patient, the rest from the reference) and all
+    rows are scored in a single call. The full subset is the patient itself,
+    so the same call yields the prediction.
+    """
+    import pandas as pd
+
+    n_features = len(FEATURE_COLUMNS)
+    subsets = np.arange(1 << n_features)
+    members = (subsets[:, None] >> np.arange(n_features) & 1).astype(bool)
+
+    values = input_df[FEATURE_COLUMNS].to_numpy(dtype=float)
+    patients, inverse = np.unique(values, axis=0, return_inverse=True)
+    reference = np.array([REFERENCE_PROFILE[column] for column in FEATURE_COLUMNS], dtype=float)
+    rows = np.where(members[None, :, :], patients[:, None, :], reference)
+    coalitions = pd.DataFrame(rows.reshape(-1, n_features), columns=FEATURE_COLUMNS).astype(
+        input_df[FEATURE_COLUMNS].dtypes.to_dict())
+
+    scored = _score(model, coalitions)
+    with tracing.span("diabetes.contributions", rows=len(input_df), backend="coalitions"):
+        p1 = np.clip(scored["p1"].to_numpy(dtype=float), 1e-15, 1 - 1e-15).reshape(len(patients), len(subsets))
+        log_odds = np.log(p1 / (1 - p1))
+        sizes = members.sum(axis=1)
+        weights = np.array([math.factorial(size) * math.factorial(n_features - size - 1)
+                            for size in range(n_features)]) / math.factorial(n_features)
+        phi = np.empty((len(patients), n_features + 1))
+        for i in range(n_features):
+            without = subsets[~members[:, i]]
+            phi[:, i] = (log_odds[:, without | 1 << i] - log_odds[:, without]) @ weights[sizes[without]]
+        phi[:, n_features] = log_odds[:, 0]
+
+        pred_df = scored.iloc[len(subsets) - 1::len(subsets)].reset_index(drop=True)
+        pred_df[CONTRIBUTION_COLUMNS] = phi
+        return pred_df.iloc[inverse.ravel()].reset_index(drop=True)
+
+
+def predict_frame(model, input_df, source="model", contributions=False):
+    """Score a DataFrame of FEATURE_COLUMNS and return H2O's predict/p0/p1 columns.
+
+    ``source`` labels the call in the prediction metrics (None: not recorded).
+    ``contributions=True`` adds the CONTRIBUTION_COLUMNS: H2O's TreeSHAP values
+    where the model supports them, otherwise Shapley values against
+    REFERENCE_PROFILE (stacked ensembles and the native backend). Those score
+    2^10 coalition rows per distinct patient, so callers ask for them only
+    when they are shown.
+    """
+    start = time.perf_counter()
+    if contributions:
+        pred_df = _h2o_contributions(model, input_df)
+        if pred_df is None:
+            pred_df = _coalition_contributions(model, input_df)
+    else:
+        pred_df = _score(model, input_df)
+
+    if source is not None:
+        bands, counts = np.unique(risk_band(pred_df["p1"]), return_counts=True)
+        metrics.record_predictions("diabetes", source, time.perf_counter() - start,
+                                   dict(zip(bands.tolist(), counts.tolist())))
+    return pred_df
+
+
+def feature_key(input_dict):
+    """Normalize an input_dict to a hashable tuple (BMI to 0.1, everything else integral)."""
+    return tuple(
+        round(float(input_dict[column]), 1) if column == "BMI" else int(input_dict[column])
+        for column in FEATURE_COLUMNS
+    )
+
+
+def predict_one(model, input_dict, path=MOJO_PATH):
+    """Score a single input_dict, memoized for repeated profiles."""
+    start = time.perf_counter()
+    with tracing.span("diabetes.memo_lookup") as attributes:
+        prediction_memo.bind(model_cache.fingerprint(path))
+        key = feature_key(input_dict)
+        row = prediction_memo.get(key)
+        attributes["hit"] = row is not None
+    if row is None:
+        import pandas as pd
+        input_df = pd.DataFrame([dict(zip(FEATURE_COLUMNS, key))])
+        row = predict_frame(model, input_df).iloc[0].to_dict()
+        prediction_memo.put(key, row)
+    else:
+        metrics.record_predictions("diabetes", "memo", time.perf_counter() - start,
+                                   {str(risk_band(row["p1"])): 1})
+    return row
+
+
+def explain_one(model, input_dict, path=MOJO_PATH):
+    """Feature -> contribution to the log-odds of p1 for one input_dict, plus the ``bias``.
+
+    Memoized per profile and model version like ``predict_one``; kept out of
+    it so that showing a result never waits for the attribution.
+    """
+    contribution_memo.bind(model_cache.fingerprint(path))
+    key = feature_key(input_dict)
+    contributions = contribution_memo.get(key)
+    if contributions is None:
+        import pandas as pd
+        input_df = pd.DataFrame([dict(zip(FEATURE_COLUMNS, key))])
+        row = predict_frame(model, input_df, source=None, contributions=True).iloc[0]
+        contributions = dict(zip(FEATURE_COLUMNS + ["bias"], row[CONTRIBUTION_COLUMNS].tolist()))
+        contribution_memo.put(key, contributions)
+    return contributions
+
+
+# Yes/No form fields; batch files may use either the labels or 0/1
+BINARY_COLUMNS = [
+    "HighBP", "HighChol", "CholCheck", "HvyAlcoholConsump", "PhysActivity", "DiffWalk",
+]
+
+# Risk bands shown on the results page (p1 thresholds)
+HIGH_RISK_THRESHOLD = 0.70
+MODERATE_RISK_THRESHOLD = 0.30
+
+# Rows per H2OFrame upload when scoring uploaded files
+BATCH_CHUNK_SIZE = 10_000
+
+
+def risk_band(p1):
+    """Map p1 values to the page's "low"/"medium"/"high" risk bands."""
+    p1 = np.asarray(p1, dtype=float)
+    return np.select([p1 > HIGH_RISK_THRESHOLD, p1 > MODERATE_RISK_THRESHOLD], ["high", "medium"], "low")
+
+
+def prepare_batch(raw_df):
+    """Validate an uploaded table and return it encoded like the form's input_dict."""
+    import pandas as pd
+
+    missing = [column for column in FEATURE_COLUMNS if column not in raw_df.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+    input_df = raw_df[FEATURE_COLUMNS].copy()
+    for column in BINARY_COLUMNS:
+        if not pd.api.types.is_numeric_dtype(input_df[column]):
+            input_df[column] = input_df[column].astype(str).str.strip().str.lower().map(
+                {"yes": 1, "no": 0, "1": 1, "0": 0})
+    input_df = input_df.apply(pd.to_numeric, errors="coerce")
+    if input_df.isna().any().any():
+        bad_rows = input_df.index[input_df.isna().any(axis=1)][:5].tolist()
+        raise ValueError(f"Invalid or empty values in rows {bad_rows}")
+    return input_df
+
+
+def iter_batch_predictions(model, raw_df, chunk_size=BATCH_CHUNK_SIZE, contributions=False, input_df=None):
+    """Score an uploaded table one chunk per predict call.
+
+    Yields ``(rows_done, chunk)`` where ``chunk`` holds the uploaded columns
+    plus ``predict``, ``p1`` and ``risk_band`` (and the CONTRIBUTION_COLUMNS
+    if asked for); chunks cover the table's rows in order. The whole table is
+    validated up front, unless the caller passes ``input_df``, its
+    ``prepare_batch`` encoding.
+    """
+    if input_df is None:
+        input_df = prepare_batch(raw_df)
+    if contributions:
+        yield from _iter_batch_contributions(model, raw_df, input_df, chunk_size)
+        return
+    for start in range(0, len(input_df), chunk_size):
+        pred_df = predict_frame(model, input_df.iloc[start:start + chunk_size])
+        chunk = raw_df.iloc[start:start + chunk_size].copy()
+        chunk["predict"] = pred_df["predict"].to_numpy()
+        chunk["p1"] = pred_df["p1"].to_numpy()
+        chunk["risk_band"] = risk_band(chunk["p1"])
+        yield start + len(chunk), chunk
+
+
+def check_contribution_patients(count, unit):
+    """Raise ValueError if ``count`` distinct patients exceed MAX_CONTRIBUTION_PATIENTS for one ``unit``."""
+    if count > MAX_CONTRIBUTION_PATIENTS:
+        raise ValueError(f"Contributions are limited to {MAX_CONTRIBUTION_PATIENTS:,} distinct patients per {unit}; "
+                         f"this {unit} has {count:,}")
+
+
+def _iter_batch_contributions(model, raw_df, input_df, chunk_size):
+    """``iter_batch_predictions`` with contributions, scoring each distinct patient once.
+
+    Distinct patients are scored in order of first appearance, in calls of
+    about ``chunk_size`` model rows (2^10 coalition rows per patient when the
+    model has no TreeSHAP), and file rows are yielded as soon as all of their
+    patients are done.
+    """
+    values = input_df[FEATURE_COLUMNS].to_numpy(dtype=float)
+    _, first, inverse = np.unique(values, axis=0, return_index=True, return_inverse=True)
+    check_contribution_patients(len(first), "file")
+
+    # Patient number of every row, numbered by first appearance
+    order = np.argsort(first)
+    number = np.empty_like(order)
+    number[order] = np.arange(len(order))
+    row_patient = number[inverse.ravel()]
+    # Patients that must be scored before each row, and every row above it, can be yielded
+    needed = np.maximum.accumulate(row_patient) + 1 if len(row_patient) else row_patient
+    patients = input_df.iloc[first[order]]
+
+    if tree_shap_supported(model):
+        # Finds out on one patient whether the coalition method is needed
+        _h2o_contributions(model, patients.iloc[:1])
+    per_call = chunk_size if tree_shap_supported(model) else max(1, chunk_size >> len(FEATURE_COLUMNS))
+
+    predict, p1 = np.empty(len(patients), dtype=object), np.empty(len(patients))
+    contribution_values = np.empty((len(patients), len(CONTRIBUTION_COLUMNS)))
+    rows_done = 0
+    for start in range(0, len(patients), per_call):
+        pred_df = predict_frame(model, patients.iloc[start:start + per_call], contributions=True)
+        end = start + len(pred_df)
+        predict[start:end] = pred_df["predict"].to_numpy()
+        p1[start:end] = pred_df["p1"].to_numpy()
+        contribution_values[start:end] = pred_df[CONTRIBUTION_COLUMNS].to_numpy()
+
+        ready = int(np.searchsorted(needed, end, side="right"))
+        if ready > rows_done:
+            rows = row_patient[rows_done:ready]
+            chunk = raw_df.iloc[rows_done:ready].copy()
+            chunk["predict"] = predict[rows].tolist()
+            chunk["p1"] = p1[rows]
+            chunk["risk_band"] = risk_band(chunk["p1"])
+            chunk[CONTRIBUTION_COLUMNS] = contribution_values[rows]
+            rows_done = ready
+            yield rows_done, chunk
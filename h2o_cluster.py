@@ -0,0 +1,188 @@
+"""One shared, resource-limited H2O instance per machine.
+
+``connect()`` is called before anything talks to H2O. It connects once per
+process and reuses that connection for every session and thread:
+
+* With ``HEALTHGUARD_H2O_URL`` set it attaches to that (externally managed)
+  cluster and never shuts it down.
+* Otherwise it attaches to the local instance on ``HEALTHGUARD_H2O_PORT``
+  (default 54321) if one is already running, or starts one with
+  ``HEALTHGUARD_H2O_NTHREADS`` threads and ``HEALTHGUARD_H2O_MAX_MEM_SIZE``
+  heap. The Streamlit server, the scoring service and any other process on
+  the machine therefore share a single JVM.
+
+The JVM is launched detached rather than through ``h2o.init()``, which would
+tie its lifetime to the process that happened to start it. Every attached
+process registers its pid in a machine-wide directory; at exit each process
+deregisters and the last one out shuts the JVM down, so no instance is left
+behind after the servers stop. A JVM leaked by a killed process is reused
+(and later shut down) by the next process that attaches to it.
+"""
+import atexit
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: processes coordinate through the port check alone
+    fcntl = None
+
+URL = os.environ.get("HEALTHGUARD_H2O_URL")
+HOST = "127.0.0.1"
+PORT = int(os.environ.get("HEALTHGUARD_H2O_PORT", "54321"))
+NTHREADS = int(os.environ.get("HEALTHGUARD_H2O_NTHREADS", "2"))
+MAX_MEM_SIZE = os.environ.get("HEALTHGUARD_H2O_MAX_MEM_SIZE", "2G")
+CLUSTER_NAME = os.environ.get("HEALTHGUARD_H2O_NAME", "healthguard")
+STARTUP_TIMEOUT = 120
+
+# Shared by every process on the machine, so it lives outside the per-checkout cache
+STATE_DIR = os.path.join(tempfile.gettempdir(), f"healthguard-h2o-{PORT}")
+
+_lock = threading.Lock()
+_connected = False
+
+
+@contextmanager
+def _machine_lock():
+    os.makedirs(STATE_DIR, exist_ok=True)
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(STATE_DIR, "lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _cloud_name():
+    """Name of the H2O cluster answering on HOST:PORT, or None if nothing is listening."""
+    try:
+        with urllib.request.urlopen(f"http://{HOST}:{PORT}/3/Cloud", timeout=2) as response:
+            return json.load(response).get("cloud_name")
+    except (OSError, ValueError):
+        return None
+
+
+def _java():
+    for home in (os.environ.get("H2O_JAVA_HOME"), os.environ.get("JAVA_HOME")):
+        if home and os.path.exists(os.path.join(home, "bin", "java")):
+            return os.path.join(home, "bin", "java")
+    java = shutil.which("java")
+    if java is None:
+        raise RuntimeError("Cannot start H2O: java was not found (set JAVA_HOME)")
+    return java
+
+
+def _jar():
+    import h2o
+
+    jar = os.environ.get("H2O_JAR_PATH") or os.path.join(os.path.dirname(h2o.__file__), "backend", "bin", "h2o.jar")
+    if not os.path.exists(jar):
+        raise RuntimeError(f"Cannot start H2O: {jar} not found")
+    return jar
+
+
+def _launch():
+    """Start a detached H2O JVM and wait until it answers."""
+    log_dir = os.path.join(STATE_DIR, "logs")
+    os.makedirs(log_dir, exist_ok=True)
+    command = [
+        _java(), f"-Xmx{MAX_MEM_SIZE}", "-jar", _jar(),
+        "-name", CLUSTER_NAME, "-ip", HOST, "-web_ip", HOST, "-port", str(PORT),
+        "-nthreads", str(NTHREADS), "-ice_root", os.path.join(STATE_DIR, "ice"), "-log_dir", log_dir,
+    ]
+    with open(os.path.join(log_dir, "stdout.log"), "ab") as out:
+        # Own session, so it is not killed with the process that launched it
+        process = subprocess.Popen(command, stdout=out, stderr=subprocess.STDOUT,
+                                   stdin=subprocess.DEVNULL, start_new_session=True)
+    with open(os.path.join(STATE_DIR, "managed.json"), "w") as f:
+        json.dump({"jvm_pid": process.pid, "started_by": os.getpid(), "started_at": time.time()}, f)
+
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while _cloud_name() is None:
+        if process.poll() is not None:
+            raise RuntimeError(f"H2O exited during startup; see {log_dir}")
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"H2O did not start within {STARTUP_TIMEOUT}s; see {log_dir}")
+        time.sleep(0.5)
+
+
+def _clients_dir():
+    return os.path.join(STATE_DIR, "clients")
+
+
+def _live_clients():
+    clients = []
+    for name in os.listdir(_clients_dir()):
+        pid = int(name)
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            os.remove(os.path.join(_clients_dir(), name))
+            continue
+        except PermissionError:
+            pass
+        clients.append(pid)
+    return clients
+
+
+def connect():
+    """Connect this process to the shared H2O instance (starting it if needed)."""
+    global _connected
+    with _lock:
+        if _connected:
+            return
+        import h2o
+
+        if URL:
+            h2o.connect(url=URL, verbose=False)
+            _connected = True
+            return
+
+        with _machine_lock():
+            name = _cloud_name()
+            if name is None:
+                print(f"Starting H2O on {HOST}:{PORT} (nthreads={NTHREADS}, max_mem_size={MAX_MEM_SIZE})")
+                _launch()
+            elif name != CLUSTER_NAME:
+                raise RuntimeError(f"Port {PORT} is used by another H2O cluster ({name}); set HEALTHGUARD_H2O_PORT")
+            os.makedirs(_clients_dir(), exist_ok=True)
+            open(os.path.join(_clients_dir(), str(os.getpid())), "w").close()
+
+        h2o.connect(ip=HOST, port=PORT, verbose=False)
+        atexit.register(release)
+        _connected = True
+
+
+def release():
+    """Detach this process; shuts the JVM down if this was the last process using it."""
+    global _connected
+    with _lock:
+        if not _connected or URL:
+            return
+        _connected = False
+        import h2o
+
+        with _machine_lock():
+            try:
+                os.remove(os.path.join(_clients_dir(), str(os.getpid())))
+            except FileNotFoundError:
+                pass
+            if _live_clients() or not os.path.exists(os.path.join(STATE_DIR, "managed.json")):
+                return
+            try:
+                h2o.cluster().shutdown()
+                print(f"Shut down H2O on {HOST}:{PORT}")
+            except Exception as e:
+                print(f"Error shutting down H2O: {e}")
+            os.remove(os.path.join(STATE_DIR, "managed.json"))
+
@@ -0,0 +1,298 @@
+"""Prometheus metrics for prediction traffic.
+
+Exposes, in the Prometheus text format:
+
+    healthguard_predictions_total           rows scored, by module and source (model/table/memo)
+    healthguard_prediction_seconds          latency histogram of scoring calls
+    healthguard_prediction_errors_total     failed predictions, by module
+    healthguard_risk_band_total             predictions per risk band
+    healthguard_cache_hits_total / _misses_total / _hit_ratio
+                                            prediction caches (diabetes memo, cardio lookup table)
+    healthguard_model_loads_total / _load_seconds_total / _last_load_seconds
+    healthguard_model_cache_hits_total      per model artifact, from model_cache
+    healthguard_model_ready                 warm-up state per model (1 once ready)
+    healthguard_prediction_store_rows_total prediction history rows written, dropped or failed
+
+Recording never takes a lock: every thread writes to its own shard of plain
+dicts and the shards are only summed when the endpoint is scraped. Shards of
+finished threads are folded into one retired shard at scrape time, so the
+scoring service's thread-per-request server does not grow the shard list.
+
+The Streamlit router starts the endpoint on ``HEALTHGUARD_METRICS_PORT``
+(default 9464, 0 disables it); the scoring service serves ``GET /metrics``
+on its own port.
+"""
+import bisect
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import model_cache
+
+HOST = os.environ.get("HEALTHGUARD_METRICS_HOST", "127.0.0.1")
+PORT = int(os.environ.get("HEALTHGUARD_METRICS_PORT", "9464") or 0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Metrics recorded on the prediction path: name -> (type, help, histogram buckets)
+METRICS = {
+    "healthguard_predictions_total": ("counter", "Rows scored.", None),
+    "healthguard_prediction_seconds": ("histogram", "Latency of scoring calls in seconds.", LATENCY_BUCKETS),
+    "healthguard_prediction_errors_total": ("counter", "Predictions that failed.", None),
+    "healthguard_risk_band_total": ("counter", "Predictions per risk band.", None),
+    "healthguard_cache_hits_total": ("counter", "Prediction cache hits.", None),
+    "healthguard_cache_misses_total": ("counter", "Prediction cache misses.", None),
+    "healthguard_prediction_store_rows_total": ("counter", "Prediction history rows, by outcome (written/dropped/failed).", None),
+}
+
+
+class _Shard:
+    """Counters and histograms written by a single thread."""
+
+    def __init__(self, thread=None):
+        self.thread = thread
+        self.counters = {}
+        # key -> [count per bucket..., count above the last bucket, sum]
+        self.histograms = {}
+
+    def merge(self, counters, histograms):
+        # dict.copy() and list() run without releasing the GIL, so they are
+        # consistent snapshots even while the owning thread keeps recording
+        for key, value in self.counters.copy().items():
+            counters[key] = counters.get(key, 0) + value
+        for key, counts in self.histograms.copy().items():
+            counts = list(counts)
+            total = histograms.setdefault(key, [0] * len(counts))
+            for i, count in enumerate(counts):
+                total[i] += count
+
+
+_local = threading.local()
+_shards = []
+_retired = _Shard()
+_shards_lock = threading.Lock()
+
+# Objects with ``hits``/``misses`` counters, reported under healthguard_cache_*
+_caches = {}
+
+
+def _shard():
+    try:
+        return _local.shard
+    except AttributeError:
+        # Once per thread, never on later calls
+        shard = _local.shard = _Shard(threading.current_thread())
+        with _shards_lock:
+            _shards.append(shard)
+        return shard
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    """Add ``value`` to the counter ``name`` with ``labels``."""
+    counters = _shard().counters
+    key = _key(name, labels)
+    counters[key] = counters.get(key, 0) + value
+
+
+def observe(name, value, **labels):
+    """Record ``value`` in the histogram ``name`` with ``labels``."""
+    histograms = _shard().histograms
+    buckets = METRICS[name][2]
+    key = _key(name, labels)
+    counts = histograms.get(key)
+    if counts is None:
+        counts = histograms[key] = [0] * (len(buckets) + 2)
+    counts[bisect.bisect_left(buckets, value)] += 1
+    counts[-1] += value
+
+
+def record_predictions(module, source, seconds, band_counts):
+    """Record one scoring call: its latency, the rows it scored and their risk bands."""
+    labels = (("module", module), ("source", source))
+    shard = _shard()
+    counters = shard.counters
+
+    key = ("healthguard_predictions_total", labels)
+    counters[key] = counters.get(key, 0) + sum(band_counts.values())
+    for band, count in band_counts.items():
+        key = ("healthguard_risk_band_total", (("band", band), ("module", module)))
+        counters[key] = counters.get(key, 0) + count
+
+    key = ("healthguard_prediction_seconds", labels)
+    counts = shard.histograms.get(key)
+    if counts is None:
+        counts = shard.histograms[key] = [0] * (len(LATENCY_BUCKETS) + 2)
+    counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+    counts[-1] += seconds
+
+
+@contextmanager
+def timer(name, **labels):
+    """Observe the duration of the enclosed block in the histogram ``name``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def register_cache(name, cache):
+    """Report ``cache.hits``/``cache.misses`` as the ``cache="name"`` series."""
+    _caches[name] = cache
+
+
+def _collect():
+    """Sum every shard, folding those of finished threads into the retired shard."""
+    counters, histograms = {}, {}
+    with _shards_lock:
+        for shard in list(_shards):
+            if not shard.thread.is_alive():
+                # A finished thread never records again, so its shard is final
+                shard.merge(_retired.counters, _retired.histograms)
+                _shards.remove(shard)
+            else:
+                shard.merge(counters, histograms)
+        _retired.merge(counters, histograms)
+    return counters, histograms
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _family(lines, name, kind, help_text, samples):
+    if not samples:
+        return
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in sorted(samples):
+        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+
+def _histogram(lines, name, help_text, buckets, series):
+    if not series:
+        return
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, counts in sorted(series.items()):
+        cumulative = 0
+        for bound, count in zip(buckets + (float("inf"),), counts[:-1]):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(float(bound))
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(float(counts[-1]))}")
+        lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    counters, histograms = _collect()
+    for name, cache in _caches.items():
+        for metric, value in (("healthguard_cache_hits_total", cache.hits),
+                              ("healthguard_cache_misses_total", cache.misses)):
+            key = _key(metric, {"cache": name})
+            counters[key] = counters.get(key, 0) + value
+
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        if kind == "histogram":
+            _histogram(lines, name, help_text, buckets,
+                       {labels: counts for (metric, labels), counts in histograms.items() if metric == name})
+        else:
+            _family(lines, name, kind, help_text,
+                    [(labels, value) for (metric, labels), value in counters.items() if metric == name])
+
+    hit_ratio = []
+    for labels in {labels for (metric, labels) in counters
+                   if metric in ("healthguard_cache_hits_total", "healthguard_cache_misses_total")}:
+        hits = counters.get(("healthguard_cache_hits_total", labels), 0)
+        total = hits + counters.get(("healthguard_cache_misses_total", labels), 0)
+        hit_ratio.append((labels, hits / total if total else 0.0))
+    _family(lines, "healthguard_cache_hit_ratio", "gauge", "Prediction cache hit ratio.", hit_ratio)
+
+    models = [(os.path.basename(path), stats) for path, stats in model_cache.stats().items()]
+    for name, kind, help_text, field in (
+        ("healthguard_model_loads_total", "counter", "Model artifact loads.", "loads"),
+        ("healthguard_model_load_seconds_total", "counter", "Time spent loading model artifacts.", "total_load_seconds"),
+        ("healthguard_model_last_load_seconds", "gauge", "Duration of the latest model load.", "last_load_seconds"),
+        ("healthguard_model_cache_hits_total", "counter", "Model cache lookups served without loading.", "hits"),
+    ):
+        _family(lines, name, kind, help_text,
+                [((("model", model),), stats[field]) for model, stats in models if stats[field] is not None])
+
+    # Read only if this process started the warm-up
+    warmup = sys.modules.get("warmup")
+    if warmup is not None:
+        states = warmup.status()["models"]
+        _family(lines, "healthguard_model_ready", "gauge", "1 once the model is loaded and warmed up.",
+                [((("model", model),), int(state["state"] == warmup.READY)) for model, state in states.items()])
+        _family(lines, "healthguard_warmup_seconds", "gauge", "Time the model warm-up took.",
+                [((("model", model),), state["seconds"]) for model, state in states.items()
+                 if state["seconds"] is not None])
+
+    return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        data = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_started = False
+_server_lock = threading.Lock()
+
+
+def start_server(port=PORT, host=HOST):
+    """Serve ``/metrics`` on a background thread, once per process (no-op if port is 0)."""
+    global _server, _server_started
+    with _server_lock:
+        if _server_started or not port:
+            return _server
+        # Tried once per process; Streamlit calls this on every rerun
+        _server_started = True
+        try:
+            _server = ThreadingHTTPServer((host, port), MetricsHandler)
+        except OSError as e:
+            print(f"Error starting metrics endpoint on {host}:{port}: {e}")
+            return None
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server
+
+
+if __name__ == "__main__":
+    print(render(), end="")
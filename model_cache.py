@@ -0,0 +1,151 @@
+"""Process-wide cache for model artifacts.
+
+Streamlit re-executes page scripts on every interaction, but imported modules
+live for the whole server process, so models held here are shared by every
+session. An artifact is reloaded only when its content changes: a cheap
+mtime/size check runs on every lookup, and a content hash decides whether a
+touched file really needs to be deserialized again. Entries are kept per
+path and loader, so loading one file two ways (the diabetes MOJO through H2O
+and through the native scorer) yields two independent models.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+# Directory for artifacts derived from models and datasets (lookup tables, indexes)
+CACHE_DIR = os.environ.get("HEALTHGUARD_CACHE_DIR", "cache")
+
+
+def _umask():
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+# Modes open() and os.makedirs() give new entries; mkstemp and mkdtemp create
+# private (0600/0700) ones, which are widened to these before being installed
+_UMASK = _umask()
+FILE_MODE = 0o666 & ~_UMASK
+DIR_MODE = 0o777 & ~_UMASK
+
+
+def write_atomic(path, write):
+    """Create ``path`` by calling ``write`` on a binary temporary file, then renaming it into place.
+
+    Every writer gets its own temporary file, so processes rebuilding the same
+    artifact at once (Streamlit replicas, the scoring service) never rename
+    each other's partial files into place.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".",
+                                    suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.chmod(tmp_path, FILE_MODE)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _Entry:
+    def __init__(self):
+        self.model = None
+        self.stamp = None
+        self.sha256 = None
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.last_load_seconds = None
+        self.last_loaded = None
+        self.total_load_seconds = 0.0
+
+
+class ModelCache:
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, path, loader):
+        """Return ``loader(path)``, reusing the cached object while the file is unchanged."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+
+        entry = self._entries.get((path, loader))
+        if entry is not None and entry.stamp == stamp:
+            entry.hits += 1
+            return entry.model
+
+        with self._lock:
+            entry = self._entries.setdefault((path, loader), _Entry())
+            if entry.stamp == stamp:
+                entry.hits += 1
+                return entry.model
+
+            sha256 = file_sha256(path)
+            if entry.sha256 == sha256:
+                # Touched but identical content: keep the loaded model
+                entry.stamp = stamp
+                entry.hits += 1
+                return entry.model
+
+            entry.misses += 1
+            start = time.perf_counter()
+            model = loader(path)
+            elapsed = time.perf_counter() - start
+
+            entry.model, entry.stamp, entry.sha256 = model, stamp, sha256
+            entry.loads += 1
+            entry.last_load_seconds = elapsed
+            entry.last_loaded = time.monotonic()
+            entry.total_load_seconds += elapsed
+            return model
+
+    def _latest(self, path):
+        """Entry of ``path`` loaded most recently, by any loader."""
+        entries = [entry for (entry_path, _), entry in list(self._entries.items())
+                   if entry_path == path and entry.last_loaded is not None]
+        return max(entries, key=lambda entry: entry.last_loaded, default=None)
+
+    def fingerprint(self, path):
+        """Content hash of the currently cached version of ``path`` (None if never loaded)."""
+        entry = self._latest(os.path.abspath(path))
+        return entry.sha256 if entry is not None else None
+
+    def stats(self):
+        """Per-path statistics, summed over the loaders that loaded the path."""
+        stats = {}
+        for (path, _), entry in list(self._entries.items()):
+            totals = stats.setdefault(path, {"hits": 0, "misses": 0, "loads": 0, "total_load_seconds": 0.0})
+            totals["hits"] += entry.hits
+            totals["misses"] += entry.misses
+            totals["loads"] += entry.loads
+            totals["total_load_seconds"] += entry.total_load_seconds
+        for path, totals in stats.items():
+            latest = self._latest(path)
+            totals["hit_rate"] = totals["hits"] / max(totals["hits"] + totals["misses"], 1)
+            totals["last_load_seconds"] = latest.last_load_seconds if latest is not None else None
+            totals["sha256"] = latest.sha256 if latest is not None else None
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = ModelCache()
+get_model = _cache.get
+fingerprint = _cache.fingerprint
+stats = _cache.stats
+clear = _cache.clear
@@ -0,0 +1,468 @@
+"""In-process scorer for H2O MOJO archives.
+
+Reads the model.ini, domain files and tree blobs of a MOJO zip into NumPy
+arrays so binomial models can be scored without starting an H2O JVM.
+Supports the algorithms H2O AutoML stacks together: GBM, DRF, GLM, XGBoost
+and DeepLearning, plus the StackedEnsemble that combines them.
+
+Run as a script to check parity against H2O's own ``p1`` output:
+
+    python mojo_scorer.py MODEL.zip rows.csv
+
+tests/test_mojo_scorer.py runs the same check on fixed rows of the diabetes
+MOJO (skipped without h2o, Java or the MOJO).
+"""
+import abc
+import io
+import struct
+import sys
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+# NA split directions written by SharedTreeMojoWriter
+NSD_NA_VS_REST = 1
+NSD_NA_LEFT = 2
+NSD_LEFT = 4
+
+# Floor of the logit transform the ensemble applies to base predictions, as
+# in H2O's StackedEnsembleMojoModel (p = 0 maps here, p = 1 to +inf)
+LOGIT_MIN = -19.0
+
+
+class _Reader:
+    """Reads files from a MOJO zip, optionally from a nested sub-model directory."""
+
+    def __init__(self, archive, prefix=""):
+        self.archive = archive
+        self.prefix = prefix
+
+    def read_bytes(self, name):
+        return self.archive.read(self.prefix + name)
+
+    def read_text(self, name):
+        return self.read_bytes(name).decode("utf-8")
+
+    def nested(self, directory):
+        return _Reader(self.archive, self.prefix + directory.rstrip("/") + "/")
+
+
+def _parse_ini(text):
+    info, columns, domains = {}, [], {}
+    section = None
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        if line in ("[info]", "[columns]", "[domains]"):
+            section = line[1:-1]
+        elif section == "info":
+            key, _, value = line.partition("=")
+            info[key.strip()] = value.strip()
+        elif section == "columns":
+            columns.append(line)
+        elif section == "domains":
+            index, _, rest = line.partition(":")
+            domains[int(index)] = rest.split()[-1]
+    return info, columns, domains
+
+
+def _array(info, key, dtype=np.float64):
+    value = info.get(key)
+    if value is None or value == "null":
+        return None
+    items = [item.strip() for item in value.strip("[]").split(",") if item.strip()]
+    return np.array([float(item) for item in items], dtype=dtype)
+
+
+def _flag(info, key, default=False):
+    return info.get(key, str(default)).lower() == "true"
+
+
+def _level_index(values, levels):
+    # Match raw values against a categorical domain; unknown levels become NaN
+    lookup = {level: i for i, level in enumerate(levels)}
+    out = np.full(len(values), np.nan)
+    for i, value in enumerate(values):
+        if isinstance(value, (float, np.floating)) and float(value).is_integer():
+            value = int(value)
+        out[i] = lookup.get(str(value), np.nan)
+    return out
+
+
+class MojoModel(abc.ABC):
+    """Common metadata and input encoding shared by every MOJO algorithm."""
+
+    def __init__(self, reader, info, columns, domains):
+        self.algo = info["algo"]
+        self.n_features = int(info["n_features"])
+        self.n_classes = int(info["n_classes"])
+        self.features = columns[:self.n_features]
+        self.default_threshold = float(info.get("default_threshold", 0.5))
+        self.domains = {
+            index: reader.read_text(f"domains/{name}").splitlines()
+            for index, name in domains.items()
+        }
+        if self.n_classes != 2:
+            raise NotImplementedError(f"Only binomial MOJOs are supported, got {self.n_classes} classes")
+
+    def encode(self, frame):
+        """Return the model's feature matrix for ``frame`` (categoricals as level indices)."""
+        matrix = np.empty((len(frame), self.n_features))
+        for i, name in enumerate(self.features):
+            values = frame[name].to_numpy() if name in frame else np.full(len(frame), np.nan)
+            if i in self.domains:
+                matrix[:, i] = _level_index(values, self.domains[i])
+            else:
+                matrix[:, i] = pd.to_numeric(values, errors="coerce")
+        return matrix
+
+    @abc.abstractmethod
+    def predict_p1(self, frame):
+        """Probability of the positive class for every row of ``frame``."""
+
+    def predict(self, frame):
+        """Score a DataFrame, returning the ``predict``/``p0``/``p1`` columns H2O would."""
+        p1 = self.predict_p1(frame)
+        labels = self.response_domain or ["0", "1"]
+        label = np.where(p1 >= self.default_threshold, labels[1], labels[0])
+        result = pd.DataFrame({"predict": label, "p0": 1.0 - p1, "p1": p1})
+        try:
+            result["predict"] = result["predict"].astype(int)
+        except ValueError:
+            pass
+        return result
+
+    @property
+    def response_domain(self):
+        return self.domains.get(self.n_features)
+
+
+class _EncodedModel(MojoModel):
+    """A model that scores the encoded feature matrix directly."""
+
+    def predict_p1(self, frame):
+        return self.score(self.encode(frame))
+
+    @abc.abstractmethod
+    def score(self, matrix):
+        """Probability of the positive class for every row of ``matrix`` (see ``encode``)."""
+
+
+class _Tree:
+    """One H2O tree flattened into parallel node arrays."""
+
+    def __init__(self, blob):
+        self.feature, self.threshold, self.value = [], [], []
+        self.left, self.right = [], []
+        self.na_left, self.na_vs_rest = [], []
+        self.bitsets = {}
+        self._parse(blob, 0)
+        self.feature = np.array(self.feature, dtype=np.int32)
+        self.threshold = np.array(self.threshold, dtype=np.float64)
+        self.value = np.array(self.value, dtype=np.float64)
+        self.left = np.array(self.left, dtype=np.int32)
+        self.right = np.array(self.right, dtype=np.int32)
+        self.na_left = np.array(self.na_left, dtype=bool)
+        self.na_vs_rest = np.array(self.na_vs_rest, dtype=bool)
+        self.is_leaf = self.feature < 0
+
+    def _node(self, feature=-1, threshold=np.nan, value=np.nan, na_left=False, na_vs_rest=False):
+        self.feature.append(feature)
+        self.threshold.append(threshold)
+        self.value.append(value)
+        self.left.append(-1)
+        self.right.append(-1)
+        self.na_left.append(na_left)
+        self.na_vs_rest.append(na_vs_rest)
+        return len(self.feature) - 1
+
+    def _leaf(self, blob, pos):
+        return self._node(value=struct.unpack_from("<f", blob, pos)[0])
+
+    def _parse(self, blob, pos):
+        node_type = blob[pos]
+        column = struct.unpack_from("<H", blob, pos + 1)[0]
+        pos += 3
+        if column == 65535:
+            return self._leaf(blob, pos)
+        na_dir = blob[pos]
+        pos += 1
+        na_vs_rest = na_dir == NSD_NA_VS_REST
+        left_mask = node_type & 51
+        equal = node_type & 12
+
+        threshold, bitset = np.nan, None
+        if not na_vs_rest:
+            if equal == 0:
+                threshold = struct.unpack_from("<f", blob, pos)[0]
+                pos += 4
+            elif equal == 8:
+                bitset = (0, 32, np.frombuffer(blob, np.uint8, 4, pos))
+                pos += 4
+            else:
+                bit_offset, n_bits = struct.unpack_from("<Hi", blob, pos)
+                pos += 6
+                n_bytes = ((n_bits - 1) >> 3) + 1
+                bitset = (bit_offset, n_bits, np.frombuffer(blob, np.uint8, n_bytes, pos))
+                pos += n_bytes
+
+        index = self._node(column, threshold, na_left=na_dir in (NSD_NA_LEFT, NSD_LEFT), na_vs_rest=na_vs_rest)
+        if bitset is not None:
+            self.bitsets[index] = bitset
+
+        if left_mask <= 3:
+            size_bytes = left_mask + 1
+            skip = int.from_bytes(blob[pos:pos + size_bytes], "little")
+            pos += size_bytes
+            self.left[index] = self._parse(blob, pos)
+            pos += skip
+        else:
+            self.left[index] = self._leaf(blob, pos)
+            pos += 4
+
+        if ((node_type & 0xC0) >> 2) & 16:
+            self.right[index] = self._leaf(blob, pos)
+        else:
+            self.right[index] = self._parse(blob, pos)
+        return index
+
+    def _go_right(self, node, x):
+        right = ~self.na_vs_rest[node] & (x >= self.threshold[node])
+        missing = np.isnan(x)
+        for index, (bit_offset, n_bits, bits) in self.bitsets.items():
+            here = node == index
+            if not here.any():
+                continue
+            level = np.where(np.isnan(x[here]), -1, x[here]).astype(np.int64) - bit_offset
+            in_range = (level >= 0) & (level < n_bits)
+            safe = np.where(in_range, level, 0)
+            hit = in_range & ((bits[safe >> 3] >> (safe & 7)) & 1).astype(bool)
+            right[here] = hit
+            missing[here] |= ~in_range
+        return np.where(missing, ~self.na_left[node], right)
+
+    def score(self, matrix):
+        node = np.zeros(len(matrix), dtype=np.int32)
+        active = np.flatnonzero(~self.is_leaf[node])
+        while active.size:
+            current = node[active]
+            x = matrix[active, self.feature[current]]
+            node[active] = np.where(self._go_right(current, x), self.right[current], self.left[current])
+            active = active[~self.is_leaf[node[active]]]
+        return self.value[node]
+
+
+class _TreeModel(_EncodedModel):
+    def __init__(self, reader, info, columns, domains):
+        super().__init__(reader, info, columns, domains)
+        n_trees = int(info["n_trees"])
+        per_class = int(info["n_trees_per_class"])
+        self.trees = [
+            [_Tree(reader.read_bytes(f"trees/t{k:02d}_{i:03d}.bin")) for i in range(n_trees)]
+            for k in range(per_class)
+        ]
+
+    def tree_sums(self, matrix):
+        sums = np.zeros((len(self.trees), len(matrix)))
+        for k, trees in enumerate(self.trees):
+            for tree in trees:
+                sums[k] += tree.score(matrix)
+        return sums
+
+
+class _GbmModel(_TreeModel):
+    def __init__(self, reader, info, columns, domains):
+        super().__init__(reader, info, columns, domains)
+        self.init_f = float(info.get("init_f", 0.0))
+        self.distribution = info.get("distribution", "bernoulli")
+        # Both use the logistic link; modified_huber maps scores to probabilities differently
+        if self.distribution not in ("bernoulli", "quasibinomial"):
+            raise NotImplementedError(f"Unsupported GBM distribution: {self.distribution}")
+
+    def score(self, matrix):
+        f = self.tree_sums(matrix)[0] + self.init_f
+        return 1.0 / (1.0 + np.exp(-f))
+
+
+class _DrfModel(_TreeModel):
+    def __init__(self, reader, info, columns, domains):
+        super().__init__(reader, info, columns, domains)
+        self.double_trees = _flag(info, "binomial_double_trees")
+
+    def score(self, matrix):
+        sums = self.tree_sums(matrix)
+        if self.double_trees:
+            return sums[1] / (sums[0] + sums[1])
+        # Binomial DRF leaves hold the class-0 probability
+        return 1.0 - sums[0] / len(self.trees[0])
+
+
+class _GlmModel(_EncodedModel):
+    def __init__(self, reader, info, columns, domains):
+        super().__init__(reader, info, columns, domains)
+        self.beta = _array(info, "beta")
+        self.cats = int(info.get("cats", 0))
+        self.cat_offsets = _array(info, "cat_offsets", np.int64)
+        self.cat_modes = _array(info, "cat_modes", np.int64)
+        self.num_means = _array(info, "num_means")
+        self.use_all_levels = _flag(info, "use_all_factor_levels")
+        self.mean_imputation = _flag(info, "mean_imputation")
+        self.link = info.get("link", "logit")
+        if self.link != "logit":
+            raise NotImplementedError(f"Unsupported GLM link: {self.link}")
+
+    def score(self, matrix):
+        matrix = matrix.copy()
+        if self.mean_imputation:
+            for i in range(self.cats):
+                matrix[np.isnan(matrix[:, i]), i] = self.cat_modes[i]
+            for i in range(self.cats, self.n_features):
+                matrix[np.isnan(matrix[:, i]), i] = self.num_means[i - self.cats]
+
+        eta = np.zeros(len(matrix))
+        shift = 0 if self.use_all_levels else 1
+        for i in range(self.cats):
+            level = matrix[:, i]
+            index = np.nan_to_num(level, nan=-1).astype(np.int64) - shift + self.cat_offsets[i]
+            valid = (level >= shift) & (index < self.cat_offsets[i + 1])
+            eta[valid] += self.beta[index[valid]]
+
+        offset = (self.cat_offsets[self.cats] if self.cat_offsets is not None else 0) - self.cats
+        for i in range(self.cats, len(self.beta) - 1 - offset):
+            eta += self.beta[offset + i] * matrix[:, i]
+        eta += self.beta[-1]
+        return 1.0 / (1.0 + np.exp(-eta))
+
+
+class _XgboostModel(_EncodedModel):
+    def __init__(self, reader, info, columns, domains):
+        super().__init__(reader, info, columns, domains)
+        if int(info.get("cats", 0)):
+            raise NotImplementedError("XGBoost MOJOs with categorical features are not supported")
+        import xgboost
+
+        self.sparse = _flag(info, "sparse")
+        self.booster = xgboost.Booster()
+        self.booster.load_model(bytearray(reader.read_bytes("boosterBytes")))
+
+    def score(self, matrix):
+        import xgboost
+
+        if self.sparse:
+            # Sparse H2O frames never store zeros, so XGBoost saw them as missing
+            matrix = np.where(matrix == 0, np.nan, matrix)
+        return self.booster.predict(xgboost.DMatrix(matrix, missing=np.nan)).astype(np.float64)
+
+
+class _DeepLearningModel(_EncodedModel):
+    ACTIVATIONS = {
+        "Rectifier": lambda x: np.maximum(x, 0.0),
+        "Tanh": np.tanh,
+        "ExpRectifier": lambda x: np.where(x >= 0, x, np.expm1(np.minimum(x, 0.0))),
+    }
+
+    def __init__(self, reader, info, columns, domains):
+        super().__init__(reader, info, columns, domains)
+        activation = info["activation"]
+        self.dropout = activation.endswith("WithDropout")
+        self.activation = self.ACTIVATIONS.get(activation.replace("WithDropout", ""))
+        if self.activation is None:
+            raise NotImplementedError(f"Unsupported DeepLearning activation: {activation}")
+        if int(info.get("cats", 0)):
+            raise NotImplementedError("DeepLearning MOJOs with categorical features are not supported")
+        self.units = _array(info, "neural_network_sizes", np.int64)
+        self.norm_mul = _array(info, "norm_mul")
+        self.norm_sub = _array(info, "norm_sub")
+        self.hidden_dropout = _array(info, "hidden_dropout_ratios")
+        self.layers = []
+        for layer in range(len(self.units) - 1):
+            weights = _array(info, f"weight_layer{layer}").reshape(self.units[layer + 1], self.units[layer])
+            self.layers.append((weights, _array(info, f"bias_layer{layer}")))
+
+    def score(self, matrix):
+        x = matrix
+        if self.norm_mul is not None:
+            x = (x - self.norm_sub) * self.norm_mul
+        x = np.nan_to_num(x, nan=0.0)
+        for layer, (weights, bias) in enumerate(self.layers):
+            x = x @ weights.T + bias
+            if layer < len(self.layers) - 1:
+                x = self.activation(x)
+                if self.dropout and self.hidden_dropout is not None:
+                    x *= 1.0 - self.hidden_dropout[layer]
+        x = np.exp(x - x.max(axis=1, keepdims=True))
+        return x[:, 1] / x.sum(axis=1)
+
+
+class _StackedEnsembleModel(MojoModel):
+    def __init__(self, reader, info, columns, domains):
+        super().__init__(reader, info, columns, domains)
+        submodels = {}
+        for i in range(int(info.get("submodel_count", 0))):
+            submodels[info[f"submodel_key_{i}"]] = info[f"submodel_dir_{i}"]
+
+        self.base_models = []
+        for i in range(int(info.get("base_models_num", 0))):
+            key = info.get(f"base_model{i}")
+            if key is not None:
+                self.base_models.append((key, _load(reader.nested(submodels[key]))))
+        self.metalearner = _load(reader.nested(submodels[info["metalearner"]]))
+        self.logit_transform = info.get("metalearner_transform", "NONE").lower() == "logit"
+
+    def predict_p1(self, frame):
+        level_one = {}
+        for key, model in self.base_models:
+            p1 = model.predict_p1(frame)
+            if self.logit_transform:
+                with np.errstate(divide="ignore"):
+                    p1 = np.maximum(np.log(p1 / (1.0 - p1)), LOGIT_MIN)
+            level_one[key] = p1
+        return self.metalearner.predict_p1(pd.DataFrame(level_one, index=frame.index))
+
+
+ALGORITHMS = {
+    "gbm": _GbmModel,
+    "drf": _DrfModel,
+    "glm": _GlmModel,
+    "xgboost": _XgboostModel,
+    "deeplearning": _DeepLearningModel,
+    "stackedensemble": _StackedEnsembleModel,
+}
+
+
+def _load(reader):
+    info, columns, domains = _parse_ini(reader.read_text("model.ini"))
+    algo = info.get("algo")
+    if algo not in ALGORITHMS:
+        raise NotImplementedError(f"Unsupported MOJO algorithm: {algo}")
+    return ALGORITHMS[algo](reader, info, columns, domains)
+
+
+def load_mojo(path):
+    """Load a MOJO zip into a NumPy-backed model with an H2O-style ``predict``."""
+    with open(path, "rb") as f:
+        archive = zipfile.ZipFile(io.BytesIO(f.read()))
+    with archive:
+        return _load(_Reader(archive))
+
+
+def compare_with_h2o(path, frame):
+    """Score ``frame`` with both H2O and the native scorer and return the max ``p1`` difference."""
+    import h2o
+
+    import h2o_cluster
+
+    h2o_cluster.connect()
+    h2o_p1 = h2o.import_mojo(path).predict(h2o.H2OFrame(frame)).as_data_frame()["p1"].to_numpy()
+    native_p1 = load_mojo(path).predict(frame)["p1"].to_numpy()
+    return float(np.max(np.abs(h2o_p1 - native_p1)))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python mojo_scorer.py MODEL.zip rows.csv")
+    difference = compare_with_h2o(sys.argv[1], pd.read_csv(sys.argv[2]))
+    print(f"max |p1(h2o) - p1(native)| = {difference:.3e}")
+    sys.exit(0 if difference < 1e-6 else 1)
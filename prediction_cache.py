@@ -0,0 +1,87 @@
+"""Bounded LRU memoization for model predictions.
+
+Entries are keyed on a normalized feature tuple and tagged with the model
+version they were computed with; binding a different version clears the
+cache, so swapping a model artifact never serves stale predictions.
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+
+def _entry_size(key, value):
+    size = sys.getsizeof(key) + sum(sys.getsizeof(item) for item in key)
+    if isinstance(value, dict):
+        size += sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value.values())
+    else:
+        size += sys.getsizeof(value)
+    return size
+
+
+class LRUCache:
+    def __init__(self, max_entries=10_000, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version = None
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def bind(self, version):
+        """Drop every entry if ``version`` differs from the one the cache was filled with."""
+        if version == self.version:
+            return
+        with self._lock:
+            if version != self.version:
+                if self._data:
+                    self.invalidations += 1
+                self._data.clear()
+                self._sizes.clear()
+                self._bytes = 0
+                self.version = version
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = _entry_size(key, value)
+        with self._lock:
+            if key in self._data:
+                self._bytes -= self._sizes[key]
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self._sizes[key] = size
+            self._bytes += size
+            while self._data and (
+                (self.max_entries is not None and len(self._data) > self.max_entries)
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                old_key, _ = self._data.popitem(last=False)
+                self._bytes -= self._sizes.pop(old_key)
+                self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "version": self.version,
+        }
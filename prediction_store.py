@@ -0,0 +1,264 @@
+"""Append-only history of served predictions in a local SQLite database.
+
+Each row records when a prediction was made, for which module and by which
+source (form, batch upload, scoring service), the content hash of the model
+that made it, the inputs (JSON) and the prediction, probability and risk
+band. The table is indexed by time, by module and by model version.
+
+Recording never touches the disk on the request path: ``record`` only puts
+the rows on a bounded queue. A background writer thread takes everything
+queued within FLUSH_SECONDS (up to FLUSH_ROWS rows) and inserts it with one
+``executemany`` per transaction. The database runs in WAL mode, so reading
+the history does not block the writer. If the queue is full, for example
+while the disk stalls, rows are dropped and counted in
+``healthguard_prediction_store_rows_total{outcome="dropped"}`` rather than
+slowing predictions down.
+
+``HEALTHGUARD_PREDICTION_DB`` sets the database file (empty disables the
+history).
+
+    python prediction_store.py --module cardio --hours 24
+"""
+import argparse
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+import metrics
+import model_cache
+
+DB_PATH = os.environ.get("HEALTHGUARD_PREDICTION_DB", "prediction_history.sqlite3")
+
+# Queued record() calls (each one row or one batch) before new ones are dropped
+QUEUE_MAX_ITEMS = int(os.environ.get("HEALTHGUARD_PREDICTION_QUEUE", "10000"))
+# A write collects rows for at most this long, and at most this many rows
+FLUSH_SECONDS = 0.5
+FLUSH_ROWS = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    module TEXT NOT NULL,
+    source TEXT NOT NULL,
+    model_version TEXT,
+    inputs TEXT NOT NULL,
+    prediction INTEGER,
+    probability REAL,
+    risk_band TEXT
+);
+CREATE INDEX IF NOT EXISTS predictions_created_at ON predictions (created_at);
+CREATE INDEX IF NOT EXISTS predictions_module ON predictions (module, created_at);
+CREATE INDEX IF NOT EXISTS predictions_model_version ON predictions (model_version, created_at);
+"""
+
+INSERT = ("INSERT INTO predictions (created_at, module, source, model_version, inputs, prediction, probability, risk_band)"
+          " VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+
+_STOP = object()
+
+
+def connect(path=DB_PATH):
+    """Open ``path`` in WAL mode, creating the table and indexes if needed."""
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # In WAL mode a commit is durable once the log is synced at checkpoints
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _column(values, rows):
+    """``values`` as a list of ``rows`` plain Python values (a scalar is repeated)."""
+    if values is None or np.ndim(values) == 0:
+        value = values.item() if isinstance(values, np.generic) else values
+        return [value] * rows
+    return np.asarray(values).tolist()
+
+
+def _snapshot(values):
+    """Scalars as they are, arrays copied so later changes by the caller do not reach the history."""
+    return values if values is None or np.ndim(values) == 0 else np.array(values)
+
+
+def _rows(item):
+    """Expand one queued record() call into INSERT parameter tuples."""
+    created_at, module, source, model_version, rows, inputs, prediction, probability, risk_band = item
+    names = list(inputs)
+    features = zip(*(_column(inputs[name], rows) for name in names))
+    encoded = (json.dumps(dict(zip(names, values))) for values in features)
+    return zip([created_at] * rows, [module] * rows, [source] * rows, [model_version] * rows, encoded,
+               _column(prediction, rows), _column(probability, rows), _column(risk_band, rows))
+
+
+class PredictionWriter:
+    """Background thread that batches queued predictions into SQLite transactions."""
+
+    def __init__(self, path=DB_PATH, max_items=QUEUE_MAX_ITEMS):
+        self.path = path
+        self._queue = queue.Queue(max_items)
+        self._thread = threading.Thread(target=self._run, name="prediction-store-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            metrics.inc("healthguard_prediction_store_rows_total", item[4], outcome="dropped")
+
+    def flush(self):
+        """Block until everything queued so far is written (or has failed)."""
+        self._queue.join()
+
+    def close(self, timeout=5.0):
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _collect(self):
+        items = [self._queue.get()]
+        if items[0] is _STOP:
+            return items
+        rows = items[0][4]
+        deadline = time.monotonic() + FLUSH_SECONDS
+        while rows < FLUSH_ROWS:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            items.append(item)
+            if item is _STOP:
+                break
+            rows += item[4]
+        return items
+
+    def _run(self):
+        conn = None
+        while True:
+            items = self._collect()
+            batch = [item for item in items if item is not _STOP]
+            try:
+                if batch:
+                    rows = [row for item in batch for row in _rows(item)]
+                    if conn is None:
+                        conn = connect(self.path)
+                    with conn:
+                        conn.executemany(INSERT, rows)
+                    metrics.inc("healthguard_prediction_store_rows_total", len(rows), outcome="written")
+            except (sqlite3.Error, OSError, TypeError, ValueError) as e:
+                print(f"Error writing prediction history: {e}")
+                metrics.inc("healthguard_prediction_store_rows_total",
+                            sum(item[4] for item in batch), outcome="failed")
+                if conn is not None:
+                    conn.close()
+                conn = None
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+            if len(batch) < len(items):
+                if conn is not None:
+                    conn.close()
+                return
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def writer():
+    """The process's writer, started on first use (None if the history is disabled)."""
+    global _writer
+    if not DB_PATH:
+        return None
+    current = _writer
+    if current is not None:
+        return current
+    with _writer_lock:
+        if _writer is None:
+            _writer = PredictionWriter(DB_PATH)
+            # Pending rows are written before the interpreter exits
+            atexit.register(_writer.close)
+        return _writer
+
+
+def record(module, source, inputs, probability, prediction=None, risk_band=None, model_path=None):
+    """Queue predictions for the history; returns without waiting for the write.
+
+    ``inputs`` is one patient (a dict of values) or many (a DataFrame or a
+    dict of equal-length columns). ``probability``, ``prediction`` and
+    ``risk_band`` are scalars for one patient or arrays aligned to the rows.
+    ``model_path`` identifies the model version by its content hash.
+    """
+    store = writer()
+    if store is None:
+        return
+    if hasattr(inputs, "columns"):
+        inputs = {column: inputs[column].to_numpy(copy=True) for column in inputs.columns}
+    elif not any(np.ndim(value) for value in inputs.values()):
+        inputs = {name: [value] for name, value in inputs.items()}
+    else:
+        inputs = {name: np.array(value) for name, value in inputs.items()}
+    rows = len(next(iter(inputs.values()), ()))
+    model_version = model_cache.fingerprint(model_path) if model_path is not None else None
+    store.put((time.time(), module, source, model_version, rows, inputs,
+               _snapshot(prediction), _snapshot(probability), _snapshot(risk_band)))
+
+
+def query(module=None, model_version=None, since=None, until=None, limit=1000, path=DB_PATH):
+    """Most recent predictions matching the filters, newest first, as a DataFrame.
+
+    ``since``/``until`` are Unix timestamps; ``model_version`` matches a
+    prefix of the model's content hash.
+    """
+    import pandas as pd
+
+    clauses, params = [], []
+    if module is not None:
+        clauses.append("module = ?")
+        params.append(module)
+    if model_version is not None:
+        # A range rather than LIKE so the index is used; hex digits sort below "g"
+        clauses.append("model_version >= ? AND model_version < ?")
+        params += [model_version, model_version + "g"]
+    if since is not None:
+        clauses.append("created_at >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("created_at < ?")
+        params.append(until)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    conn = connect(path)
+    try:
+        return pd.read_sql_query(f"SELECT * FROM predictions{where} ORDER BY created_at DESC LIMIT ?",
+                                 conn, params=params + [limit])
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show recorded predictions")
+    parser.add_argument("--module", choices=["diabetes", "cardio"])
+    parser.add_argument("--model-version", help="Prefix of the model's content hash")
+    parser.add_argument("--hours", type=float, help="Only the last N hours")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args()
+
+    since = time.time() - args.hours * 3600 if args.hours is not None else None
+    history = query(args.module, args.model_version, since, limit=args.limit, path=args.db)
+    history["created_at"] = history["created_at"].map(lambda ts: time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)))
+    history["model_version"] = history["model_version"].str[:12]
+    print(history.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
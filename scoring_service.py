@@ -0,0 +1,239 @@
+"""Headless HTTP scoring service for the diabetes and cardiovascular models.
+
+Endpoints:
+
+    POST /predict/diabetes   rows with the ten diabetes form columns
+    POST /predict/cardio     rows with high_bp, age, high_chol and BMI
+    GET  /health             liveness, with each model's warm-up state
+    GET  /ready              200 once both models are loaded and warmed up, else 503
+    GET  /metrics            prediction traffic in the Prometheus text format (metrics.py)
+
+Request bodies are JSON (one object, a list of objects, or
+``{"instances": [...]}``) or CSV (``Content-Type: text/csv``). Responses are
+JSON unless the request was CSV or asks for ``Accept: text/csv``. Inputs go
+through the same encoding as the Streamlit pages.
+
+Add ``?contributions=true`` to either predict path to also get each
+feature's contribution to the prediction (``contrib_<column>`` plus
+``contrib_bias``). A diabetes request may ask for them for at most
+``HEALTHGUARD_DIABETES_MAX_CONTRIBUTION_PATIENTS`` distinct patients (400
+otherwise).
+
+Requests that arrive within ``--batch-window-ms`` of each other are coalesced
+into a single model call per endpoint. Every scored row is recorded in the
+prediction history (prediction_store.py).
+
+    python scoring_service.py --port 8600
+"""
+import argparse
+import io
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+import cardio_model
+import diabetes_model
+import metrics
+import prediction_store
+import warmup
+
+
+class MicroBatcher:
+    """Coalesces concurrent scoring requests into one ``score_fn`` call."""
+
+    def __init__(self, score_fn, window_seconds=0.005, max_batch_rows=4096):
+        self.score_fn = score_fn
+        self.window_seconds = window_seconds
+        self.max_batch_rows = max_batch_rows
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, frame):
+        """Score ``frame`` as part of the next batch and return its rows of the result."""
+        future = Future()
+        self._queue.put((frame, future))
+        return future.result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        rows = len(batch[0][0])
+        deadline = time.monotonic() + self.window_seconds
+        while rows < self.max_batch_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                combined = pd.concat([frame for frame, _ in batch], ignore_index=True)
+                result = self.score_fn(combined).reset_index(drop=True)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            start = 0
+            for frame, future in batch:
+                future.set_result(result.iloc[start:start + len(frame)].reset_index(drop=True))
+                start += len(frame)
+
+
+def score_diabetes(input_df, contributions=False):
+    pred_df = diabetes_model.predict_frame(diabetes_model.load_model(), input_df, source="service",
+                                           contributions=contributions)
+    result = pd.DataFrame({
+        "predict": pred_df["predict"].to_numpy(),
+        "p1": pred_df["p1"].to_numpy(),
+        "risk_band": diabetes_model.risk_band(pred_df["p1"]),
+    })
+    prediction_store.record("diabetes", "service", input_df, result["p1"].to_numpy(), result["predict"].to_numpy(),
+                            result["risk_band"].to_numpy(), diabetes_model.MOJO_PATH)
+    if contributions:
+        result[diabetes_model.CONTRIBUTION_COLUMNS] = pred_df[diabetes_model.CONTRIBUTION_COLUMNS].to_numpy()
+    return result
+
+
+def score_cardio(input_df, contributions=False):
+    result = cardio_model.predict_cardiovascular_risk_batch(input_df, source="service", contributions=contributions)
+    prediction_store.record("cardio", "service", input_df, result["probability"].to_numpy(),
+                            result["prediction"].to_numpy(), np.where(result["prediction"] == 1, "high", "low"),
+                            cardio_model.MODEL_PATH)
+    return result
+
+
+# Endpoint -> (input encoding, scoring function, metrics module label)
+ENDPOINTS = {
+    "/predict/diabetes": (diabetes_model.prepare_batch, score_diabetes, "diabetes"),
+    "/predict/cardio": (cardio_model.prepare_batch, score_cardio, "cardio"),
+}
+
+
+def parse_body(body, content_type):
+    if content_type.startswith("text/csv"):
+        return pd.read_csv(io.BytesIO(body))
+    payload = json.loads(body or b"null")
+    if isinstance(payload, dict):
+        payload = payload.get("instances", [payload])
+    if not isinstance(payload, list) or not payload:
+        raise ValueError("Expected a JSON object, a non-empty list of objects, or {\"instances\": [...]}")
+    return pd.DataFrame(payload)
+
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    batchers = {}
+
+    def _send(self, status, body, content_type="application/json"):
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status, message):
+        self._send(status, json.dumps({"error": message}))
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, json.dumps({"status": "ok", **warmup.status()}))
+        elif self.path == "/ready":
+            readiness = warmup.status()
+            self._send(200 if readiness["ready"] else 503, json.dumps(readiness))
+        elif self.path == "/metrics":
+            self._send(200, metrics.render(), metrics.CONTENT_TYPE)
+        else:
+            self._send_error(404, f"Unknown path {self.path}")
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path not in ENDPOINTS:
+            self._send_error(404, f"Unknown path {url.path}")
+            return
+
+        prepare, _, module = ENDPOINTS[url.path]
+        contributions = parse_qs(url.query).get("contributions", ["false"])[-1].lower() in ("1", "true", "yes")
+        content_type = self.headers.get("Content-Type", "application/json")
+        try:
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            input_df = prepare(parse_body(body, content_type))
+            if contributions and module == "diabetes":
+                # Checked before batching: every distinct patient adds 2^10 coalition rows to the model call
+                diabetes_model.check_contribution_patients(
+                    len(input_df.drop_duplicates(diabetes_model.FEATURE_COLUMNS)), "request")
+        except ValueError as e:
+            self._send_error(400, str(e))
+            return
+
+        try:
+            result = self.batchers[url.path, contributions].submit(input_df)
+        except Exception as e:
+            metrics.inc("healthguard_prediction_errors_total", module=module)
+            self._send_error(500, f"Prediction failed: {e}")
+            return
+
+        if content_type.startswith("text/csv") or "text/csv" in self.headers.get("Accept", ""):
+            self._send(200, result.to_csv(index=False), "text/csv")
+        else:
+            self._send(200, json.dumps({"predictions": json.loads(result.to_json(orient="records"))}))
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host="127.0.0.1", port=8600, window_seconds=0.005, max_batch_rows=4096):
+    # Requests with and without contributions are batched separately, and
+    # diabetes contribution batches stop growing at the per-request patient limit
+    ScoringHandler.batchers = {
+        (path, contributions): MicroBatcher(
+            partial(score_fn, contributions=contributions), window_seconds,
+            min(max_batch_rows, diabetes_model.MAX_CONTRIBUTION_PATIENTS)
+            if contributions and module == "diabetes" else max_batch_rows)
+        for path, (_, score_fn, module) in ENDPOINTS.items()
+        for contributions in (False, True)
+    }
+    return ThreadingHTTPServer((host, port), ScoringHandler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HealthGuard AI scoring service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--batch-window-ms", type=float, default=5.0,
+                        help="How long to wait for more requests before scoring a batch")
+    parser.add_argument("--max-batch-rows", type=int, default=4096)
+    args = parser.parse_args()
+
+    # Loads both models in the background (attaching to the shared H2O
+    # instance for the h2o backend); /ready reports when they can serve
+    warmup.start()
+
+    server = make_server(args.host, args.port, args.batch_window_ms / 1000.0, args.max_batch_rows)
+    print(f"Scoring service listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
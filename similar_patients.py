@@ -0,0 +1,191 @@
+"""Observed outcomes of the most similar patients in dataset/cardio_train.csv.
+
+Patients are matched exactly on the blood pressure and cholesterol flags and
+by distance on age and BMI, scaled so that AGE_SCALE years weigh as much as
+BMI_SCALE BMI points. The index is a quantized grid over that scaled plane,
+one per flag combination, stored in CSR form:
+
+    points      scaled (age, BMI) of every patient, sorted by grid cell
+    outcome     their ``cardio`` label
+    cell_start  offset of each cell's first patient; the patients of a cell
+                run to the next cell's offset
+
+A query reads the patient's cell and rings of cells around it until the k-th
+nearest candidate is closer than any cell not yet read, so it touches a few
+cells however large the registry is. The arrays are memory-mapped and rebuilt
+when the dataset changes; ``python similar_patients.py`` builds them ahead of
+time.
+"""
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+import model_cache
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# cardio_data.DATASET_PATH; cardio_data is imported only to build, as it loads pandas
+DATASET_PATH = 'dataset/cardio_train.csv'
+
+K = int(os.environ.get('HEALTHGUARD_SIMILAR_K', '100'))
+
+# Distance units: this many years of age count as much as this many BMI points
+AGE_SCALE = 5.0
+BMI_SCALE = 2.5
+# Grid cell side in scaled units
+CELL_SIZE = 0.5
+
+INDEX_DIR = os.path.join(model_cache.CACHE_DIR, 'similar_patients')
+
+_index = None
+_lock = threading.Lock()
+
+
+def _scaled(age, bmi):
+    return np.column_stack([np.asarray(age, dtype=np.float32) / AGE_SCALE,
+                            np.asarray(bmi, dtype=np.float32) / BMI_SCALE])
+
+
+def _dataset_stamp(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def build_index(index_dir=INDEX_DIR, path=DATASET_PATH):
+    """Grid-index the plausible dataset rows and write the arrays to ``index_dir``."""
+    import cardio_data
+
+    features, target = cardio_data.load_training_data(path)
+    points = _scaled(features['age'].to_numpy(), features['BMI'].to_numpy())
+    group = features['high_bp'].to_numpy().astype(np.int64) * 2 + features['high_chol'].to_numpy()
+
+    origin = np.floor(points.min(axis=0) / CELL_SIZE) * CELL_SIZE
+    cells = np.floor((points - origin) / CELL_SIZE).astype(np.int64)
+    shape = cells.max(axis=0) + 1
+    cell_id = (group * shape[0] + cells[:, 0]) * shape[1] + cells[:, 1]
+    order = np.argsort(cell_id, kind='stable')
+    n_cells = 4 * int(shape[0]) * int(shape[1])
+
+    os.makedirs(index_dir, exist_ok=True)
+    arrays = {
+        'points': points[order],
+        'outcome': target.to_numpy(np.int8)[order],
+        'cell_start': np.searchsorted(cell_id[order], np.arange(n_cells + 1)).astype(np.int64),
+    }
+    for name, array in arrays.items():
+        model_cache.write_atomic(os.path.join(index_dir, f'{name}.npy'), lambda f: np.save(f, array))
+
+    # Written last so a half-built index is never mistaken for a current one
+    meta = {
+        'dataset': os.path.abspath(path),
+        'dataset_stamp': _dataset_stamp(path),
+        'scale': [AGE_SCALE, BMI_SCALE],
+        'cell_size': CELL_SIZE,
+        'origin': origin.tolist(),
+        'shape': shape.tolist(),
+    }
+    model_cache.write_atomic(os.path.join(index_dir, 'meta.json'), lambda f: f.write(json.dumps(meta).encode()))
+
+
+def _read_index(index_dir):
+    try:
+        with open(os.path.join(index_dir, 'meta.json')) as f:
+            meta = json.load(f)
+        return {
+            **meta,
+            **{name: np.load(os.path.join(index_dir, f'{name}.npy'), mmap_mode='r')
+               for name in ('points', 'outcome', 'cell_start')},
+        }
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _is_current(index, path):
+    return (index is not None and index['dataset_stamp'] == _dataset_stamp(path)
+            and index['scale'] == [AGE_SCALE, BMI_SCALE] and index['cell_size'] == CELL_SIZE)
+
+
+def load_index(index_dir=INDEX_DIR, path=DATASET_PATH):
+    """Return the memory-mapped index, rebuilding it if the dataset changed."""
+    global _index
+    # One stat per call, so a replaced or appended dataset is picked up without a restart
+    index = _index
+    if _is_current(index, path):
+        return index
+
+    with _lock:
+        index = _read_index(index_dir)
+        if not _is_current(index, path):
+            build_index(index_dir, path)
+            index = _read_index(index_dir)
+        _index = index
+        return index
+
+
+def nearest(index, bmi, age, high_chol, high_bp, k=K):
+    """Positions of the ``k`` nearest patients with the same flags, and their scaled distances."""
+    query = _scaled([age], [bmi])[0]
+    nx, ny = index['shape']
+    cell_size = index['cell_size']
+    cx, cy = np.clip(np.floor((query - index['origin']) / cell_size).astype(int), 0, [nx - 1, ny - 1])
+    group_offset = (int(high_bp) * 2 + int(high_chol)) * nx * ny
+    cell_start = index['cell_start']
+
+    candidates = np.empty(0, dtype=np.int64)
+    radius = 0
+    while True:
+        # Every cell within ``radius`` of the query cell; each grid column's
+        # cells are contiguous, so one slice per column
+        y0, y1 = max(cy - radius, 0), min(cy + radius, ny - 1)
+        slices = [
+            np.arange(cell_start[group_offset + x * ny + y0], cell_start[group_offset + x * ny + y1 + 1])
+            for x in range(max(cx - radius, 0), min(cx + radius, nx - 1) + 1)
+        ]
+        candidates = np.concatenate(slices)
+        covers_grid = radius >= max(cx, nx - 1 - cx, cy, ny - 1 - cy)
+        if len(candidates) >= k or covers_grid:
+            distances = np.sqrt(((index['points'][candidates] - query) ** 2).sum(axis=1))
+            if len(candidates) > k:
+                keep = np.argpartition(distances, k - 1)[:k]
+                candidates, distances = candidates[keep], distances[keep]
+            # Cells outside the ring are at least radius cells away from the query
+            if covers_grid or distances.max() <= radius * cell_size:
+                return candidates, distances
+        radius += 1
+
+
+def similar_outcomes(bmi, age, high_chol, high_bp, k=K):
+    """Observed cardio rate among the ``k`` most similar dataset patients.
+
+    Returns ``{'k', 'rate', 'cases', 'age_range', 'bmi_range'}`` or None if
+    no patient shares the flags or the index is unavailable.
+    """
+    try:
+        with tracing.span('cardio.similar_patients', k=k):
+            index = load_index()
+            positions, _ = nearest(index, bmi, age, high_chol, high_bp, k)
+            if len(positions) == 0:
+                return None
+            outcome = index['outcome'][positions]
+            points = index['points'][positions]
+            ages, bmis = points[:, 0] * index['scale'][0], points[:, 1] * index['scale'][1]
+            return {
+                'k': len(positions),
+                'rate': float(outcome.mean()),
+                'cases': int(outcome.sum()),
+                'age_range': (int(round(ages.min())), int(round(ages.max()))),
+                'bmi_range': (round(float(bmis.min()), 1), round(float(bmis.max()), 1)),
+            }
+    except Exception:
+        logger.exception("Error reading similar patient index")
+        return None
+
+
+if __name__ == '__main__':
+    index = load_index()
+    print(f"Similar patient index over {len(index['points']):,} patients "
+          f"({len(index['cell_start']) - 1:,} cells) in {INDEX_DIR}")
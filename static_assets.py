@@ -0,0 +1,80 @@
+"""Pre-resized, content-hashed page icons.
+
+The source PNGs are far larger than the 40-60px they are displayed at (the
+heartbeat icon alone is 2.5 MB). Each icon is resized once to twice its
+display size (for high-DPI screens), recompressed, and written to
+``cache/assets`` under a name containing the hash of the source file and
+size. The resulting base64 payload is memoized per process, so reruns only
+pay for a stat() call and ship a few kilobytes.
+
+Run ``python static_assets.py`` to build every icon ahead of time.
+"""
+import base64
+import functools
+import hashlib
+import io
+import os
+
+import model_cache
+
+ASSET_DIR = os.path.join(model_cache.CACHE_DIR, "assets")
+
+# Icons used by the pages and the sizes (px) they are displayed at
+ICONS = {
+    "assets/icons/heartbeat.png": [60],
+    "assets/icons/disease_icon/diabetes.png": [40, 60],
+    "assets/icons/disease_icon/heart.png": [60],
+}
+
+SCALE = 2
+
+
+def _resize(source_bytes, size):
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(source_bytes))
+    image = image.convert("RGBA")
+    image.thumbnail((size * SCALE, size * SCALE), Image.LANCZOS)
+    out = io.BytesIO()
+    image.save(out, format="PNG", optimize=True)
+    return out.getvalue()
+
+
+@functools.lru_cache(maxsize=None)
+def _build(path, size, mtime_ns):
+    with open(path, "rb") as f:
+        source_bytes = f.read()
+    digest = hashlib.sha256(source_bytes + str(size).encode()).hexdigest()[:12]
+    stem = os.path.splitext(os.path.basename(path))[0]
+    asset_path = os.path.join(ASSET_DIR, f"{stem}-{size}-{digest}.png")
+
+    if os.path.exists(asset_path):
+        with open(asset_path, "rb") as f:
+            return asset_path, f.read()
+
+    data = _resize(source_bytes, size)
+    os.makedirs(ASSET_DIR, exist_ok=True)
+    model_cache.write_atomic(asset_path, lambda f: f.write(data))
+    return asset_path, data
+
+
+def icon_path(path, size):
+    """Path of the resized, content-hashed copy of ``path`` for ``size`` px display."""
+    return _build(path, size, os.stat(path).st_mtime_ns)[0]
+
+
+@functools.lru_cache(maxsize=None)
+def _encode(path, size, mtime_ns):
+    return base64.b64encode(_build(path, size, mtime_ns)[1]).decode()
+
+
+def icon_base64(path, size):
+    """Base64 PNG of ``path`` resized for ``size`` px display (memoized per process)."""
+    return _encode(path, size, os.stat(path).st_mtime_ns)
+
+
+if __name__ == "__main__":
+    for icon, sizes in ICONS.items():
+        for size in sizes:
+            built = icon_path(icon, size)
+            print(f"{icon} @{size}px: {os.path.getsize(icon):,} -> {os.path.getsize(built):,} bytes ({built})")
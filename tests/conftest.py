@@ -0,0 +1,60 @@
+"""Synthetic cardio dataset and model shared by the index tests."""
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import cardio_data
+import cardio_model
+import model_cache
+
+
+def cardio_rows(count, seed, first_id=0):
+    """Raw rows in the layout of dataset/cardio_train.csv, a few with implausible vitals."""
+    rng = np.random.default_rng(seed)
+    rows = pd.DataFrame({
+        "id": np.arange(first_id, first_id + count),
+        "age": rng.integers(30 * 365, 66 * 365, count),
+        "gender": rng.integers(1, 3, count),
+        "height": rng.integers(150, 195, count),
+        "weight": np.round(rng.uniform(45, 130, count), 1),
+        "ap_hi": rng.integers(100, 180, count),
+        "ap_lo": rng.integers(60, 100, count),
+        "cholesterol": rng.integers(1, 4, count),
+        "gluc": rng.integers(1, 4, count),
+        "smoke": rng.integers(0, 2, count),
+        "alco": rng.integers(0, 2, count),
+        "active": rng.integers(0, 2, count),
+        "cardio": rng.integers(0, 2, count),
+    })
+    rows.loc[rows.index[::50], "ap_hi"] = 16020
+    return rows
+
+
+def write_rows(path, rows, header=True):
+    with open(path, "w" if header else "a", newline="") as f:
+        rows.to_csv(f, sep=";", index=False, header=header)
+
+
+@pytest.fixture
+def cardio_dataset(tmp_path, monkeypatch):
+    """A 2,000-row dataset at the default relative path, with every derived artifact under tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "dataset").mkdir()
+    write_rows(cardio_data.DATASET_PATH, cardio_rows(2000, 0))
+    return cardio_data.DATASET_PATH
+
+
+@pytest.fixture
+def cardio_model_file(cardio_dataset, monkeypatch):
+    """A small decision tree pickled as the cardio model."""
+    tree = pytest.importorskip("sklearn.tree")
+    features, target = cardio_data.load_training_data(cardio_dataset)
+    model = tree.DecisionTreeClassifier(max_depth=6, random_state=0).fit(features, target)
+    with open("model.pkl", "wb") as f:
+        pickle.dump(model, f)
+    monkeypatch.setattr(cardio_model, "MODEL_PATH", "model.pkl")
+    monkeypatch.setattr(cardio_model, "load_model",
+                        lambda path="model.pkl": model_cache.get_model(path, cardio_model._load_artifact))
+    return "model.pkl"
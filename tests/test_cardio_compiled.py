@@ -0,0 +1,132 @@
+"""The compiled ensemble reproduces the libraries' predictions and TreeSHAP values."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import cardio_compiled
+import model_cache
+from cardio_model import FEATURE_COLUMNS
+
+
+def _features(rows, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "high_bp": rng.integers(0, 2, rows),
+        "age": rng.integers(30, 66, rows),
+        "high_chol": rng.integers(0, 2, rows),
+        "BMI": np.round(rng.uniform(16, 45, rows), 1),
+    })[FEATURE_COLUMNS].astype(np.float32)
+
+
+def _target(X, seed):
+    rng = np.random.default_rng(seed)
+    logit = -6 + 0.08 * X["age"] + 0.9 * X["high_bp"] + 0.5 * X["high_chol"] + 0.05 * X["BMI"]
+    return (rng.random(len(X)) < 1 / (1 + np.exp(-logit))).astype(int)
+
+
+X_TRAIN = _features(2000, 0)
+Y_TRAIN = _target(X_TRAIN, 1)
+# Enough rows that the later calls score through the cell table
+X_TEST = _features(20000, 2)
+
+
+def _assert_same_proba(model, compiled):
+    for _ in range(3):
+        expected = np.asarray(model.predict_proba(X_TEST))
+        actual = compiled.predict_proba(X_TEST)
+        assert actual.dtype == expected.dtype
+        assert np.array_equal(actual, expected)
+    assert compiled._table is not None
+
+
+def test_xgboost_bit_identical():
+    xgboost = pytest.importorskip("xgboost")
+    model = xgboost.XGBClassifier(n_estimators=30, max_depth=4, learning_rate=0.3).fit(X_TRAIN, Y_TRAIN)
+    _assert_same_proba(model, cardio_compiled.export(model, FEATURE_COLUMNS))
+
+    # Missing values follow each split's default direction
+    X = X_TEST.iloc[:500].copy()
+    X.iloc[::3, 1] = np.nan
+    X.iloc[::5, 3] = np.nan
+    assert np.array_equal(cardio_compiled.export(model).predict_proba(X), model.predict_proba(X))
+
+
+def test_xgboost_early_stopping_keeps_parallel_trees():
+    xgboost = pytest.importorskip("xgboost")
+    model = xgboost.XGBClassifier(n_estimators=40, max_depth=3, num_parallel_tree=2, learning_rate=0.5,
+                                  early_stopping_rounds=3)
+    model.fit(X_TRAIN, Y_TRAIN, eval_set=[(X_TEST.iloc[:500], _target(X_TEST.iloc[:500], 3))], verbose=False)
+    assert model.best_iteration < 39
+    _assert_same_proba(model, cardio_compiled.export(model, FEATURE_COLUMNS))
+
+
+@pytest.mark.parametrize("name", ["RandomForestClassifier", "GradientBoostingClassifier"])
+def test_sklearn_bit_identical(name):
+    ensemble = pytest.importorskip("sklearn.ensemble")
+    model = getattr(ensemble, name)(n_estimators=20, max_depth=4, random_state=0).fit(X_TRAIN, Y_TRAIN)
+    _assert_same_proba(model, cardio_compiled.export(model, FEATURE_COLUMNS))
+
+
+def test_contributions_match_xgboost_pred_contribs():
+    xgboost = pytest.importorskip("xgboost")
+    model = xgboost.XGBClassifier(n_estimators=30, max_depth=4, learning_rate=0.3).fit(X_TRAIN, Y_TRAIN)
+    X = X_TEST.iloc[:300]
+    expected = model.get_booster().predict(xgboost.DMatrix(X), pred_contribs=True)
+    actual = cardio_compiled.export(model, FEATURE_COLUMNS).contributions(X)
+    assert actual.shape == expected.shape
+    assert np.allclose(actual, expected, atol=1e-5)
+
+
+def test_forest_contributions_add_up_to_probability():
+    ensemble = pytest.importorskip("sklearn.ensemble")
+    model = ensemble.RandomForestClassifier(n_estimators=10, max_depth=4, random_state=0).fit(X_TRAIN, Y_TRAIN)
+    X = X_TEST.iloc[:300]
+    contributions = cardio_compiled.export(model, FEATURE_COLUMNS).contributions(X)
+    assert np.allclose(contributions.sum(axis=1), model.predict_proba(X)[:, 1])
+
+
+def test_unwraps_pipelines_and_searches():
+    pytest.importorskip("sklearn")
+    from sklearn.model_selection import GridSearchCV
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.tree import DecisionTreeClassifier
+
+    search = GridSearchCV(DecisionTreeClassifier(random_state=0), {"max_depth": [2, 3]}, cv=2)
+    model = Pipeline([("identity", "passthrough"), ("search", search)]).fit(X_TRAIN, Y_TRAIN)
+    assert cardio_compiled.fitted_estimator(model) is search.best_estimator_
+    assert np.array_equal(cardio_compiled.export(model).predict_proba(X_TEST), model.predict_proba(X_TEST))
+
+    scaled = Pipeline([("scale", StandardScaler()), ("tree", DecisionTreeClassifier())]).fit(X_TRAIN, Y_TRAIN)
+    with pytest.raises(TypeError, match="scale"):
+        cardio_compiled.export(scaled)
+
+
+def test_rejects_unsupported_estimators():
+    linear_model = pytest.importorskip("sklearn.linear_model")
+    with pytest.raises(TypeError, match="LogisticRegression"):
+        cardio_compiled.export(linear_model.LogisticRegression().fit(X_TRAIN, Y_TRAIN))
+
+
+def test_save_and_load_round_trip(tmp_path):
+    tree = pytest.importorskip("sklearn.tree")
+    model = tree.DecisionTreeClassifier(max_depth=5, random_state=0).fit(X_TRAIN, Y_TRAIN)
+    path = str(tmp_path / "cardio.npz")
+    model_cache.write_atomic(path, cardio_compiled.export(model, FEATURE_COLUMNS).save)
+
+    loaded = cardio_compiled.CompiledEnsemble.load(path)
+    assert loaded.feature_names == FEATURE_COLUMNS
+    assert np.array_equal(loaded.predict_proba(X_TEST), model.predict_proba(X_TEST))
+
+
+@pytest.mark.skipif(cardio_compiled._libm is None, reason="C math library not found")
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_exp_matches_libm(dtype):
+    rng = np.random.default_rng(4)
+    values = np.concatenate([
+        rng.uniform(-30, 30, 100000),
+        [0.0, -0.0, 1e-45, -1e-45, 88.7, -103.9, 709.8, -745.2, 1000.0, -1000.0, np.inf, -np.inf],
+    ]).astype(dtype)
+    actual = cardio_compiled._exp(values)
+    assert actual.dtype == dtype
+    assert np.array_equal(actual, cardio_compiled._libm_exp(values))
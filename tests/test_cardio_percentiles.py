@@ -0,0 +1,44 @@
+"""Percentile lookups agree with ranking the scored stratum directly."""
+import numpy as np
+import pytest
+
+import cardio_data
+import cardio_model
+import cardio_percentiles
+
+
+def _stratum_scores(path, band, gender):
+    raw_df = cardio_data.read_csv(path)
+    raw_df = raw_df[cardio_data.plausible_rows(raw_df)]
+    features = cardio_data.derive_features(raw_df)
+    scores = cardio_model.load_model().predict_proba(features)[:, 1].astype(np.float32)
+    mask = cardio_percentiles.age_band(features["age"].to_numpy()) == band
+    if gender != cardio_percentiles.ALL_GENDERS:
+        mask &= raw_df["gender"].to_numpy() == gender
+    return scores[mask]
+
+
+@pytest.mark.parametrize("age, gender", [(35, 0), (45, 1), (55, 2), (63, 0)])
+def test_percentile_ranks_within_stratum(cardio_model_file, monkeypatch, age, gender):
+    monkeypatch.setattr(cardio_percentiles, "_index", None)
+    scores = _stratum_scores(cardio_data.DATASET_PATH, int(cardio_percentiles.age_band(age)), gender)
+
+    # A score the stratum contains (ties count half) and two outside its range
+    for probability in (float(np.median(scores)), -1.0, 2.0):
+        result = cardio_percentiles.percentile(probability, age, gender)
+        below = np.count_nonzero(scores < np.float32(probability))
+        ties = np.count_nonzero(scores == np.float32(probability))
+        assert result["count"] == len(scores)
+        assert result["percentile"] == pytest.approx(100.0 * (below + ties / 2) / len(scores))
+        assert result["gender"] == cardio_percentiles.GENDER_LABELS[gender]
+
+
+def test_index_follows_the_dataset(cardio_model_file, monkeypatch):
+    monkeypatch.setattr(cardio_percentiles, "_index", None)
+    before = cardio_percentiles.load_index()["offsets"][-1]
+
+    with open(cardio_data.DATASET_PATH) as f:
+        lines = f.readlines()
+    with open(cardio_data.DATASET_PATH, "w") as f:
+        f.writelines(lines[:1001])
+    assert cardio_percentiles.load_index()["offsets"][-1] < before
@@ -0,0 +1,87 @@
+"""Incremental cube updates agree with a rebuild from scratch."""
+import os
+
+import numpy as np
+import pytest
+
+import cardio_data
+import cohort_cube
+from conftest import cardio_rows, write_rows
+
+
+@pytest.fixture
+def modes(monkeypatch):
+    """Byte offset every update started reading from."""
+    starts = []
+    add_rows = cohort_cube._add_rows
+
+    def recording(arrays, model, path, header, start, end):
+        starts.append(start)
+        add_rows(arrays, model, path, header, start, end)
+
+    monkeypatch.setattr(cohort_cube, "_add_rows", recording)
+    return starts
+
+
+def _assert_same_cube(cube, expected):
+    assert np.array_equal(cube["patients"], expected["patients"])
+    assert np.array_equal(cube["cardio"], expected["cardio"])
+    assert np.allclose(cube["risk"], expected["risk"])
+
+
+def _header_bytes(path):
+    with open(path, "rb") as f:
+        return len(f.readline())
+
+
+def test_appended_rows_are_added(cardio_model_file, modes):
+    path = cardio_data.DATASET_PATH
+    first = cohort_cube.update_cube("cube", path)
+    assert modes == [_header_bytes(path)]
+    assert first["patients"].sum() == cardio_data.plausible_rows(cardio_data.read_csv(path)).sum()
+
+    write_rows(path, cardio_rows(300, 1, first_id=2000), header=False)
+    cube = cohort_cube.update_cube("cube", path)
+    assert modes[-1] == first["offset"]
+    _assert_same_cube(cube, cohort_cube.update_cube("rebuilt", path, rebuild=True))
+    _assert_same_cube(cohort_cube._read_cube("cube"), cube)
+
+
+def test_final_row_without_newline(cardio_model_file, modes):
+    path = cardio_data.DATASET_PATH
+    with open(path, "rb+") as f:
+        f.truncate(f.seek(0, 2) - 1)
+    cube = cohort_cube.update_cube("cube", path)
+    assert cube["offset"] == os.path.getsize(path)
+    assert cube["ends_mid_line"]
+
+    # The row is extended in place rather than followed by new ones: rebuild
+    with open(path, "ab") as f:
+        f.write(b"0\n")
+    cube = cohort_cube.update_cube("cube", path)
+    assert modes[-1] == _header_bytes(path)
+    _assert_same_cube(cube, cohort_cube.update_cube("rebuilt", path, rebuild=True))
+
+
+def test_row_being_written_is_not_read(cardio_model_file):
+    path = cardio_data.DATASET_PATH
+    size = os.path.getsize(path)
+    with open(path, "a") as f:
+        f.write("9999;20000;1")
+    assert cohort_cube.update_cube("cube", path)["offset"] == size
+
+
+def test_changed_rows_rebuild(cardio_model_file, modes):
+    path = cardio_data.DATASET_PATH
+    cohort_cube.update_cube("cube", path)
+
+    # A row before the stored offset is removed while new ones are appended,
+    # so the file only grows but the checked bytes change
+    with open(path, "rb") as f:
+        lines = f.readlines()
+    with open(path, "wb") as f:
+        f.writelines(lines[:-2] + lines[-1:])
+    write_rows(path, cardio_rows(10, 1, first_id=2000), header=False)
+    cube = cohort_cube.update_cube("cube", path)
+    assert modes[-1] == _header_bytes(path)
+    _assert_same_cube(cube, cohort_cube.update_cube("rebuilt", path, rebuild=True))
@@ -0,0 +1,59 @@
+"""Coalition Shapley values of the diabetes log-odds, checked against a model whose values are known."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import diabetes_model
+import mojo_scorer
+
+WEIGHTS = np.linspace(-0.5, 0.5, len(diabetes_model.FEATURE_COLUMNS))
+INTERCEPT = -1.5
+
+ROWS = pd.DataFrame([
+    {"HighBP": 1, "GenHlth": 4, "HighChol": 1, "CholCheck": 1, "BMI": 35.5,
+     "HvyAlcoholConsump": 0, "PhysHlth": 10, "MentHlth": 2, "PhysActivity": 0, "DiffWalk": 1},
+    {"HighBP": 0, "GenHlth": 1, "HighChol": 0, "CholCheck": 0, "BMI": 19.0,
+     "HvyAlcoholConsump": 1, "PhysHlth": 0, "MentHlth": 30, "PhysActivity": 1, "DiffWalk": 0},
+])
+
+
+class LogisticModel(mojo_scorer.MojoModel):
+    """Additive in the log-odds, so each feature's Shapley value is its own term."""
+
+    def __init__(self):
+        self.features = diabetes_model.FEATURE_COLUMNS
+        self.n_features = len(self.features)
+        self.default_threshold = 0.5
+        self.domains = {}
+        self.rows_scored = 0
+
+    def predict_p1(self, frame):
+        self.rows_scored += len(frame)
+        logit = frame[self.features].to_numpy(dtype=float) @ WEIGHTS + INTERCEPT
+        return 1 / (1 + np.exp(-logit))
+
+
+def test_coalition_values_of_an_additive_model():
+    model = LogisticModel()
+    # Repeated patients are scored once and every input row gets its result
+    input_df = ROWS.iloc[[0, 1, 0]].reset_index(drop=True)
+    pred_df = diabetes_model.predict_frame(model, input_df, source=None, contributions=True)
+
+    assert model.rows_scored == 2 * 2 ** len(diabetes_model.FEATURE_COLUMNS)
+    assert list(pred_df.columns) == ["predict", "p0", "p1"] + diabetes_model.CONTRIBUTION_COLUMNS
+    assert np.allclose(pred_df["p1"], model.predict_p1(input_df))
+
+    reference = np.array([diabetes_model.REFERENCE_PROFILE[column] for column in diabetes_model.FEATURE_COLUMNS])
+    values = input_df[diabetes_model.FEATURE_COLUMNS].to_numpy(dtype=float)
+    contributions = pred_df[diabetes_model.CONTRIBUTION_COLUMNS].to_numpy()
+    assert np.allclose(contributions[:, :-1], (values - reference) * WEIGHTS)
+    assert np.allclose(contributions[:, -1], reference @ WEIGHTS + INTERCEPT)
+
+    p1 = pred_df["p1"].to_numpy()
+    assert np.allclose(contributions.sum(axis=1), np.log(p1 / (1 - p1)))
+
+
+def test_contribution_patient_limit():
+    diabetes_model.check_contribution_patients(diabetes_model.MAX_CONTRIBUTION_PATIENTS, "request")
+    with pytest.raises(ValueError, match="per request"):
+        diabetes_model.check_contribution_patients(diabetes_model.MAX_CONTRIBUTION_PATIENTS + 1, "request")
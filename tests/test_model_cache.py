@@ -0,0 +1,75 @@
+"""Reload decisions of the model cache and its atomic writes."""
+import os
+
+import pytest
+
+import model_cache
+
+
+class CountingLoader:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, path):
+        self.calls += 1
+        with open(path) as f:
+            return f.read()
+
+
+def test_reloads_only_when_content_changes(tmp_path):
+    path = tmp_path / "model.bin"
+    path.write_text("first")
+    cache, loader = model_cache.ModelCache(), CountingLoader()
+
+    assert cache.get(path, loader) == "first"
+    assert cache.get(path, loader) == "first"
+    assert loader.calls == 1
+
+    # A touch changes the mtime, not the content
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert cache.get(path, loader) == "first"
+    assert loader.calls == 1
+
+    path.write_text("second")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10**9))
+    assert cache.get(path, loader) == "second"
+    assert loader.calls == 2
+    assert cache.fingerprint(path) == model_cache.file_sha256(path)
+    assert cache.stats()[str(path)]["loads"] == 2
+
+
+def test_loaders_are_cached_separately(tmp_path):
+    path = tmp_path / "model.bin"
+    path.write_text("model")
+    cache, first, second = model_cache.ModelCache(), CountingLoader(), CountingLoader()
+
+    cache.get(path, first)
+    cache.get(path, second)
+    cache.get(path, first)
+    assert (first.calls, second.calls) == (1, 1)
+    assert cache.fingerprint(path) == model_cache.file_sha256(path)
+    assert cache.fingerprint(tmp_path / "missing.bin") is None
+
+
+def test_write_atomic_installs_with_usual_mode(tmp_path):
+    path = tmp_path / "artifact.bin"
+    model_cache.write_atomic(str(path), lambda f: f.write(b"data"))
+
+    assert path.read_bytes() == b"data"
+    assert os.stat(path).st_mode & 0o777 == model_cache.FILE_MODE
+    assert os.listdir(tmp_path) == ["artifact.bin"]
+
+
+def test_write_atomic_keeps_the_old_file_on_error(tmp_path):
+    path = tmp_path / "artifact.bin"
+    path.write_bytes(b"old")
+
+    def fail(f):
+        f.write(b"partial")
+        raise RuntimeError("interrupted")
+
+    with pytest.raises(RuntimeError):
+        model_cache.write_atomic(str(path), fail)
+    assert path.read_bytes() == b"old"
+    assert os.listdir(tmp_path) == ["artifact.bin"]
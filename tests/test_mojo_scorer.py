@@ -0,0 +1,34 @@
+"""Parity of the native MOJO scorer with H2O's own ``p1`` output."""
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+import diabetes_model
+import mojo_scorer
+
+# Form-like profiles spanning the slider ranges, with both values of every Yes/No field
+ROWS = pd.DataFrame([
+    {"HighBP": 0, "GenHlth": 1, "HighChol": 0, "CholCheck": 1, "BMI": 21.5,
+     "HvyAlcoholConsump": 0, "PhysHlth": 0, "MentHlth": 0, "PhysActivity": 1, "DiffWalk": 0},
+    {"HighBP": 1, "GenHlth": 5, "HighChol": 1, "CholCheck": 1, "BMI": 44.0,
+     "HvyAlcoholConsump": 1, "PhysHlth": 30, "MentHlth": 30, "PhysActivity": 0, "DiffWalk": 1},
+    {"HighBP": 1, "GenHlth": 3, "HighChol": 0, "CholCheck": 0, "BMI": 31.5,
+     "HvyAlcoholConsump": 0, "PhysHlth": 5, "MentHlth": 3, "PhysActivity": 0, "DiffWalk": 1},
+    {"HighBP": 0, "GenHlth": 2, "HighChol": 1, "CholCheck": 1, "BMI": 27.0,
+     "HvyAlcoholConsump": 1, "PhysHlth": 15, "MentHlth": 0, "PhysActivity": 1, "DiffWalk": 0},
+    {"HighBP": 1, "GenHlth": 4, "HighChol": 1, "CholCheck": 1, "BMI": 10.0,
+     "HvyAlcoholConsump": 0, "PhysHlth": 0, "MentHlth": 20, "PhysActivity": 1, "DiffWalk": 0},
+    {"HighBP": 0, "GenHlth": 3, "HighChol": 0, "CholCheck": 1, "BMI": 50.0,
+     "HvyAlcoholConsump": 0, "PhysHlth": 2, "MentHlth": 2, "PhysActivity": 0, "DiffWalk": 1},
+])
+
+TOLERANCE = 1e-6
+
+
+@pytest.mark.skipif(not os.path.exists(diabetes_model.MOJO_PATH), reason="diabetes MOJO not present")
+@pytest.mark.skipif(shutil.which("java") is None, reason="H2O needs a Java runtime")
+def test_native_p1_matches_h2o():
+    pytest.importorskip("h2o")
+    assert mojo_scorer.compare_with_h2o(diabetes_model.MOJO_PATH, ROWS) < TOLERANCE
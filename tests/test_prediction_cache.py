@@ -0,0 +1,44 @@
+"""Eviction and invalidation of the prediction memo."""
+import prediction_cache
+
+
+def test_evicts_least_recently_used():
+    cache = prediction_cache.LRUCache(max_entries=2)
+    cache.put((1,), 0.1)
+    cache.put((2,), 0.2)
+    # Reading (1,) makes (2,) the least recently used entry
+    assert cache.get((1,)) == 0.1
+    cache.put((3,), 0.3)
+
+    assert cache.get((2,)) is None
+    assert cache.get((1,)) == 0.1
+    assert cache.get((3,)) == 0.3
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"], stats["evictions"]) == (2, 3, 1, 1)
+
+
+def test_byte_limit():
+    cache = prediction_cache.LRUCache(max_entries=None, max_bytes=1)
+    cache.put((1,), 0.1)
+    assert cache.get((1,)) is None
+    assert cache.stats()["bytes"] == 0
+
+    entry_bytes = prediction_cache._entry_size((1,), 0.1)
+    cache = prediction_cache.LRUCache(max_entries=None, max_bytes=2 * entry_bytes)
+    for key in (1, 2, 3):
+        cache.put((key,), 0.1)
+    assert [cache.get((key,)) for key in (1, 2, 3)] == [None, 0.1, 0.1]
+    assert cache.stats()["bytes"] == 2 * entry_bytes
+
+
+def test_bind_clears_on_new_version():
+    cache = prediction_cache.LRUCache()
+    cache.bind("a")
+    cache.put((1,), {"p1": 0.5})
+    cache.bind("a")
+    assert cache.get((1,)) == {"p1": 0.5}
+
+    cache.bind("b")
+    assert cache.get((1,)) is None
+    assert cache.stats()["invalidations"] == 1
+    assert cache.stats()["version"] == "b"
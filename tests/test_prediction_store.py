@@ -0,0 +1,56 @@
+"""Queued predictions reach the SQLite history as the caller passed them."""
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import model_cache
+import prediction_store
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    path = str(tmp_path / "history.sqlite3")
+    monkeypatch.setattr(prediction_store, "DB_PATH", path)
+    monkeypatch.setattr(prediction_store, "_writer", None)
+    yield path
+    prediction_store.writer().close()
+
+
+def test_single_and_batch_records(store):
+    prediction_store.record("cardio", "page", {"age": 50, "BMI": np.float32(27.5)}, 0.25, prediction=0)
+    probability = np.array([0.1, 0.8])
+    inputs = pd.DataFrame({"HighBP": [0, 1], "BMI": [21.0, 35.5]})
+    prediction_store.record("diabetes", "batch", inputs, probability, prediction=np.array([0, 1]),
+                            risk_band=["low", "high"])
+    # Changes after record() returns do not reach the history
+    probability[:] = 0.5
+    inputs.loc[0, "BMI"] = 99.0
+    prediction_store.writer().flush()
+
+    history = prediction_store.query(path=store).sort_values("id")
+    assert history["module"].tolist() == ["cardio", "diabetes", "diabetes"]
+    assert [json.loads(inputs) for inputs in history["inputs"]] == [
+        {"age": 50, "BMI": 27.5}, {"HighBP": 0, "BMI": 21.0}, {"HighBP": 1, "BMI": 35.5},
+    ]
+    assert history["probability"].tolist() == [0.25, 0.1, 0.8]
+    assert history["prediction"].tolist() == [0, 0, 1]
+    assert history["risk_band"].tolist()[1:] == ["low", "high"]
+
+
+def test_query_filters(store, tmp_path):
+    model_path = tmp_path / "model.bin"
+    model_path.write_bytes(b"model")
+    model_cache.get_model(model_path, lambda path: object())
+    version = model_cache.fingerprint(model_path)
+
+    prediction_store.record("cardio", "page", {"age": 40}, 0.2, model_path=model_path)
+    prediction_store.record("diabetes", "page", {"BMI": 30.0}, 0.6)
+    prediction_store.writer().flush()
+
+    assert prediction_store.query(module="diabetes", path=store)["probability"].tolist() == [0.6]
+    by_version = prediction_store.query(model_version=version[:8], path=store)
+    assert by_version["model_version"].tolist() == [version]
+    assert len(prediction_store.query(since=0, limit=1, path=store)) == 1
+    assert prediction_store.query(until=0, path=store).empty
@@ -0,0 +1,55 @@
+"""Micro-batching of concurrent scoring requests."""
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+import scoring_service
+
+
+class RecordingScorer:
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, frame):
+        self.batches.append(len(frame))
+        return pd.DataFrame({"p1": frame["x"] / 100})
+
+
+def _submit_all(batcher, frames):
+    with ThreadPoolExecutor(len(frames)) as pool:
+        return list(pool.map(batcher.submit, frames))
+
+
+def test_concurrent_requests_share_one_call():
+    scorer = RecordingScorer()
+    frames = [pd.DataFrame({"x": range(i * 10, i * 10 + i + 1)}) for i in range(4)]
+    # The batch closes as soon as every request is in
+    batcher = scoring_service.MicroBatcher(scorer, window_seconds=5.0, max_batch_rows=sum(map(len, frames)))
+
+    results = _submit_all(batcher, frames)
+    assert scorer.batches == [10]
+    for frame, result in zip(frames, results):
+        assert result["p1"].tolist() == (frame["x"] / 100).tolist()
+        assert result.index.tolist() == list(range(len(frame)))
+
+
+def test_batches_are_capped_by_rows():
+    scorer = RecordingScorer()
+    batcher = scoring_service.MicroBatcher(scorer, window_seconds=5.0, max_batch_rows=2)
+
+    results = _submit_all(batcher, [pd.DataFrame({"x": [i]}) for i in range(4)])
+    assert scorer.batches == [2, 2]
+    assert sorted(result["p1"].iloc[0] for result in results) == [0.0, 0.01, 0.02, 0.03]
+
+
+def test_errors_reach_every_request_of_the_batch():
+    def fail(frame):
+        raise ValueError("bad input")
+
+    batcher = scoring_service.MicroBatcher(fail, window_seconds=0.001)
+    with pytest.raises(ValueError, match="bad input"):
+        batcher.submit(pd.DataFrame({"x": [1]}))
+    # The worker keeps serving after a failed batch
+    batcher.score_fn = RecordingScorer()
+    assert batcher.submit(pd.DataFrame({"x": [5]}))["p1"].tolist() == [0.05]
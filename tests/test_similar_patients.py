@@ -0,0 +1,41 @@
+"""The grid ring search finds the same neighbours as a brute-force scan."""
+import numpy as np
+import pytest
+
+import cardio_data
+import similar_patients
+
+
+def _brute_force_distances(path, bmi, age, high_chol, high_bp, k):
+    features, _ = cardio_data.load_training_data(path)
+    points = similar_patients._scaled(features["age"].to_numpy(), features["BMI"].to_numpy())
+    same_flags = (features["high_chol"].to_numpy() == high_chol) & (features["high_bp"].to_numpy() == high_bp)
+    query = similar_patients._scaled([age], [bmi])[0]
+    distances = np.sqrt(((points[same_flags] - query) ** 2).sum(axis=1))
+    return np.sort(distances)[:k]
+
+
+@pytest.mark.parametrize("bmi, age, high_chol, high_bp", [
+    (24.0, 50, 0, 0), (31.5, 38, 1, 0), (19.0, 64, 0, 1), (42.0, 58, 1, 1),
+    # Outside the grid: the query cell is clamped to the edge
+    (80.0, 95, 1, 1), (10.0, 20, 0, 0),
+])
+@pytest.mark.parametrize("k", [1, 25, 5000])
+def test_nearest_matches_brute_force(cardio_dataset, monkeypatch, bmi, age, high_chol, high_bp, k):
+    monkeypatch.setattr(similar_patients, "_index", None)
+    index = similar_patients.load_index()
+    candidates, distances = similar_patients.nearest(index, bmi, age, high_chol, high_bp, k)
+
+    expected = _brute_force_distances(cardio_dataset, bmi, age, high_chol, high_bp, k)
+    assert len(candidates) == len(expected)
+    assert np.allclose(np.sort(distances), expected)
+    assert np.allclose(distances, np.sqrt(((index["points"][candidates]
+                                            - similar_patients._scaled([age], [bmi])[0]) ** 2).sum(axis=1)))
+
+
+def test_similar_outcomes_counts_cases(cardio_dataset, monkeypatch):
+    monkeypatch.setattr(similar_patients, "_index", None)
+    result = similar_patients.similar_outcomes(27.0, 52, 1, 1, k=40)
+    assert result["k"] == 40
+    assert 0 <= result["cases"] <= 40
+    assert result["rate"] == pytest.approx(result["cases"] / 40)
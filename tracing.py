@@ -0,0 +1,190 @@
+"""Lightweight tracing spans for the prediction path.
+
+While a trace is active, finished spans are collected so the page can show
+them in a debug panel. Export is opt-in: with ``HEALTHGUARD_TRACE_FILE`` set,
+each span is also appended as one JSON line to that file. Spans only go onto
+a bounded queue on the prediction path; a background thread serializes and
+writes them every FLUSH_SECONDS and rotates the file once it exceeds
+``HEALTHGUARD_TRACE_MAX_BYTES`` (default 64 MB, keeping TRACE_BACKUPS old
+files). Spans that find the queue full are dropped.
+
+    trace = tracing.start_trace("cardio.submit")
+    with tracing.span("cardio.predict"):
+        ...
+    tracing.render_debug_panel(trace)
+"""
+import atexit
+import contextvars
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+TRACE_FILE = os.environ.get("HEALTHGUARD_TRACE_FILE", "")
+TRACE_MAX_BYTES = int(os.environ.get("HEALTHGUARD_TRACE_MAX_BYTES", str(64 << 20)))
+# Rotated files kept next to TRACE_FILE: traces.jsonl.1 (newest) .. .N
+TRACE_BACKUPS = 3
+
+# Spans waiting for the writer; a write collects them for at most FLUSH_SECONDS
+QUEUE_MAX_SPANS = 100_000
+FLUSH_SECONDS = 1.0
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+_STOP = object()
+_export_queue = queue.Queue(QUEUE_MAX_SPANS)
+_writer = None
+_writer_lock = threading.Lock()
+
+
+class Trace:
+    def __init__(self, name):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.spans = []
+
+
+def start_trace(name):
+    """Begin collecting spans for the current script run / request."""
+    trace = Trace(name)
+    _current_trace.set(trace)
+    return trace
+
+
+def _rotate(path):
+    for i in range(TRACE_BACKUPS - 1, 0, -1):
+        if os.path.exists(f"{path}.{i}"):
+            os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+    os.replace(path, f"{path}.1")
+
+
+def _write_spans(path):
+    """Writer thread: append queued spans to ``path`` in batches, rotating by size."""
+    export_file = None
+    while True:
+        records = [_export_queue.get()]
+        deadline = time.monotonic() + FLUSH_SECONDS
+        while records[-1] is not _STOP:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                records.append(_export_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        stop = records[-1] is _STOP
+        try:
+            for record in records:
+                if record is _STOP:
+                    continue
+                if export_file is None:
+                    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                    export_file = open(path, "a")
+                    size = export_file.tell()
+                # json.dumps escapes non-ASCII, so characters are bytes
+                line = json.dumps(record) + "\n"
+                export_file.write(line)
+                size += len(line)
+                if size >= TRACE_MAX_BYTES:
+                    export_file.close()
+                    export_file = None
+                    _rotate(path)
+            if export_file is not None:
+                export_file.flush()
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Error exporting trace spans: {e}")
+        if stop:
+            if export_file is not None:
+                export_file.close()
+            return
+
+
+def _close_writer(timeout=5.0):
+    _export_queue.put(_STOP)
+    _writer.join(timeout)
+
+
+def _export(record):
+    global _writer
+    if not TRACE_FILE:
+        return
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = threading.Thread(target=_write_spans, args=(TRACE_FILE,), name="trace-writer", daemon=True)
+                _writer.start()
+                # Queued spans are written before the interpreter exits
+                atexit.register(_close_writer)
+    try:
+        _export_queue.put_nowait(record)
+    except queue.Full:
+        pass
+
+
+@contextmanager
+def span(name, **attributes):
+    """Time the enclosed block and export it as a span of the active trace."""
+    trace = _current_trace.get()
+    span_id = uuid.uuid4().hex[:16]
+    parent_id = _current_span.get()
+    token = _current_span.set(span_id)
+    wall_start = time.time()
+    start = time.perf_counter()
+    error = None
+    try:
+        yield attributes
+    except Exception as e:
+        error = repr(e)
+        raise
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000.0
+        _current_span.reset(token)
+        record = {
+            "trace_id": trace.trace_id if trace else None,
+            "span_id": span_id,
+            "parent_id": parent_id,
+            "name": name,
+            "start": wall_start,
+            "duration_ms": duration_ms,
+            "attributes": attributes,
+        }
+        if error is not None:
+            record["error"] = error
+        if trace is not None:
+            trace.spans.append(record)
+        _export(record)
+
+
+def peak_rss_mb(children=False):
+    """Peak resident set size of this process (or its largest child) so far, in MB."""
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def debug_enabled():
+    if os.environ.get("HEALTHGUARD_DEBUG", "").lower() in ("1", "true", "yes"):
+        return True
+    import streamlit as st
+    return st.query_params.get("debug") in ("1", "true")
+
+
+def render_debug_panel(trace):
+    """Show the spans of ``trace`` on the page when debugging is enabled."""
+    if trace is None or not debug_enabled():
+        return
+    import streamlit as st
+
+    with st.expander(f"Debug: {trace.name} trace {trace.trace_id}"):
+        st.dataframe([
+            {"span": record["name"], "duration_ms": round(record["duration_ms"], 3), **record["attributes"]}
+            for record in sorted(trace.spans, key=lambda record: record["start"])
+        ])
+        st.caption(f"Total: {sum(r['duration_ms'] for r in trace.spans if r['parent_id'] is None):.2f} ms")
@@ -0,0 +1,175 @@
+"""Reproducible CPU training for the cardiovascular model.
+
+Derives the page's four features from dataset/cardio_train.csv, runs a
+hyperparameter search with one single-threaded XGBoost fit per worker
+process across all cores, refits the best configuration and writes a
+versioned artifact plus a metrics JSON:
+
+    python train_cardio.py                 # writes models/cardio_xgb_<version>.pkl
+    python train_cardio.py --install       # ...and replaces gpu_automl_model.pkl
+
+The running app picks up an installed artifact automatically because
+model_cache reloads it when its content hash changes.
+"""
+import argparse
+import itertools
+import json
+import os
+import pickle
+import random
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import sklearn
+import xgboost
+from sklearn.metrics import accuracy_score, brier_score_loss, log_loss, roc_auc_score
+from sklearn.model_selection import StratifiedKFold, train_test_split
+
+import cardio_compiled
+import cardio_data
+import cardio_model
+import model_cache
+
+OUTPUT_DIR = 'models'
+
+SEARCH_SPACE = {
+    'n_estimators': [100, 200, 400],
+    'max_depth': [3, 4, 6],
+    'learning_rate': [0.03, 0.1],
+    'subsample': [0.8, 1.0],
+    'colsample_bytree': [0.75, 1.0],
+    'min_child_weight': [1, 10],
+}
+
+# Set in each worker by _init_worker so the data is sent once per process
+_X = None
+_y = None
+
+
+def _init_worker(X, y):
+    global _X, _y
+    _X, _y = X, y
+
+
+def make_model(params, seed, n_jobs=1):
+    return xgboost.XGBClassifier(
+        objective='binary:logistic',
+        tree_method='hist',
+        eval_metric='logloss',
+        n_jobs=n_jobs,
+        random_state=seed,
+        **params,
+    )
+
+
+def _evaluate(task):
+    params, folds, seed = task
+    start = time.perf_counter()
+    scores = []
+    for train_index, test_index in StratifiedKFold(folds, shuffle=True, random_state=seed).split(_X, _y):
+        model = make_model(params, seed).fit(_X.iloc[train_index], _y.iloc[train_index])
+        scores.append(roc_auc_score(_y.iloc[test_index], model.predict_proba(_X.iloc[test_index])[:, 1]))
+    return {
+        'params': params,
+        'cv_auc_mean': float(np.mean(scores)),
+        'cv_auc_std': float(np.std(scores)),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def sample_candidates(trials, seed):
+    grid = [dict(zip(SEARCH_SPACE, values)) for values in itertools.product(*SEARCH_SPACE.values())]
+    random.Random(seed).shuffle(grid)
+    return grid[:trials]
+
+
+def holdout_metrics(model, X, y):
+    proba = model.predict_proba(X)[:, 1]
+    return {
+        'auc': float(roc_auc_score(y, proba)),
+        'accuracy': float(accuracy_score(y, proba >= 0.5)),
+        'log_loss': float(log_loss(y, proba)),
+        'brier': float(brier_score_loss(y, proba)),
+        'rows': int(len(y)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the cardiovascular risk model on CPU")
+    parser.add_argument('--data', default=cardio_data.DATASET_PATH)
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    parser.add_argument('--trials', type=int, default=24, help="Number of search configurations")
+    parser.add_argument('--folds', type=int, default=3)
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--install', action='store_true',
+                        help=f"Copy the trained artifact to {cardio_model.MODEL_PATH}")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    X, y = cardio_data.load_training_data(args.data)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, stratify=y, random_state=args.seed)
+    print(f"Loaded {len(X):,} plausible rows from {args.data}")
+
+    tasks = [(params, args.folds, args.seed) for params in sample_candidates(args.trials, args.seed)]
+    with ProcessPoolExecutor(args.jobs, initializer=_init_worker, initargs=(X_train, y_train)) as pool:
+        results = []
+        for result in pool.map(_evaluate, tasks):
+            results.append(result)
+            print(f"[{len(results)}/{len(tasks)}] cv_auc={result['cv_auc_mean']:.4f} {result['params']}")
+    results.sort(key=lambda result: result['cv_auc_mean'], reverse=True)
+    best = results[0]
+
+    model = make_model(best['params'], args.seed, n_jobs=args.jobs).fit(X_train, y_train)
+    metrics = holdout_metrics(model, X_test, y_test)
+
+    dataset_sha256 = model_cache.file_sha256(args.data)
+    version = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{dataset_sha256[:8]}"
+    os.makedirs(args.output_dir, exist_ok=True)
+    artifact_path = os.path.join(args.output_dir, f"cardio_xgb_{version}.pkl")
+    with open(artifact_path, 'wb') as f:
+        pickle.dump(model, f)
+
+    report = {
+        'version': version,
+        'artifact': artifact_path,
+        'artifact_sha256': model_cache.file_sha256(artifact_path),
+        'dataset': args.data,
+        'dataset_sha256': dataset_sha256,
+        'features': cardio_model.FEATURE_COLUMNS,
+        'seed': args.seed,
+        'best_params': best['params'],
+        'holdout': metrics,
+        'search': results,
+        'training_seconds': time.perf_counter() - start,
+        'workers': args.jobs,
+        'library_versions': {'xgboost': xgboost.__version__, 'scikit-learn': sklearn.__version__},
+    }
+    with open(os.path.join(args.output_dir, f"cardio_xgb_{version}.metrics.json"), 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"Best cv_auc={best['cv_auc_mean']:.4f}, holdout auc={metrics['auc']:.4f}, "
+          f"accuracy={metrics['accuracy']:.4f} in {report['training_seconds']:.0f}s")
+    print(f"Wrote {artifact_path}")
+
+    if args.install:
+        if cardio_model.MODEL_PATH.endswith('.npz'):
+            compiled = cardio_compiled.export(model, cardio_model.FEATURE_COLUMNS)
+            # Same guarantee as cardio_compiled.py: only a bit-identical model is served
+            if not cardio_compiled.verify_cardio_inputs(model, compiled):
+                sys.exit(f"Compiled model does not reproduce predict_proba exactly; "
+                         f"{cardio_model.MODEL_PATH} not replaced")
+            model_cache.write_atomic(cardio_model.MODEL_PATH, compiled.save)
+        else:
+            with open(artifact_path, 'rb') as artifact:
+                model_cache.write_atomic(cardio_model.MODEL_PATH, lambda f: shutil.copyfileobj(artifact, f))
+        print(f"Installed as {cardio_model.MODEL_PATH}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Background model warm-up and readiness state.
+
+``start()`` launches one daemon thread per process that loads both models
+(attaching to H2O for the diabetes h2o backend) and runs a dummy prediction
+through each, so model imports, unpickling, the cardio lookup table and
+first-call overheads are paid before the first user arrives. The Streamlit
+router and the scoring service call it at startup and read ``status()``:
+
+    {"ready": False, "models": {"cardio": {"state": "ready", "seconds": 0.8, "error": None},
+                                "diabetes": {"state": "loading", ...}}}
+
+A model's state moves pending -> loading -> ready, or to failed with the
+error. Set ``HEALTHGUARD_WARMUP=0`` to skip warm-up (models then load on
+first use and report ready immediately). Cardio contributions are warmed
+last and best effort only: if the model cannot be compiled for them, the
+failure is printed and readiness is unaffected.
+"""
+import os
+import threading
+import time
+
+import cardio_model
+import diabetes_model
+
+ENABLED = os.environ.get("HEALTHGUARD_WARMUP", "1").lower() not in ("0", "false", "no")
+
+PENDING, LOADING, READY, FAILED = "pending", "loading", "ready", "failed"
+
+# Representative form inputs for the dummy predictions
+CARDIO_SAMPLE = {"high_bp": [1, 0], "age": [55, 40], "high_chol": [1, 0], "BMI": [28.4, 22.0]}
+DIABETES_SAMPLE = {
+    "HighBP": [1, 0], "GenHlth": [3, 2], "HighChol": [1, 0], "CholCheck": [1, 1], "BMI": [31.5, 23.0],
+    "HvyAlcoholConsump": [0, 0], "PhysHlth": [5, 0], "MentHlth": [3, 0], "PhysActivity": [0, 1],
+    "DiffWalk": [1, 0],
+}
+
+
+def warm_cardio():
+    import cardio_lookup
+    import cardio_percentiles
+    import cohort_cube
+    import similar_patients
+
+    model = cardio_model.load_model()
+    # Dummy predictions are kept out of the traffic metrics
+    cardio_model.predict_cardiovascular_risk_batch(CARDIO_SAMPLE, model, source=None)
+    # Builds the risk table and dataset indexes if missing or stale
+    cardio_lookup.load_table()
+    cardio_percentiles.load_index()
+    similar_patients.load_index()
+    cohort_cube.load_cube()
+    # Best effort: a model that cannot be compiled still serves plain predictions
+    try:
+        cardio_model.predict_cardiovascular_risk_batch(CARDIO_SAMPLE, model, source=None, contributions=True)
+    except Exception as e:
+        print(f"Cardio contributions unavailable, skipping their warm-up: {e}")
+
+
+def warm_diabetes():
+    import pandas as pd
+
+    # Connects to (or starts) the shared H2O instance for the h2o backend
+    model = diabetes_model.load_model()
+    diabetes_model.predict_frame(model, pd.DataFrame(DIABETES_SAMPLE), source=None)
+
+
+class Warmup:
+    """Runs the warm-up tasks in order on a background thread and records their state."""
+
+    def __init__(self, tasks):
+        self.tasks = tasks
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread = None
+        self._models = {name: {"state": PENDING, "seconds": None, "error": None} for name in tasks}
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="model-warmup", daemon=True)
+                self._thread.start()
+        return self
+
+    def _set(self, name, **fields):
+        with self._lock:
+            self._models[name] = {**self._models[name], **fields}
+
+    def _run(self):
+        for name, task in self.tasks.items():
+            self._set(name, state=LOADING)
+            start = time.perf_counter()
+            try:
+                task()
+            except Exception as e:
+                print(f"Error warming up {name} model: {e}")
+                self._set(name, state=FAILED, seconds=time.perf_counter() - start, error=str(e))
+            else:
+                self._set(name, state=READY, seconds=time.perf_counter() - start)
+        self._done.set()
+
+    def wait(self, timeout=None):
+        """Block until every task has finished; returns whether all are ready."""
+        self._done.wait(timeout)
+        return self.status()["ready"]
+
+    def status(self):
+        with self._lock:
+            models = {name: dict(model) for name, model in self._models.items()}
+        return {"ready": all(model["state"] == READY for model in models.values()), "models": models}
+
+
+class _Disabled:
+    def wait(self, timeout=None):
+        return True
+
+    def status(self):
+        return {"ready": True, "models": {}}
+
+
+_warmup = None
+_warmup_lock = threading.Lock()
+
+
+def start():
+    """Start the process-wide warm-up once; later calls return the same instance."""
+    global _warmup
+    with _warmup_lock:
+        if _warmup is None:
+            if ENABLED:
+                _warmup = Warmup({"cardio": warm_cardio, "diabetes": warm_diabetes}).start()
+            else:
+                _warmup = _Disabled()
+        return _warmup
+
+
+def status():
+    """Readiness of the process-wide warm-up (not ready if it was never started)."""
+    if _warmup is None:
+        return {"ready": False, "models": {}}
+    return _warmup.status()
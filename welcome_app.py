@@ -1,7 +1,5 @@
 import streamlit as st
-from PIL import Image
-import base64
-import os
+import static_assets
 
 # Initialize session state
 if 'theme' not in st.session_state:
@@ -18,10 +16,9 @@ def toggle_theme():
 def select_module(module):
     st.session_state.selected_module = module
 
-# Function to get image as base64 string
-def get_img_as_base64(file_path):
-    with open(file_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode()
+# Function to get image as base64 string, resized for its display size (memoized)
+def get_img_as_base64(file_path, size):
+    return static_assets.icon_base64(file_path, size)
 
 # Page Config
 st.set_page_config(
@@ -33,9 +30,9 @@ st.set_page_config(
 # Load CSS based on theme
 theme = st.session_state.theme
 # icon_path = f"assets/icons/{'moon' if theme == 'light' else 'sun'}.png"
-heartbeat_icon = get_img_as_base64("assets/icons/heartbeat.png")
-diabetes_icon = get_img_as_base64("assets/icons/disease_icon/diabetes.png")
-heart_icon = get_img_as_base64("assets/icons/disease_icon/heart.png")
+heartbeat_icon = get_img_as_base64("assets/icons/heartbeat.png", 60)
+diabetes_icon = get_img_as_base64("assets/icons/disease_icon/diabetes.png", 60)
+heart_icon = get_img_as_base64("assets/icons/disease_icon/heart.png", 60)
 
 # Define CSS
 css = f"""
@@ -282,13 +279,19 @@ if st.session_state.selected_module:
     if st.button(f"🚀 Launch {st.session_state.selected_module.title()} Module", key="launch-button", help="Launch Selected Module"):
         st.session_state.launch = True
 
-# Launch logic
+# Launch logic: switch to the module's page inside this server (see app.py)
+module_pages = {
+    'diabetes': "diabetes_app.py",
+    'cardio': "cardiovascular_app.py",
+}
 if st.session_state.launch:
-    if st.session_state.selected_module == 'diabetes':
-        os.system("streamlit run diabetes_app.py")
-    elif st.session_state.selected_module == 'cardio':
-        os.system("streamlit run cardiovascular_app.py")
-    st.session_state.launch = False  # Reset after launching
+    st.session_state.launch = False  # Reset before switching, switch_page does not return
+    if st.session_state.selected_module in module_pages:
+        st.switch_page(module_pages[st.session_state.selected_module])
+
+# Population view for analysts
+if st.button("📊 Open Cohort Analytics", key="analytics-button", help="Prevalence and predicted risk across the dataset"):
+    st.switch_page("analytics_app.py")
 
 # Features section
 st.markdown("## ✨ Key Features")
@@ -0,0 +1,140 @@
+"""What-if sensitivity sweeps over the form inputs.
+
+Instead of a rerun and a model call per slider position, a sweep scores the
+whole range of one input (a risk curve) or the grid of two inputs (a
+heatmap) around a base profile at once:
+
+    diabetes  one batched predict call, e.g. all 401 BMI values 10.0-50.0
+    cardio    a slice of the precomputed risk table (cardio_lookup.py), or one
+              batched predict call for inputs outside it
+
+Results are memoized per base profile, swept inputs and model version, so
+moving the other sliders back and forth or rerunning the page reuses them.
+``render_panel`` draws the what-if expander on both pages.
+"""
+import os
+
+import numpy as np
+
+import cardio_lookup
+import cardio_model
+import diabetes_model
+import metrics
+import model_cache
+import tracing
+from prediction_cache import LRUCache
+
+# Inputs a sweep can vary, with the form's slider range: (min, max, step)
+DIABETES_RANGES = {
+    "BMI": (10.0, 50.0, 0.1),
+    "GenHlth": (1, 5, 1),
+    "PhysHlth": (0, 30, 1),
+    "MentHlth": (0, 30, 1),
+}
+CARDIO_RANGES = {
+    "age": (30, 100, 1),
+    "BMI": (15.0, 40.0, 0.1),
+}
+
+MEMO_MAX_ENTRIES = int(os.environ.get("HEALTHGUARD_WHATIF_ENTRIES", "256"))
+
+diabetes_sweeps = LRUCache(MEMO_MAX_ENTRIES)
+cardio_sweeps = LRUCache(MEMO_MAX_ENTRIES)
+metrics.register_cache("diabetes_what_if", diabetes_sweeps)
+metrics.register_cache("cardio_what_if", cardio_sweeps)
+
+
+def axis_values(low, high, step):
+    """Every slider position from ``low`` to ``high`` inclusive."""
+    count = int(round((high - low) / step)) + 1
+    return np.round(low + np.arange(count) * step, 1)
+
+
+def sweep_frame(base, axes, ranges, columns):
+    """``base`` repeated over the grid of ``axes``, one row per combination, in ``columns`` order."""
+    import pandas as pd
+
+    grids = np.meshgrid(*[axis_values(*ranges[axis]) for axis in axes], indexing="ij")
+    frame = pd.DataFrame({column: np.full(grids[0].size, base[column]) for column in columns})
+    for axis, grid in zip(axes, grids):
+        frame[axis] = grid.ravel()
+    return frame
+
+
+def _memo_key(base, axes, columns):
+    # The swept inputs' own values do not change the result
+    return tuple(None if column in axes else base[column] for column in columns), tuple(axes)
+
+
+def diabetes_sweep(model, input_dict, axes, path=diabetes_model.MOJO_PATH):
+    """Diabetes risk (``risk`` = p1) over ``axes``; columns are the axes plus ``risk``."""
+    diabetes_sweeps.bind(model_cache.fingerprint(path))
+    base = dict(zip(diabetes_model.FEATURE_COLUMNS, diabetes_model.feature_key(input_dict)))
+    key = _memo_key(base, axes, diabetes_model.FEATURE_COLUMNS)
+    result = diabetes_sweeps.get(key)
+    if result is None:
+        frame = sweep_frame(base, axes, DIABETES_RANGES, diabetes_model.FEATURE_COLUMNS)
+        with tracing.span("diabetes.what_if", rows=len(frame), axes=",".join(axes)):
+            pred_df = diabetes_model.predict_frame(model, frame, source="what_if")
+        result = frame[list(axes)].assign(risk=pred_df["p1"].to_numpy())
+        diabetes_sweeps.put(key, result)
+    return result
+
+
+def cardio_sweep(input_dict, axes):
+    """Cardiovascular risk (``risk`` = probability) over ``axes``; columns are the axes plus ``risk``."""
+    model = cardio_model.load_model()
+    cardio_sweeps.bind(model_cache.fingerprint(cardio_model.MODEL_PATH))
+    base = {
+        "high_bp": int(input_dict["high_bp"]), "age": int(round(input_dict["age"])),
+        "high_chol": int(input_dict["high_chol"]), "BMI": round(float(input_dict["BMI"]), 1),
+    }
+    key = _memo_key(base, axes, cardio_model.FEATURE_COLUMNS)
+    result = cardio_sweeps.get(key)
+    if result is None:
+        frame = sweep_frame(base, axes, CARDIO_RANGES, cardio_model.FEATURE_COLUMNS)
+        with tracing.span("cardio.what_if", rows=len(frame), axes=",".join(axes)):
+            table_result = cardio_lookup.lookup_many(frame["BMI"], frame["age"], frame["high_chol"], frame["high_bp"])
+            if table_result is not None:
+                probability = table_result[1]
+            else:
+                probability = cardio_model.predict_cardiovascular_risk_batch(
+                    frame, model, source="what_if")["probability"].to_numpy()
+        result = frame[list(axes)].assign(risk=probability)
+        cardio_sweeps.put(key, result)
+    return result
+
+
+def render_panel(key, base, ranges, labels, sweep):
+    """What-if expander: pick one or two inputs and plot ``sweep(base, axes)`` as a curve or heatmap."""
+    import streamlit as st
+
+    with st.expander("What-if explorer"):
+        if not st.checkbox("Show how the risk changes across an input's whole range", key=f"{key}_what_if"):
+            return
+        first = st.selectbox("Vary", list(ranges), format_func=labels.get, key=f"{key}_what_if_first")
+        second = st.selectbox("Together with", [None] + [axis for axis in ranges if axis != first],
+                              format_func=lambda axis: "Nothing else" if axis is None else labels[axis],
+                              key=f"{key}_what_if_second")
+        axes = (first,) if second is None else (first, second)
+        try:
+            result = sweep(base, axes)
+        except Exception as e:
+            st.error(f"What-if analysis failed: {e}")
+            return
+
+        if second is None:
+            st.line_chart(result.set_index(first)["risk"], x_label=labels[first], y_label="Predicted risk")
+            st.caption(f"Everything except {labels[first].lower()} is kept at the values in the form; "
+                       f"the current value is {base[first]}.")
+        else:
+            import altair as alt
+
+            chart = alt.Chart(result).mark_rect().encode(
+                x=alt.X(f"{first}:O", title=labels[first], axis=alt.Axis(labelOverlap=True)),
+                y=alt.Y(f"{second}:O", title=labels[second], sort="descending", axis=alt.Axis(labelOverlap=True)),
+                color=alt.Color("risk:Q", title="Risk", scale=alt.Scale(scheme="redyellowgreen", reverse=True)),
+                tooltip=[first, second, alt.Tooltip("risk:Q", format=".1%")],
+            )
+            st.altair_chart(chart, width="stretch")
+            st.caption("Other inputs are kept at the values in the form.")